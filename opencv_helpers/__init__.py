@@ -1,4 +1,7 @@
 from .safe_cv import cv, cv2
+from .cv_array import cv2array, bgr2rgb_view
+from .buffer_pool import BufferPool, get_image_buffer
+from .live_view import LiveView
 import matplotlib.pyplot as plt
 import numpy as np
 
@@ -9,22 +12,23 @@ def imshow(im, axis=None, show_axis=False, swap_channels=True, **kwargs):
     ---------
 
      - `im`: OpenCV image.
+
+    See `LiveView` for displaying a stream of frames.
     '''
     if axis is None:
         fig, axis = plt.subplots(**kwargs)
+    im_array = cv2array(im)
     if swap_channels:
-        cv.CvtColor(im, im, cv.CV_BGR2RGB)
-    im_array = (np.fromstring(im.tostring(), dtype='uint8')
-                .reshape(im.height, im.width, -1))
-    if swap_channels:
-        cv.CvtColor(im, im, cv.CV_RGB2BGR)
+        im_array = bgr2rgb_view(im_array)
+    elif im_array.shape[2] == 1:
+        im_array = im_array[:, :, 0]
     axis.imshow(im_array)
     if not show_axis:
         axis.axis('off')
     return axis
 
 
-def resize(im, width, height):
+def resize(im, width, height, dst=None, pool=None):
     '''
     Arguments
     ---------
@@ -32,30 +36,66 @@ def resize(im, width, height):
      - `im`: OpenCV image.
      - `width`: Image width.
      - `height`: Image width.
+     - `dst`: Optional output image (`width` x `height`, same channels as
+       `im`).
+     - `pool`: Optional `BufferPool` to take the output image from if `dst`
+       is not given.
     '''
-    resized = cv.CreateImage((width, height), 8, im.channels)
+    resized = get_image_buffer((width, height), 8, im.channels, dst=dst,
+                               pool=pool)
     cv.Resize(im, resized)
     cv.CvtColor(resized, resized, cv.CV_BGR2RGB)
     return resized
 
 
-def convert_color(im):
+def convert_color(im, dst=None, pool=None):
     '''
     Arguments
     ---------
 
      - `im`: OpenCV image.
+     - `dst`: Optional output image (same size and channels as `im`).
+     - `pool`: Optional `BufferPool` to take the output image from if `dst`
+       is not given.
     '''
-    converted = cv.CreateImage((im.width, im.height), 8, im.channels)
+    converted = get_image_buffer((im.width, im.height), 8, im.channels,
+                                 dst=dst, pool=pool)
     cv.CvtColor(im, converted, cv.CV_BGR2RGB)
     return converted
 
 
+def get_map_arrays(points_a, points_b):
+    '''
+    Return `(N, 3, 3)` stack of perspective transforms, mapping each set of
+    four points in `points_a` to the corresponding points in `points_b`
+    (i.e., a vectorized `cv.GetPerspectiveTransform`).
+
+    All transforms are solved as a single stacked linear solve.
+
+    Arguments
+    ---------
+
+     - `points_a`, `points_b`: `(N, 4, 2)` arrays of points.
+    '''
+    points_a = np.asarray(points_a, dtype='float64').reshape(-1, 4, 2)
+    points_b = np.asarray(points_b, dtype='float64').reshape(-1, 4, 2)
+    x, y = points_a[..., 0], points_a[..., 1]
+    u, v = points_b[..., 0], points_b[..., 1]
+    ones, zeros = np.ones_like(x), np.zeros_like(x)
+    # Two equations per point pair, for the 8 unknowns of each transform
+    # (the last element is fixed to 1).
+    A = np.concatenate([
+        np.stack([x, y, ones, zeros, zeros, zeros, -x * u, -y * u], axis=-1),
+        np.stack([zeros, zeros, zeros, x, y, ones, -x * v, -y * v], axis=-1)],
+        axis=1)
+    b = np.concatenate([u, v], axis=1)
+    h = np.linalg.solve(A, b[..., np.newaxis])[..., 0]
+    return np.concatenate([h, np.ones((len(h), 1))], axis=1).reshape(-1, 3, 3)
+
+
 def get_map_array(df_a, df_b):
-    map_mat = cv.CreateMat(3, 3, cv.CV_32FC1)
-    cv.GetPerspectiveTransform(list(map(tuple, df_a.values)),
-                               list(map(tuple, df_b.values)), map_mat)
-    return np.fromstring(map_mat.tostring(), dtype='f32').reshape(3, 3)
+    return get_map_arrays(df_a.values[np.newaxis],
+                          df_b.values[np.newaxis])[0].astype('float32')
 
 
 def find_homography_array(df_a, df_b):
@@ -63,9 +103,88 @@ def find_homography_array(df_a, df_b):
     return map_arr
 
 
+def find_homography_arrays(points_a, points_b):
+    '''
+    Return `(N, 3, 3)` stack of least-squares homographies (normalized DLT),
+    mapping each set of points in `points_a` to the corresponding points in
+    `points_b`.
+
+    Unlike `find_homography_array`, no outliers are rejected.
+
+    Arguments
+    ---------
+
+     - `points_a`, `points_b`: `(N, M, 2)` arrays of points (`M >= 4`).
+    '''
+    points_a = np.asarray(points_a, dtype='float64')
+    points_b = np.asarray(points_b, dtype='float64')
+
+    def normalize(points):
+        # Translate centroid to origin and scale mean distance to sqrt(2).
+        centroid = points.mean(axis=1)
+        scale = np.sqrt(2) / np.maximum(np.linalg.norm(
+            points - centroid[:, np.newaxis], axis=-1).mean(axis=1), 1e-12)
+        T = np.zeros((len(points), 3, 3))
+        T[:, 0, 0] = T[:, 1, 1] = scale
+        T[:, :2, 2] = -scale[:, np.newaxis] * centroid
+        T[:, 2, 2] = 1
+        return map_points(T, points), T
+
+    normalized_a, T_a = normalize(points_a)
+    normalized_b, T_b = normalize(points_b)
+    x, y = normalized_a[..., 0], normalized_a[..., 1]
+    u, v = normalized_b[..., 0], normalized_b[..., 1]
+    ones, zeros = np.ones_like(x), np.zeros_like(x)
+    A = np.concatenate([
+        np.stack([x, y, ones, zeros, zeros, zeros, -x * u, -y * u, -u],
+                 axis=-1),
+        np.stack([zeros, zeros, zeros, x, y, ones, -x * v, -y * v, -v],
+                 axis=-1)], axis=1)
+    # Solution is the right singular vector of the smallest singular value
+    # (the `(2M, 2M)` left singular vectors are not needed).
+    H = np.linalg.svd(A, full_matrices=False)[2][:, -1].reshape(-1, 3, 3)
+    H = np.linalg.inv(T_b) @ H @ T_a
+    return H / H[:, 2:, 2:]
+
+
+def map_points(map_arr, points):
+    '''
+    Return points mapped through homography (or stack of homographies)
+    `map_arr`, as a single vectorized operation.
+
+    Arguments
+    ---------
+
+     - `map_arr`: `(3, 3)` homography, or `(N, 3, 3)` stack of homographies.
+     - `points`: `(..., 2)` array of points.  For a stack of homographies,
+       `(N, M, 2)` (i.e., `M` points per homography) or `(M, 2)` (same points
+       for every homography).
+    '''
+    map_arr = np.asarray(map_arr, dtype='float64')
+    points = np.asarray(points, dtype='float64')
+    # Apply `[x', y', w'] = H * [x, y, 1]` as `H[:, :2] * [x, y] + H[:, 2]`
+    # to avoid building homogeneous coordinates.
+    linear = np.swapaxes(map_arr[..., :2], -1, -2)
+    offset = map_arr[..., 2]
+    if map_arr.ndim == 3:
+        offset = offset[:, np.newaxis]
+    mapped = points @ linear + offset
+    return mapped[..., :2] / mapped[..., 2:]
+
+
+def cvwarp_mats_to_4x4(warp_arrs):
+    '''
+    Return `(N, 4, 4)` stack of 3D transforms for `(N, 3, 3)` stack of 2D
+    perspective transforms (see `cvwarp_mat_to_4x4`).
+    '''
+    warp_arrs = np.asarray(warp_arrs).reshape(-1, 3, 3)
+    warp_arrs4x4 = np.zeros((len(warp_arrs), 4, 4), dtype='float32')
+    warp_arrs4x4[:, 2, 2] = warp_arrs4x4[:, 3, 3] = 1
+    warp_arrs4x4[:, :2, :2] = warp_arrs[:, :2, :2]
+    warp_arrs4x4[:, -1, :2] = warp_arrs[:, -1, :2]
+    warp_arrs4x4[:, :2, -1] = warp_arrs[:, :2, -1]
+    return warp_arrs4x4
+
+
 def cvwarp_mat_to_4x4(warp_arr):
-    warp_arr4x4 = np.identity(4, dtype='f32')
-    warp_arr4x4[:2, :2] = warp_arr[:2, :2]
-    warp_arr4x4[-1, :2] = warp_arr[-1, :2]
-    warp_arr4x4[:2, -1] = warp_arr[:2, -1]
-    return warp_arr4x4
+    return cvwarp_mats_to_4x4(warp_arr)[0]
@@ -0,0 +1,296 @@
+'''
+Capture/writer backends.
+
+All capture and video writer calls in `camera_capture`, `recorder`,
+`frame_grabber` and `video` go through a backend:
+
+ - `LegacyBackend` (`'legacy'`): legacy `cv` API (`cv.CaptureFromCAM`,
+   `cv.GrabFrame`, `cv.RetrieveFrame`, `cv.WriteFrame`, ...).  Frames are
+   `IplImage` objects.
+ - `CV2Backend` (`'cv2'`): `cv2.VideoCapture` and `cv2.VideoWriter`.  Frames
+   are NumPy arrays end to end, so no `IplImage` <-> `ndarray` conversion is
+   needed.
+
+The default backend is `'legacy'`, unless the `OPENCV_HELPERS_BACKEND`
+environment variable is set (e.g., to `'cv2'`), or the legacy `cv` module is
+not available (OpenCV 3+), in which case it is `'cv2'`.  Code that only has a capture
+handle can use `backend_for_capture` to find the backend that created it.
+'''
+import os
+import re
+
+import numpy as np
+
+from .safe_cv import cv, cv2
+from .silence import Silence
+
+
+class LegacyBackend(object):
+    name = 'legacy'
+
+    def __init__(self):
+        self._captureprop_name2code = None
+
+    def captureprop_name2code(self):
+        '''
+        Return mapping from `CV_CAP_PROP_*` property names to property codes
+        (computed once per backend, on first call).
+        '''
+        if self._captureprop_name2code is None:
+            self._captureprop_name2code = dict(
+                [(v, getattr(cv, v)) for v in dir(cv)
+                 if re.search(r'^CV_CAP_PROP_', v)])
+        return self._captureprop_name2code
+
+    def capture_from_cam(self, source):
+        return cv.CaptureFromCAM(source)
+
+    def capture_from_file(self, source):
+        return cv.CaptureFromFile(source)
+
+    def grab(self, cap):
+        return bool(cv.GrabFrame(cap))
+
+    def retrieve(self, cap):
+        '''
+        Return last grabbed frame, or `None`.
+        '''
+        frame = cv.RetrieveFrame(cap)
+        if not frame:
+            return None
+        return frame
+
+    def read(self, cap):
+        '''
+        Grab and return the next frame, or `None`.
+        '''
+        if not self.grab(cap):
+            return None
+        return self.retrieve(cap)
+
+    def retrieve_into(self, cap, out, grayscale=False):
+        '''
+        Retrieve last grabbed frame into `uint8` array `out` (`(H, W, 3)`, or
+        `(H, W, 1)` if `grayscale` is `True`).  Returns `False` if no frame is
+        available.
+        '''
+        frame = cv.RetrieveFrame(cap)
+        if not frame:
+            return False
+        # CvMat header over `out`, so OpenCV writes in place.
+        out_mat = cv.fromarray(out)
+        if grayscale:
+            cv.CvtColor(frame, out_mat, cv.CV_BGR2GRAY)
+        else:
+            cv.Copy(frame, out_mat)
+        return True
+
+    def get_properties(self, cap, names):
+        '''
+        Return dictionary of values of the listed `CV_CAP_PROP_*` properties.
+        '''
+        name2code = self.captureprop_name2code()
+        with Silence():
+            return dict([(k, cv.GetCaptureProperty(cap, name2code[k]))
+                         for k in names])
+
+    def set_property(self, cap, name, value):
+        return cv.SetCaptureProperty(cap, self.captureprop_name2code()[name],
+                                     value)
+
+    def fourcc(self, codec):
+        if codec is None:
+            return -1
+        return cv.CV_FOURCC(*codec)
+
+    def create_writer(self, output_path, fourcc, fps, dimensions,
+                      is_color=True):
+        return cv.CreateVideoWriter(output_path, fourcc, fps,
+                                    tuple(dimensions), is_color)
+
+    def write(self, writer, frame):
+        return cv.WriteFrame(writer, frame)
+
+    def release(self, obj):
+        # Legacy captures/writers are released when garbage collected.
+        pass
+
+    def to_array(self, frame):
+        '''
+        Return NumPy view of a frame.
+        '''
+        return np.asarray(cv.GetMat(frame))
+
+    def from_array(self, a):
+        '''
+        Return frame of this backend viewing NumPy array `a` (no data is
+        copied).
+        '''
+        return cv.fromarray(a)
+
+    def frame_dimensions(self, frame):
+        return (frame.width, frame.height)
+
+
+class CV2Backend(LegacyBackend):
+    name = 'cv2'
+
+    def captureprop_name2code(self):
+        # Property names are kept in the legacy `CV_CAP_PROP_*` form.  OpenCV
+        # 3+ provides `cv2.CAP_PROP_*`, 2.4 provides `cv2.cv.CV_CAP_PROP_*`.
+        if self._captureprop_name2code is None:
+            if hasattr(cv2, 'CAP_PROP_FPS'):
+                self._captureprop_name2code = dict(
+                    [('CV_' + v, getattr(cv2, v)) for v in dir(cv2)
+                     if re.search(r'^CAP_PROP_', v)])
+            else:
+                self._captureprop_name2code = dict(
+                    [(v, getattr(cv2.cv, v)) for v in dir(cv2.cv)
+                     if re.search(r'^CV_CAP_PROP_', v)])
+        return self._captureprop_name2code
+
+    def capture_from_cam(self, source):
+        return cv2.VideoCapture(source)
+
+    def capture_from_file(self, source):
+        return cv2.VideoCapture(str(source))
+
+    def grab(self, cap):
+        return cap.grab()
+
+    def retrieve(self, cap):
+        success, frame = cap.retrieve()
+        if not success:
+            return None
+        return frame
+
+    def read(self, cap):
+        success, frame = cap.read()
+        if not success:
+            return None
+        return frame
+
+    def retrieve_into(self, cap, out, grayscale=False):
+        if grayscale:
+            success, frame = cap.retrieve()
+            if not success:
+                return False
+            cv2.cvtColor(frame, getattr(cv2, 'COLOR_BGR2GRAY', 6),
+                         dst=out[:, :, 0])
+            return True
+        success, frame = cap.retrieve(out)
+        if success and frame is not out:
+            out[:] = frame.reshape(out.shape)
+        return success
+
+    def get_properties(self, cap, names):
+        name2code = self.captureprop_name2code()
+        return dict([(k, cap.get(name2code[k])) for k in names])
+
+    def set_property(self, cap, name, value):
+        return cap.set(self.captureprop_name2code()[name], value)
+
+    def fourcc(self, codec):
+        if codec is None:
+            return -1
+        if hasattr(cv2, 'VideoWriter_fourcc'):
+            return cv2.VideoWriter_fourcc(*codec)
+        return cv2.cv.CV_FOURCC(*codec)
+
+    def create_writer(self, output_path, fourcc, fps, dimensions,
+                      is_color=True):
+        return cv2.VideoWriter(str(output_path), fourcc, fps,
+                               tuple(dimensions), is_color)
+
+    def write(self, writer, frame):
+        return writer.write(frame)
+
+    def release(self, obj):
+        obj.release()
+
+    def to_array(self, frame):
+        return frame
+
+    def from_array(self, a):
+        return a
+
+    def frame_dimensions(self, frame):
+        return (frame.shape[1], frame.shape[0])
+
+
+BACKENDS = {'legacy': LegacyBackend, 'cv2': CV2Backend}
+_backends = {}
+
+
+def get_backend(backend=None):
+    '''
+    Return backend instance.
+
+    Arguments
+    ---------
+
+     - `backend`: Backend name (`'legacy'` or `'cv2'`), backend instance, or
+       `None` for the default backend (see module docstring).
+
+    Raises `ImportError` if the `'legacy'` backend is requested, but the
+    legacy `cv` module is not available.
+    '''
+    if backend is None:
+        backend = os.environ.get('OPENCV_HELPERS_BACKEND',
+                                 'cv2' if cv is None else 'legacy')
+    if not isinstance(backend, str):
+        return backend
+    if backend not in BACKENDS:
+        raise ValueError('Invalid backend: %s' % backend)
+    if backend == 'legacy' and cv is None:
+        raise ImportError('The legacy backend requires the legacy `cv` '
+                          'module (OpenCV < 3).')
+    if backend not in _backends:
+        _backends[backend] = BACKENDS[backend]()
+    return _backends[backend]
+
+
+def backend_for_capture(cap):
+    '''
+    Return the backend that created capture `cap`.
+    '''
+    if cv is None or isinstance(cap, cv2.VideoCapture):
+        return get_backend('cv2')
+    return get_backend('legacy')
+
+
+def benchmark(source, frame_count=200):
+    '''
+    Compare time to read `frame_count` frames from video file `source` as
+    NumPy arrays with each backend.
+    '''
+    from datetime import datetime
+
+    results = {}
+    for name in sorted(BACKENDS):
+        if name == 'legacy' and cv is None:
+            continue
+        backend = get_backend(name)
+        cap = backend.capture_from_file(source)
+        start = datetime.now()
+        frames = 0
+        for i in range(frame_count):
+            frame = backend.read(cap)
+            if frame is None:
+                break
+            backend.to_array(frame)
+            frames += 1
+        duration = (datetime.now() - start).total_seconds()
+        backend.release(cap)
+        results[name] = frames / duration if duration > 0 else float('inf')
+        print('%-8s %6d frames  %8.1f fps' % (name, frames, results[name]))
+    return results
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) != 2:
+        print('usage: %s <video file>' % sys.argv[0])
+        raise SystemExit
+    benchmark(sys.argv[1])
@@ -0,0 +1,150 @@
+'''
+Pool of reusable OpenCV image/matrix buffers.
+
+Per-frame processing (resizing, colour conversion, warping) otherwise creates
+a new image for every frame.  A `BufferPool` keeps released buffers, keyed by
+size and type, and hands them out again on request, so steady-state
+processing does not allocate.
+
+    >>> pool = BufferPool()
+    >>> resized = resize(frame, 320, 240, pool=pool)
+    >>> ...
+    >>> pool.release(resized)
+
+Retention is bounded: when the released buffers exceed `max_buffers` or
+`max_bytes`, buffers of the least recently used size/type are dropped.
+'''
+from collections import OrderedDict
+import threading
+
+from .safe_cv import cv
+
+
+def _image_key(size, depth, channels):
+    return ('image', tuple(size), depth, channels)
+
+
+def _mat_key(rows, cols, type_):
+    return ('mat', rows, cols, type_)
+
+
+def _buffer_key(buf):
+    if hasattr(buf, 'depth'):
+        # `IplImage`
+        return _image_key((buf.width, buf.height), buf.depth, buf.channels)
+    return _mat_key(buf.rows, buf.cols, buf.type)
+
+
+def _buffer_bytes(buf):
+    if hasattr(buf, 'depth'):
+        return buf.width * buf.height * buf.channels * ((buf.depth & 0xFF)
+                                                        // 8)
+    return buf.rows * buf.step
+
+
+class BufferPool(object):
+    def __init__(self, max_buffers=32, max_bytes=256 * 1024 * 1024):
+        '''
+        Arguments
+        ---------
+
+         - `max_buffers`: Maximum number of released buffers to retain.
+         - `max_bytes`: Maximum total size of released buffers to retain.
+        '''
+        self.max_buffers = max_buffers
+        self.max_bytes = max_bytes
+        # Released buffers, keyed by size/type, in least recently used order.
+        self._free = OrderedDict()
+        self.free_count = 0
+        self.free_bytes = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self, key):
+        with self._lock:
+            buffers = self._free.get(key)
+            if not buffers:
+                return None
+            buf = buffers.pop()
+            if not buffers:
+                del self._free[key]
+            else:
+                self._free.move_to_end(key)
+            self.free_count -= 1
+            self.free_bytes -= _buffer_bytes(buf)
+            return buf
+
+    def acquire_image(self, size, depth, channels):
+        '''
+        Return `IplImage` of the requested type, reusing a released image if
+        possible.  Contents are undefined.
+        '''
+        buf = self._acquire(_image_key(size, depth, channels))
+        if buf is None:
+            buf = cv.CreateImage(tuple(size), depth, channels)
+        return buf
+
+    def acquire_mat(self, rows, cols, type_):
+        '''
+        Return `CvMat` of the requested type, reusing a released matrix if
+        possible.  Contents are undefined.
+        '''
+        buf = self._acquire(_mat_key(rows, cols, type_))
+        if buf is None:
+            buf = cv.CreateMat(rows, cols, type_)
+        return buf
+
+    def acquire_like(self, im):
+        '''
+        Return image/matrix with the same size and type as `im`.
+        '''
+        if hasattr(im, 'depth'):
+            return self.acquire_image((im.width, im.height), im.depth,
+                                      im.channels)
+        return self.acquire_mat(im.rows, im.cols, im.type)
+
+    def release(self, buf):
+        '''
+        Return a buffer to the pool.  The buffer must not be used by the
+        caller afterwards.
+
+        Raises `ValueError` if the buffer has already been released (it
+        would otherwise be handed out twice).
+        '''
+        key = _buffer_key(buf)
+        with self._lock:
+            buffers = self._free.setdefault(key, [])
+            if any(b is buf for b in buffers):
+                raise ValueError('Buffer has already been released.')
+            buffers.append(buf)
+            self._free.move_to_end(key)
+            self.free_count += 1
+            self.free_bytes += _buffer_bytes(buf)
+            self._evict()
+
+    def _evict(self):
+        while self._free and (self.free_count > self.max_buffers or
+                              self.free_bytes > self.max_bytes):
+            key, buffers = next(iter(self._free.items()))
+            buf = buffers.pop(0)
+            if not buffers:
+                del self._free[key]
+            self.free_count -= 1
+            self.free_bytes -= _buffer_bytes(buf)
+
+    def clear(self):
+        with self._lock:
+            self._free.clear()
+            self.free_count = 0
+            self.free_bytes = 0
+
+
+def get_image_buffer(size, depth, channels, dst=None, pool=None):
+    '''
+    Return destination image for helpers accepting `dst`/`pool` arguments:
+    `dst` if given, otherwise an image from `pool`, otherwise a new image.
+    '''
+    if dst is not None:
+        return dst
+    if pool is not None:
+        return pool.acquire_image(size, depth, channels)
+    return cv.CreateImage(tuple(size), depth, channels)
@@ -6,6 +6,7 @@ import numpy as np
 from .video import CVCaptureProperties
 from .recorder import CVCaptureConfig, cv, RecordFrameRateInfo
 from .frame_rate import FrameRateInfo
+from .backend import get_backend
 
 
 class CaptureError(Exception):
@@ -90,43 +91,66 @@ class CameraCaptureBase(object):
 
 
 class CVCameraCapture(CameraCaptureBase):
-    def __init__(self, id=None, auto_init=False):
+    def __init__(self, id=None, auto_init=False, backend=None):
+        '''
+        Arguments
+        ---------
+
+         - `id`: Camera id (default: any camera).
+         - `auto_init`: Initialize capture on construction.
+         - `backend`: Capture backend name (see `backend.get_backend`).  With
+           the `'cv2'` backend, `get_frame` returns NumPy arrays.
+        '''
         if id is None:
             self.id = -1
         else:
             self.id = id
-        self.cap_config = CVCaptureConfig(self.id, type_='camera')
+        self.backend = get_backend(backend)
+        self.cap_config = CVCaptureConfig(self.id, type_='camera',
+                                          backend=self.backend)
         self.cap = None
         self.props = None
         super(CVCameraCapture, self).__init__(auto_init=auto_init)
 
     def _release_capture(self):
         if self.cap is not None:
+            self.backend.release(self.cap)
             del self.cap
-        if self.props is not None:
-            del self.props
+            self.cap = None
+        self.props = None
 
     def _init_capture(self):
         self.cap = self.cap_config.create_capture()
 
     def get_frame(self):
-        cv.GrabFrame(self.cap)
-        frame = cv.RetrieveFrame(self.cap)
-        if frame:
-            return frame
-        else:
-            return None
+        self.backend.grab(self.cap)
+        return self.backend.retrieve(self.cap)
 
     def _set_dimensions(self, dimensions):
-        cv.SetCaptureProperty(self.cap, cv.CV_CAP_PROP_FRAME_WIDTH, dimensions[0])
-        cv.SetCaptureProperty(self.cap, cv.CV_CAP_PROP_FRAME_HEIGHT, dimensions[1])
+        self.backend.set_property(self.cap, 'CV_CAP_PROP_FRAME_WIDTH',
+                                  dimensions[0])
+        self.backend.set_property(self.cap, 'CV_CAP_PROP_FRAME_HEIGHT',
+                                  dimensions[1])
+        if self.props is not None:
+            self.props.invalidate(['CV_CAP_PROP_FRAME_WIDTH',
+                                   'CV_CAP_PROP_FRAME_HEIGHT'])
         self._dimensions = dimensions
 
+    def get_props(self):
+        '''
+        Return (lazy, cached) properties of the current capture.
+        '''
+        if self.props is None or self.props.cap is not self.cap:
+            self.props = CVCaptureProperties(self.cap, self.backend)
+        return self.props
+
     @property
     def dimensions(self):
         if self._dimensions is None:
-            self.props = CVCaptureProperties(self.cap)
-            self._dimensions = (self.props.width, self.props.height)
+            props = self.get_props()
+            props.refresh(['CV_CAP_PROP_FRAME_WIDTH',
+                           'CV_CAP_PROP_FRAME_HEIGHT'])
+            self._dimensions = (props.width, props.height)
         return self._dimensions
 
 
@@ -0,0 +1,131 @@
+'''
+Conversions between legacy OpenCV images/matrices, NumPy arrays and GTK
+pixbufs.
+
+Conversions share memory (i.e., return views/headers rather than copies)
+wherever the memory layout allows it:
+
+ - `cv2array`: NumPy view of an `IplImage`/`CvMat` (via `cv.GetMat` and the
+   array interface), with the row stride of the OpenCV image.
+ - `array2cv`: `IplImage` header over the memory of a NumPy array.  A copy is
+   only made if the array rows are not contiguous.
+ - `array2mat`: `CvMat` header over the memory of a NumPy array.
+'''
+import numpy as np
+
+from .safe_cv import cv
+
+
+def cv2array(im):
+    '''
+    Return `(height, width, channels)` NumPy view of an OpenCV image or
+    matrix (no data is copied).
+
+    Arguments
+    ---------
+
+     - `im`: OpenCV `IplImage` or `CvMat`.
+    '''
+    a = np.asarray(cv.GetMat(im))
+    if a.ndim == 2:
+        a = a[:, :, np.newaxis]
+    return a
+
+
+def _contiguous_rows(a):
+    '''
+    Return `a`, or a copy of `a` if its pixels are not packed within each row
+    (OpenCV headers support arbitrary row strides only).
+    '''
+    if a.ndim == 3:
+        pixel_strides = (a.shape[2] * a.itemsize, a.itemsize)
+        contiguous = (a.strides[1:] == pixel_strides) or a.shape[2] == 1 \
+            and a.strides[1] == a.itemsize
+    else:
+        contiguous = (a.strides[1] == a.itemsize)
+    if contiguous and a.strides[0] > 0:
+        return a
+    return np.ascontiguousarray(a)
+
+
+def array2mat(a):
+    '''
+    Return `CvMat` header sharing the memory of NumPy array `a`.
+
+    Arguments
+    ---------
+
+     - `a`: `(rows, cols)` or `(rows, cols, channels)` array.
+    '''
+    return cv.fromarray(_contiguous_rows(a))
+
+
+def array2cv(a):
+    '''
+    Return `IplImage` header sharing the memory of NumPy array `a`.
+
+    Arguments
+    ---------
+
+     - `a`: `(rows, cols)` or `(rows, cols, channels)` array.
+    '''
+    return cv.GetImage(array2mat(a))
+
+
+def bgr2rgb_view(a):
+    '''
+    Return channel-reversed (BGR <-> RGB) view of a 3-channel array.
+    '''
+    if a.ndim == 3 and a.shape[2] == 3:
+        return a[:, :, ::-1]
+    return a
+
+
+def pixbuf2array(p):
+    '''
+    Return `(height, width, channels)` NumPy view of the pixels of a
+    `gtk.gdk.Pixbuf` (no data is copied).
+    '''
+    return p.get_pixels_array()
+
+
+def array2pixbuf(a):
+    '''
+    Return `gtk.gdk.Pixbuf` with the contents of RGB(A) `uint8` array `a`.
+    '''
+    import gtk
+
+    if a.dtype != np.uint8:
+        raise ValueError('Pixbufs only support uint8 data.')
+    return gtk.gdk.pixbuf_new_from_array(np.ascontiguousarray(a),
+                                         gtk.gdk.COLORSPACE_RGB, 8)
+
+
+def benchmark(shape=(480, 640, 3), repeat=100):
+    '''
+    Compare time to round-trip a frame through an OpenCV image as views
+    against conversions through `tostring()` (see `test_cv_array` for checks
+    of the conversions).
+    '''
+    from timeit import timeit
+
+    a = np.random.randint(0, 255, size=shape).astype('uint8')
+
+    def legacy_round_trip():
+        header = cv.CreateImageHeader((shape[1], shape[0]), cv.IPL_DEPTH_8U,
+                                      shape[2])
+        cv.SetData(header, a.tostring(), a.dtype.itemsize * shape[2] *
+                   shape[1])
+        return np.fromstring(header.tostring(),
+                             dtype='uint8').reshape(shape)
+
+    results = {'tostring': timeit(legacy_round_trip, number=repeat) / repeat,
+               'view': timeit(lambda: cv2array(array2cv(a)),
+                              number=repeat) / repeat}
+    for name, seconds in sorted(results.items()):
+        print('%-10s %8.1f us per round trip' % (name, 1e6 * seconds))
+    return results
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,197 @@
+'''
+Incremental tracking of camera drift relative to a registration.
+
+Small camera bumps shift the camera image relative to the reference frame a
+registration homography (e.g., the `map_mat` of `ImageRegistrationTask`) was
+computed for.  Rather than registering again, a `DriftTracker` estimates the
+shift of every `interval`-th frame against the reference frame by phase
+correlation on a downsampled pyramid level, and updates the homography by the
+estimated translation.
+
+    >>> tracker = DriftTracker(reference_frame, registration.map_mat,
+    ...                        lock=registration.map_lock, on_drift=log_drift)
+    >>> tracker.attach(frame_grabber)
+    >>> tracker.start()
+
+Each estimate reports the drift magnitude (in pixels of the full-size frame)
+and a confidence (the phase correlation peak response, in `[0, 1]`).  The
+homography is only updated for estimates with at least `min_confidence`.
+'''
+from collections import namedtuple
+import logging
+import threading
+
+import numpy as np
+
+from .safe_cv import cv, cv2
+from .cv_array import cv2array, array2mat
+
+
+logger = logging.getLogger(__name__)
+
+
+DriftEstimate = namedtuple('DriftEstimate', 'dx dy magnitude confidence '
+                           'map_array')
+
+
+class DriftTracker(object):
+    def __init__(self, reference_frame, map_mat, interval=10, level=2,
+                 min_confidence=0.2, on_drift=None, lock=None):
+        '''
+        Arguments
+        ---------
+
+         - `reference_frame`: Frame (OpenCV image or NumPy array) `map_mat`
+           was registered against.
+         - `map_mat`: 3x3 homography (`CvMat` or array) mapping overlay to
+           frame coordinates.  If a `CvMat`, it is updated in place with each
+           confident estimate.
+         - `interval`: Estimate drift on every `interval`-th frame.
+         - `level`: Pyramid level to compare frames at (each level halves
+           the frame size).
+         - `min_confidence`: Minimum confidence to update the homography.
+         - `on_drift`: Optional callback, called with each `DriftEstimate`.
+         - `lock`: Lock held while `map_mat` is updated (e.g., the
+           `map_lock` of `ImageRegistrationTask`), since estimates may be
+           computed in a background thread while `map_mat` is read by
+           another (default: a new lock).
+        '''
+        self.interval = interval
+        self.level = level
+        self.min_confidence = min_confidence
+        self.on_drift = on_drift
+        self.map_mat = map_mat
+        self.lock = lock if lock is not None else threading.Lock()
+        self.reference_map = np.asarray(map_mat, dtype='float64')\
+            .reshape(3, 3).copy()
+        self.map_array = self.reference_map.copy()
+        self._reference = self._downsample(reference_frame)
+        self._window = cv2.createHanningWindow(self._reference.shape[::-1],
+                                               cv2.CV_32F)
+        self.frame_count = 0
+        self.last_estimate = None
+        self._pending = None
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def _downsample(self, frame):
+        if not isinstance(frame, np.ndarray):
+            frame = cv2array(frame)
+        if frame.ndim == 3 and frame.shape[2] == 1:
+            frame = frame[:, :, 0]
+        elif frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        for i in range(self.level):
+            frame = cv2.pyrDown(frame)
+        return frame.astype('float32')
+
+    def _set_map(self, map_array):
+        with self.lock:
+            self.map_array = map_array
+            if isinstance(self.map_mat, np.ndarray):
+                self.map_mat[:] = map_array
+            else:
+                cv.Convert(array2mat(map_array), self.map_mat)
+
+    def estimate(self, frame):
+        '''
+        Return `DriftEstimate` of `frame` relative to the reference frame,
+        and update the homography if the estimate is confident.
+        '''
+        (dx, dy), confidence = cv2.phaseCorrelate(self._reference,
+                                                  self._downsample(frame),
+                                                  self._window)
+        scale = 2 ** self.level
+        dx, dy = dx * scale, dy * scale
+        if confidence >= self.min_confidence:
+            # Frame content moved by `(dx, dy)`, so overlay points map to
+            # frame points shifted by the same amount.
+            translation = np.array([[1., 0, dx], [0, 1., dy], [0, 0, 1.]])
+            self._set_map(translation.dot(self.reference_map))
+        estimate = DriftEstimate(dx, dy, np.hypot(dx, dy), confidence,
+                                 self.map_array)
+        self.last_estimate = estimate
+        logger.debug('[DriftTracker] drift=(%.1f, %.1f) confidence=%.2f',
+                     dx, dy, confidence)
+        if self.on_drift:
+            self.on_drift(estimate)
+        return estimate
+
+    def update(self, frame):
+        '''
+        Count `frame`, and return `DriftEstimate` if it is an
+        `interval`-th frame (otherwise, `None`).
+
+        If the tracker thread is running (see `start`), the estimate is
+        computed in the background (replacing any frame still waiting to be
+        processed) and `None` is returned.
+        '''
+        self.frame_count += 1
+        if (self.frame_count - 1) % self.interval:
+            return None
+        if self._running:
+            with self._condition:
+                # Frames may be reused by the caller, so keep a copy.
+                self._pending = np.array(frame if isinstance(frame,
+                                                             np.ndarray)
+                                         else cv2array(frame))
+                self._condition.notify()
+            return None
+        return self.estimate(frame)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and self._pending is None:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                frame, self._pending = self._pending, None
+            self.estimate(frame)
+
+    def start(self):
+        '''
+        Estimate drift of frames passed to `update` in a background thread.
+        '''
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self._thread.join()
+        self._thread = None
+
+    def reset(self, reference_frame=None, map_mat=None):
+        '''
+        Reset drift, optionally with a new reference frame/registration.
+        '''
+        if map_mat is not None:
+            self.map_mat = map_mat
+            self.reference_map = np.asarray(map_mat, dtype='float64')\
+                .reshape(3, 3).copy()
+        self._set_map(self.reference_map.copy())
+        if reference_frame is not None:
+            self._reference = self._downsample(reference_frame)
+            self._window = cv2.createHanningWindow(
+                self._reference.shape[::-1], cv2.CV_32F)
+        self.last_estimate = None
+
+    def attach(self, frame_grabber):
+        '''
+        Track drift of frames received by `frame_grabber` (a
+        `FrameGrabber`).
+
+        Other callbacks of `frame_grabber` are kept.  Returns the callback,
+        which may be passed to `frame_grabber.remove_frame_callback`.
+        '''
+        return frame_grabber.add_frame_callback(lambda frame, time_:
+                                                self.update(frame))
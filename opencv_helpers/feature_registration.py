@@ -0,0 +1,179 @@
+'''
+Automatic (feature-based) image registration.
+
+Instead of clicking four corresponding points on the overlay and the image
+(see `overlay_registration`), the homography is estimated from ORB keypoints
+matched between the two images and filtered with RANSAC.
+
+To keep registration of full frames well under a second, keypoints are first
+matched on a downscaled copy of both images.  The coarse homography is then
+refined at successively finer pyramid levels, only accepting matches that
+agree with the estimate from the previous level, until either the full
+resolution is reached or the time budget is used up.
+'''
+import logging
+import time
+
+import numpy as np
+
+from .safe_cv import cv2
+from .cv_array import cv2array
+
+
+logger = logging.getLogger(__name__)
+
+
+def _as_gray(im):
+    '''
+    Return single-channel `uint8` NumPy array for image `im` (OpenCV image or
+    NumPy array).
+    '''
+    if not isinstance(im, np.ndarray):
+        im = cv2array(im)
+    if im.ndim == 3 and im.shape[2] == 1:
+        im = im[:, :, 0]
+    elif im.ndim == 3:
+        im = cv2.cvtColor(im, cv2.COLOR_BGR2GRAY)
+    return im
+
+
+def _pyramid(im, min_size):
+    '''
+    Return list of images, from `im` halving in size until the longest side
+    is at most `min_size`.  The coarsest level is last.
+    '''
+    levels = [im]
+    while max(levels[-1].shape[:2]) > min_size:
+        levels.append(cv2.pyrDown(levels[-1]))
+    return levels
+
+
+def _scale(H, factor):
+    '''
+    Return homography `H` rescaled for images scaled by `factor`.
+    '''
+    S = np.diag([factor, factor, 1.])
+    return S.dot(H).dot(np.linalg.inv(S))
+
+
+def _match(detector, matcher, overlay, image):
+    overlay_keypoints, overlay_descriptors = detector.detectAndCompute(
+        overlay, None)
+    image_keypoints, image_descriptors = detector.detectAndCompute(image,
+                                                                   None)
+    if overlay_descriptors is None or image_descriptors is None:
+        return np.empty((0, 2)), np.empty((0, 2))
+    matches = matcher.match(overlay_descriptors, image_descriptors)
+    overlay_points = np.float32([overlay_keypoints[m.queryIdx].pt
+                                 for m in matches]).reshape(-1, 2)
+    image_points = np.float32([image_keypoints[m.trainIdx].pt
+                               for m in matches]).reshape(-1, 2)
+    return overlay_points, image_points
+
+
+def _project(H, points):
+    points = np.hstack([points, np.ones((len(points), 1))]).dot(H.T)
+    return points[:, :2] / points[:, 2:]
+
+
+def find_feature_homography(overlay, image, max_features=1000, min_size=320,
+                            time_budget=0.5, ransac_threshold=3.,
+                            search_radius=8., min_matches=10):
+    '''
+    Return 3x3 homography mapping `overlay` coordinates to `image`
+    coordinates (i.e., as filled into `ImageRegistrationTask.map_mat` by
+    clicking corresponding points), or `None` if registration failed.
+
+    Arguments
+    ---------
+
+     - `overlay`, `image`: OpenCV images or NumPy arrays.
+     - `max_features`: Maximum number of ORB keypoints per image and level.
+     - `min_size`: Maximum length of the longest side of the coarsest pyramid
+       level.
+     - `time_budget`: Skip refinement at finer levels that are not expected
+       to finish within this many seconds (from the start of the call).  The
+       coarsest level is always matched.
+     - `ransac_threshold`: Maximum reprojection error (in pixels of each
+       level) for RANSAC inliers.
+     - `search_radius`: At finer levels, maximum distance (in pixels of the
+       level) between a match and its position predicted by the previous
+       estimate.
+     - `min_matches`: Minimum number of inliers to accept a homography.
+    '''
+    start = time.time()
+    overlay_levels = _pyramid(_as_gray(overlay), min_size)
+    image_levels = _pyramid(_as_gray(image), min_size)
+    level_count = min(len(overlay_levels), len(image_levels))
+
+    detector = cv2.ORB_create(nfeatures=max_features)
+    matcher = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
+
+    H = None
+    level_duration = 0
+    for level in range(level_count - 1, -1, -1):
+        # Each level has four times the pixels of the previous level.
+        level_start = time.time()
+        if H is not None and (level_start - start + 4 * level_duration >
+                              time_budget):
+            logger.debug('[find_feature_homography] time budget exceeded, '
+                         'stopping at level %d', level + 1)
+            break
+        overlay_points, image_points = _match(detector, matcher,
+                                              overlay_levels[level],
+                                              image_levels[level])
+        if H is not None and len(overlay_points):
+            # Estimate from coarser level, scaled to this level.
+            predicted = _scale(H, 2.)
+            error = np.linalg.norm(_project(predicted, overlay_points) -
+                                   image_points, axis=1)
+            consistent = error < search_radius
+            overlay_points = overlay_points[consistent]
+            image_points = image_points[consistent]
+        if len(overlay_points) < max(4, min_matches):
+            if H is None:
+                return None
+            # Keep coarser estimate, scaled to this level.
+            H = _scale(H, 2.)
+            continue
+        level_H, mask = cv2.findHomography(overlay_points, image_points,
+                                           cv2.RANSAC, ransac_threshold)
+        if level_H is None or mask.sum() < min_matches:
+            if H is None:
+                return None
+            H = _scale(H, 2.)
+            continue
+        H = level_H
+        level_duration = time.time() - level_start
+        logger.debug('[find_feature_homography] level %d: %d/%d inliers',
+                     level, mask.sum(), len(mask))
+    else:
+        level = -1
+    # Scale estimate from the last level processed to full resolution.
+    return _scale(H, 2. ** (level + 1))
+
+
+def parse_args():
+    """Parses arguments, returns ``(options, args)``."""
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="""\
+Register image to overlay using ORB features, print homography.""",
+                           )
+    parser.add_argument(dest='overlay', type=str)
+    parser.add_argument(dest='image', type=str)
+    parser.add_argument('-t', '--time_budget', type=float, default=0.5)
+    args = parser.parse_args()
+
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    overlay = cv2.imread(args.overlay)
+    image = cv2.imread(args.image)
+    start = time.time()
+    H = find_feature_homography(overlay, image,
+                                time_budget=args.time_budget)
+    print('%.1f ms' % (1e3 * (time.time() - start)))
+    print(H)
@@ -34,41 +34,8 @@ from path_helpers import path, pickle
 import numpy as np
 
 from .video import cv
-
-
-class CVCaptureConfig(object):
-    type_names = ('camera', 'file')
-    types = namedtuple('CVCaptureTypes', type_names)(**dict([(n, i) for i, n in enumerate(type_names)]))
-
-    def __init__(self, source, type_=None):
-        self.source = source
-        if type_ is None:
-            type_ = self.types.camera
-        elif type_ not in self.types:
-            type_ = type_.strip()
-            if not type_ in self.types._fields:
-                raise ValueError('Invalid type: %s' % type_)
-            else:
-                type_ = getattr(self.types, type_)
-        self.type_ = type_
-
-    def create_capture(self):
-        if self.type_ == self.types.camera:
-            cap = cv.CaptureFromCAM(self.source)
-        elif self.type_ == self.types.file:
-            source_path = path(self.source).abspath()
-            if not source_path.exists():
-                raise IOError('Capture source path is not accessible: %s' % source_path.abspath())
-            cap = cv.CaptureFromFile(self.source)
-        else:
-            raise ValueError('Unsupported capture type: %s' % self.type_)
-        return cap
-
-    def test_capture(self):
-        cap = self.create_capture()
-        result = cv.GrabFrame(cap)
-        del cap
-        return (result == 0)
+from .recorder import CVCaptureConfig
+from .backend import get_backend
 
 
 class FrameGrabberChild(object):
@@ -77,6 +44,7 @@ class FrameGrabberChild(object):
     def __init__(self, conn, cam_cap):
         self.conn = conn
         self.cam_cap = cam_cap
+        self.backend = get_backend(getattr(cam_cap, 'backend', None))
         try:
             self.cam_cap.init_capture()
         except:
@@ -130,11 +98,10 @@ class FrameGrabberChild(object):
                     and self.state == self.STATES['RECORDING']:
                 grab_time = datetime.now()
                 frame = self.cam_cap.get_frame()
-                if frame:
+                if frame is not None:
                     # Convert frame to NumPy array so it can be pickled/sent
-                    # to parent process.
-                    mat = cv.GetMat(frame)
-                    np_frame = np.asarray(mat)
+                    # to parent process (no-op for the `cv2` backend).
+                    np_frame = self.backend.to_array(frame)
                     self.conn.send(['frame', np_frame, grab_time])
                     frames_captured += 1
             sleep(1 / self.fps_limit)
@@ -158,6 +125,8 @@ class FrameGrabber(object):
         self.current_frame = None
         self.current_time = None
         self.frame_callback = None
+        # Called after `frame_callback`, see `add_frame_callback`.
+        self.frame_callbacks = []
 
     def _pipe_pull(self):
         while True:
@@ -196,8 +165,21 @@ class FrameGrabber(object):
         if frame is not None:
             if self.frame_callback:
                 self.frame_callback(self.current_frame, self.current_time)
+            for callback in list(self.frame_callbacks):
+                callback(self.current_frame, self.current_time)
         return self.enabled
 
+    def add_frame_callback(self, callback):
+        '''
+        Call `callback(frame, time)` for each new frame, in addition to
+        `frame_callback` and previously added callbacks.
+        '''
+        self.frame_callbacks.append(callback)
+        return callback
+
+    def remove_frame_callback(self, callback):
+        self.frame_callbacks.remove(callback)
+
     def set_fps_limit(self, fps_limit):
         if self.child is None:
             return
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+'''
+Persistent frame index for video files.
+
+Scanning a video once with `build_frame_index` records, for every frame (in
+presentation order), its presentation timestamp, whether it is a keyframe and
+the byte offset of its packet in the file.  The index is stored as a NumPy
+structured array in a sidecar file next to the video
+(`<video>.index.npy`), and is used by `video.seek_frame` to jump to the
+nearest preceding keyframe and decode forward from there.
+
+Keyframe flags and byte offsets are read using `ffprobe`, if available.
+Otherwise, the video is scanned with OpenCV (see `backend`), which only
+provides timestamps.
+'''
+import logging
+import shutil
+import subprocess
+
+import numpy as np
+from path_helpers import path
+
+from .backend import get_backend
+from .silence import Silence
+
+
+FRAME_INDEX_DTYPE = np.dtype([('frame', 'u4'), ('pts_ms', 'f8'),
+                              ('keyframe', '?'), ('offset', 'i8')])
+
+
+def get_index_path(video_path):
+    return path('%s.index.npy' % path(video_path))
+
+
+def _parse_ffprobe(output):
+    '''
+    Return frame index entries from `ffprobe` compact output listing the
+    packets (`pts_time`, `pos` and `flags`) and the `start_time` of a video
+    stream, or `None` if no packet has a timestamp.
+
+    Timestamps are made relative to the start of the stream, like the
+    `CV_CAP_PROP_POS_MSEC` position of a capture.
+    '''
+    start_ms = 0.
+    packets = []
+    for line in output.splitlines():
+        section, _, line = line.strip().partition('|')
+        fields = dict(f.split('=', 1) for f in line.split('|') if '=' in f)
+        if section == 'stream':
+            if fields.get('start_time', 'N/A') != 'N/A':
+                start_ms = 1000. * float(fields['start_time'])
+            continue
+        if section != 'packet' or fields.get('pts_time', 'N/A') == 'N/A':
+            continue
+        offset = fields.get('pos', 'N/A')
+        packets.append((1000. * float(fields['pts_time']),
+                        'K' in fields.get('flags', ''),
+                        -1 if offset == 'N/A' else int(offset)))
+    if not packets:
+        return None
+
+    entries = np.empty(len(packets), dtype=FRAME_INDEX_DTYPE)
+    entries['pts_ms'], entries['keyframe'], entries['offset'] = \
+        list(zip(*packets))
+    entries['pts_ms'] -= start_ms
+    # Packets are listed in decode order; frame numbers follow presentation
+    # order.
+    entries.sort(order='pts_ms', kind='mergesort')
+    entries['frame'] = np.arange(len(entries))
+    return entries
+
+
+def _scan_ffprobe(video_path):
+    '''
+    Return frame index entries read from packet info reported by `ffprobe`,
+    or `None` if `ffprobe` is not available or fails.
+    '''
+    if shutil.which('ffprobe') is None:
+        return None
+    try:
+        output = subprocess.check_output(
+            ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+             '-show_entries', 'packet=pts_time,pos,flags:stream=start_time',
+             '-of', 'compact=nk=0', video_path])
+    except (OSError, subprocess.CalledProcessError):
+        logging.getLogger('opencv.frame_index').info('ffprobe failed on %s'
+                                                     % video_path)
+        return None
+    return _parse_ffprobe(output.decode('utf-8'))
+
+
+def _scan_capture(video_path, backend=None):
+    '''
+    Return frame index entries by grabbing every frame of the video with
+    OpenCV.  Only timestamps are available (no keyframe flags or offsets).
+    '''
+    backend = get_backend(backend)
+    cap = backend.capture_from_file(video_path)
+    pts_ms = []
+    try:
+        with Silence():
+            while backend.grab(cap):
+                pts_ms.append(backend.get_properties(
+                    cap, ['CV_CAP_PROP_POS_MSEC'])['CV_CAP_PROP_POS_MSEC'])
+    finally:
+        backend.release(cap)
+    entries = np.zeros(len(pts_ms), dtype=FRAME_INDEX_DTYPE)
+    entries['frame'] = np.arange(len(entries))
+    entries['pts_ms'] = pts_ms
+    entries['offset'] = -1
+    return entries
+
+
+class FrameIndex(object):
+    '''
+    Frame index of a video file.
+
+    `entries` is a structured array with `FRAME_INDEX_DTYPE`, one row per
+    frame.
+    '''
+    def __init__(self, entries):
+        self.entries = entries
+        self.keyframes = np.flatnonzero(entries['keyframe'])
+
+    def __len__(self):
+        return len(self.entries)
+
+    def pts_ms(self, frame):
+        return float(self.entries['pts_ms'][frame])
+
+    def preceding_keyframe(self, frame):
+        '''
+        Return the index of the last keyframe at or before `frame`.
+
+        If the index has no keyframe information, every frame is assumed to
+        be seekable and `frame` is returned.
+        '''
+        if not len(self.keyframes):
+            return frame
+        i = np.searchsorted(self.keyframes, frame, side='right') - 1
+        return int(self.keyframes[max(i, 0)])
+
+    def save(self, video_path):
+        index_path = get_index_path(video_path)
+        with open(index_path, 'wb') as output:
+            np.save(output, self.entries)
+        return index_path
+
+    @classmethod
+    def build(cls, video_path, backend=None):
+        '''
+        Scan `video_path` and return its frame index.
+
+        `backend` is used to scan the video if `ffprobe` is not available
+        (see `backend.get_backend`).
+        '''
+        entries = _scan_ffprobe(video_path)
+        if entries is None:
+            entries = _scan_capture(video_path, backend)
+        return cls(entries)
+
+    @classmethod
+    def load(cls, video_path):
+        '''
+        Load the sidecar index of `video_path`.
+
+        Returns `None` if there is no index, or if the index is older than
+        the video.
+        '''
+        video_path = path(video_path)
+        index_path = get_index_path(video_path)
+        if not index_path.isfile() or (index_path.mtime < video_path.mtime):
+            return None
+        return cls(np.load(index_path))
+
+
+def build_frame_index(video_path, overwrite=False):
+    '''
+    Scan `video_path` and write its frame index to the sidecar file, unless an
+    up to date index already exists (or `overwrite` is `True`).
+
+    Returns the `FrameIndex`.
+    '''
+    index = None if overwrite else FrameIndex.load(video_path)
+    if index is None:
+        index = FrameIndex.build(video_path)
+        index.save(video_path)
+    return index
+
+
+def parse_args():
+    """Parses arguments, returns ``(options, args)``."""
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="""\
+Write a frame index next to each video file.""",
+                           )
+    parser.add_argument('-f', '--force', dest='overwrite',
+                        action='store_true')
+    parser.add_argument(nargs='+', dest='in_files', type=str)
+    args = parser.parse_args()
+
+    args.in_files = [path(f) for f in args.in_files]
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    for in_file in args.in_files:
+        index = build_frame_index(in_file, overwrite=args.overwrite)
+        print('%s: %d frames, %d keyframes' % (get_index_path(in_file),
+                                               len(index),
+                                               len(index.keyframes)))
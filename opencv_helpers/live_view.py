@@ -0,0 +1,180 @@
+'''
+Fast live display of frames in a Matplotlib axis.
+
+Unlike `imshow`, `LiveView` creates a single `AxesImage` and updates it in
+place with `set_data`, redrawing only the image (blitting) when the canvas
+supports it.  Frames are shown through a channel-reversed (BGR -> RGB) view
+and are strided down to roughly the pixel size of the axis before being
+handed to Matplotlib.
+
+    >>> view = LiveView()
+    >>> view.play('recording.avi')
+
+or, to watch a `FrameGrabber` stream:
+
+    >>> view = LiveView()
+    >>> view.attach(frame_grabber)
+'''
+import time
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from .cv_array import cv2array, bgr2rgb_view
+from .backend import get_backend
+from .video import CVCaptureProperties
+
+
+class LiveView(object):
+    def __init__(self, axis=None, swap_channels=True, show_axis=False,
+                 max_fps=None, **kwargs):
+        '''
+        Arguments
+        ---------
+
+         - `axis`: Matplotlib axis to draw to (default: new figure).
+         - `swap_channels`: Frames are BGR (OpenCV order).
+         - `show_axis`: Show axis ticks/frame.
+         - `max_fps`: Maximum display rate.  Frames passed to `update` more
+           often are dropped.
+         - `kwargs`: Passed to `plt.subplots` when creating a new figure.
+        '''
+        if axis is None:
+            fig, axis = plt.subplots(**kwargs)
+        self.axis = axis
+        self.canvas = axis.figure.canvas
+        self.swap_channels = swap_channels
+        self.show_axis = show_axis
+        self.max_fps = max_fps
+        self.image = None
+        self.frame_shape = None
+        self._background = None
+        self._last_draw = None
+        self._cid = self.canvas.mpl_connect('resize_event', self._on_resize)
+
+    def _on_resize(self, event):
+        # Cached background and stride are only valid for the previous size,
+        # so recreate the image on the next update.
+        self._background = None
+        self.frame_shape = None
+
+    def _stride(self, height, width):
+        '''
+        Return integer stride reducing a `height` x `width` frame to about
+        the size of the axis in display pixels.
+        '''
+        extent = self.axis.get_window_extent()
+        if extent.width < 1 or extent.height < 1:
+            return 1
+        return max(1, int(min(width / extent.width,
+                              height / extent.height)))
+
+    def _to_rgb(self, frame):
+        if not isinstance(frame, np.ndarray):
+            frame = cv2array(frame)
+        if frame.ndim == 3 and frame.shape[2] == 1:
+            frame = frame[:, :, 0]
+        elif self.swap_channels:
+            frame = bgr2rgb_view(frame)
+        return frame
+
+    def _create_image(self, frame):
+        height, width = frame.shape[:2]
+        self.frame_shape = frame.shape
+        self.stride = self._stride(height, width)
+        data = frame[::self.stride, ::self.stride]
+        blit = getattr(self.canvas, 'supports_blit', False)
+        # Keep coordinates in full-resolution frame pixels.  Animated artists
+        # are skipped by `draw()`, so only use them when blitting.
+        self.image = self.axis.imshow(data, animated=blit,
+                                      extent=(-0.5, width - 0.5,
+                                              height - 0.5, -0.5),
+                                      cmap='gray' if frame.ndim == 2
+                                      else None)
+        if not self.show_axis:
+            self.axis.axis('off')
+        self.canvas.draw()
+        if blit:
+            # Background without the image, then draw the first frame.
+            self._background = self.canvas.copy_from_bbox(self.axis.bbox)
+            self.axis.draw_artist(self.image)
+            self.canvas.blit(self.axis.bbox)
+        else:
+            self._background = None
+
+    def update(self, frame):
+        '''
+        Display `frame` (OpenCV image or NumPy array).
+
+        Returns `False` if the frame was dropped because of `max_fps`.
+        '''
+        now = time.time()
+        if self.max_fps and self._last_draw is not None and \
+                now - self._last_draw < 1. / self.max_fps:
+            return False
+        frame = self._to_rgb(frame)
+        if self.image is None or frame.shape != self.frame_shape:
+            if self.image is not None:
+                self.image.remove()
+            self._create_image(frame)
+        else:
+            self.image.set_data(frame[::self.stride, ::self.stride])
+            if self._background is not None:
+                self.canvas.restore_region(self._background)
+                self.axis.draw_artist(self.image)
+                self.canvas.blit(self.axis.bbox)
+            else:
+                self.canvas.draw_idle()
+        self.canvas.flush_events()
+        self._last_draw = now
+        return True
+
+    def attach(self, frame_grabber):
+        '''
+        Display frames received by `frame_grabber` (a `FrameGrabber`).
+
+        Other callbacks of `frame_grabber` are kept.  Returns the callback,
+        which may be passed to `frame_grabber.remove_frame_callback`.
+        '''
+        return frame_grabber.add_frame_callback(lambda frame, time_:
+                                                self.update(frame))
+
+    def play(self, source, fps=None, frame_count=None, backend=None):
+        '''
+        Display frames from a video file at display rate.
+
+        If drawing falls behind, frames are skipped (grabbed without being
+        decoded/displayed) to keep up with the video frame rate.
+
+        Arguments
+        ---------
+
+         - `source`: Video file path.
+         - `fps`: Playback rate (default: frame rate of video).
+         - `frame_count`: Maximum number of frames to play.
+         - `backend`: Capture backend name (see `backend.get_backend`).
+        '''
+        backend = get_backend(backend)
+        cap = backend.capture_from_file(source)
+        if fps is None:
+            fps = CVCaptureProperties(cap, backend).fps or 25.
+        period = 1. / fps
+        start = time.time()
+        i = 0
+        while frame_count is None or i < frame_count:
+            frame = backend.read(cap)
+            if frame is None:
+                break
+            self.update(frame)
+            i += 1
+            # Skip frames we are too late for, then wait for the next one.
+            lag = int((time.time() - start) / period) - i
+            for j in range(max(0, lag)):
+                if not backend.grab(cap):
+                    break
+                i += 1
+            delay = start + i * period - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        backend.release(cap)
+        return i
@@ -1,17 +1,24 @@
 from collections import namedtuple
+import threading
+
+import numpy as np
 
 # Import state machine package
-from . import statepy.state
+from .statepy import state
 from .safe_cv import cv
+from .buffer_pool import get_image_buffer
+from .warp import RemapCache
+from .cv_array import array2mat
+from .feature_registration import find_feature_homography
 
 
-CANCEL = statepy.state.declareEventType('on_cancel')
-IMAGE_CLICK = statepy.state.declareEventType('on_image_click')
-OVERLAY_CLICK = statepy.state.declareEventType('on_image_click')
-END = statepy.state.declareEventType('on_end')
+CANCEL = state.declareEventType('on_cancel')
+IMAGE_CLICK = state.declareEventType('on_image_click')
+OVERLAY_CLICK = state.declareEventType('on_image_click')
+END = state.declareEventType('on_end')
 
 
-class StateWithCallback(statepy.state.State):
+class StateWithCallback(state.State):
     def callback(self, event, *args):
         # Call callback function (if there is one)
         if hasattr(self, 'callback'):
@@ -133,7 +140,9 @@ class WaitImageClickD(WaitImageClick):
     colour = (1, 0, 1)
     def on_image_click(self, event):
         super(WaitImageClickD, self).on_image_click(event)
-        cv.GetPerspectiveTransform(self.overlay_points, self.image_points, self.map_mat)
+        with self.map_lock:
+            cv.GetPerspectiveTransform(self.overlay_points, self.image_points,
+                                       self.map_mat)
         if self.on_registered:
             self.on_registered()
 
@@ -145,13 +154,13 @@ class WaitImageClickD(WaitImageClick):
         }
 
 
-class Canceled(statepy.state.State):
+class Canceled(state.State):
     def enter(self):
         if self.on_canceled:
             self.on_canceled()
 
 
-class Done(statepy.state.State):
+class Done(state.State):
     pass
 
 
@@ -169,13 +178,18 @@ class ImageRegistrationTask(object):
         self.map_mat = cv.CreateMat(3, 3, cv.CV_32FC1)
         # Initialize map_mat with identity transformation matrix.
         cv.GetPerspectiveTransform(4 * [Point(0,0)], 4 * [Point(0,0)], self.map_mat)
+        # Held while `map_mat` is written or read, since it may be updated
+        # from another thread (e.g., by a `DriftTracker`).
+        self.map_lock = threading.Lock()
         self.state = dict(overlay_points=[], image_points=[],
-            map_mat=self.map_mat,
+            map_mat=self.map_mat, map_lock=self.map_lock,
             on_overlay_point=on_overlay_point,
             on_image_point=on_image_point,
             on_registered=on_registered,
             on_canceled=on_canceled)
-        self.machine = statepy.state.Machine(statevars=self.state)
+        self.machine = state.Machine(statevars=self.state)
+        # Remap tables for the current `map_mat`, reused across frames.
+        self.remap_cache = RemapCache()
 
     def cancel(self):
         self.trigger_event(CANCEL)
@@ -183,12 +197,47 @@ class ImageRegistrationTask(object):
     def start(self, start_state=WaitOverlayClickA):
         self.machine.start(startState=start_state)
 
-    def get_corrected_image(self, in_image):
+    def register_automatic(self, overlay, image, **kwargs):
+        '''
+        Register `image` to `overlay` from matched image features (see
+        `find_feature_homography`) instead of clicked points.
+
+        Any click registration in progress is stopped.  On success,
+        `map_mat` is updated, the `on_registered` callback is called and
+        `True` is returned.  Otherwise, `map_mat` is left unchanged and
+        `False` is returned.
+
+        Keyword arguments are passed to `find_feature_homography`.
+        '''
+        if self.machine.currentState() is not None:
+            self.machine.stop()
+        H = find_feature_homography(overlay, image, **kwargs)
+        if H is None:
+            return False
+        with self.map_lock:
+            cv.Convert(array2mat(H), self.map_mat)
+        if self.state['on_registered']:
+            self.state['on_registered']()
+        return True
+
+    def get_corrected_image(self, in_image, dst=None, pool=None):
+        '''
+        Arguments
+        ---------
+
+         - `in_image`: OpenCV image.
+         - `dst`: Optional output image (same size and channels as
+           `in_image`).
+         - `pool`: Optional `BufferPool` to take the output image from if
+           `dst` is not given.
+        '''
         assert(self.machine.currentState() is None)
-        map_mat = self.state['map_mat']
-        warped = cv.CreateImage((in_image.width, in_image.height), 8,
-                                in_image.channels)
-        cv.WarpPerspective(in_image, warped, map_mat, flags=cv.CV_WARP_INVERSE_MAP)
+        # Warp with a copy, so `map_mat` is only locked while it is read.
+        with self.map_lock:
+            map_array = np.array(self.state['map_mat'], dtype='float64')
+        warped = get_image_buffer((in_image.width, in_image.height), 8,
+                                  in_image.channels, dst=dst, pool=pool)
+        self.remap_cache.warp(in_image, map_array, dst=warped)
         return warped
 
     def simulate(self):
@@ -203,7 +252,7 @@ class ImageRegistrationTask(object):
     def trigger_event(self, etype, **kwargs):
         if self.machine.currentState() is None:
             return None
-        event = statepy.state.Event(etype)
+        event = state.Event(etype)
         for key, value in kwargs.items():
             setattr(event, key, value)
         self.machine.injectEvent(event)
@@ -212,6 +261,6 @@ class ImageRegistrationTask(object):
 
 if __name__ == '__main__':
     with open('overlay_registration.dot', 'wb') as in_file:
-        statepy.state.Machine.writeStateGraph(fileobj=in_file, startState=WaitOverlayClickA)
+        state.Machine.writeStateGraph(fileobj=in_file, startState=WaitOverlayClickA)
 
     registration_task = ImageRegistrationTask()
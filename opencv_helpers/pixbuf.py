@@ -4,6 +4,8 @@ from .safe_cv import cv
 import numpy as np
 from path_helpers import path
 
+from .cv_array import cv2array, array2cv, array2mat, pixbuf2array
+
 
 def parse_args():
     """Parses arguments, returns ``(options, args)``."""
@@ -24,60 +26,91 @@ Overlay sub-rectangle of image onto image.""",
     return args
 
 
-def cv2array(im):
-  depth2dtype = {
-        cv.IPL_DEPTH_8U: 'uint8',
-        cv.IPL_DEPTH_8S: 'int8',
-        cv.IPL_DEPTH_16U: 'uint16',
-        cv.IPL_DEPTH_16S: 'int16',
-        cv.IPL_DEPTH_32S: 'int32',
-        cv.IPL_DEPTH_32F: 'float32',
-        cv.IPL_DEPTH_64F: 'float64',
-    }
-
-  a = np.fromstring(
-         im.tostring(),
-         dtype=depth2dtype[im.depth],
-         count=im.width*im.height*im.nChannels)
-  a.shape = (im.height,im.width,im.nChannels)
-  return a
-
-
-def array2cv(a):
-    dtype2depth = {
-        'uint8':   cv.IPL_DEPTH_8U,
-        'int8':    cv.IPL_DEPTH_8S,
-        'uint16':  cv.IPL_DEPTH_16U,
-        'int16':   cv.IPL_DEPTH_16S,
-        'int32':   cv.IPL_DEPTH_32S,
-        'float32': cv.IPL_DEPTH_32F,
-        'float64': cv.IPL_DEPTH_64F,
-    }
-    rows, cols, channels = a.shape
-
-    cv_im = cv.CreateImageHeader((cols, rows),
-                                dtype2depth[str(a.dtype)],
-                                channels)
-    cv.SetData(cv_im, a.tostring(),
-                a.dtype.itemsize * channels * cols)
-    return cv_im
-
-
 def cv2pixbuf(img):
-    dtype2depth = {
-        cv.IPL_DEPTH_8U: 8,
-        cv.IPL_DEPTH_16U: 16,
-    }
-    rows, cols, depth, channels = img.height, img.width, dtype2depth[img.depth], img.channels
-    row_stride = channels * cols
-    pixbuf = gtk.gdk.pixbuf_new_from_data(img.tostring(), 
-                                       gtk.gdk.COLORSPACE_RGB, 
-                                       False, 
-                                       depth,
-                                       cols, 
-                                       rows, 
-                                       row_stride)
-    return pixbuf 
+    '''
+    Return new `gtk.gdk.Pixbuf` with the contents of RGB `uint8` image `img`.
+
+    Use `PixbufDisplay` to repeatedly draw frames into the same pixbuf.
+    '''
+    if not isinstance(img, np.ndarray):
+        img = cv2array(img)
+    height, width = img.shape[:2]
+    pixbuf = gtk.gdk.Pixbuf(gtk.gdk.COLORSPACE_RGB, False, 8, width, height)
+    # Copy straight into the pixbuf pixels (respecting the row stride).
+    pixbuf2array(pixbuf)[:] = img
+    return pixbuf
+
+
+class PixbufDisplay(object):
+    '''
+    Display adapter drawing frames into a persistent pixbuf/pixmap pair.
+
+    The pixbuf pixels are wrapped (respecting the pixbuf row stride) by an
+    OpenCV header, so each frame is resized directly into the pixbuf memory
+    and channel-swapped in place.  The pixbuf and pixmap are only reallocated
+    when the output size changes, so no memory is allocated per frame.
+
+    Arguments
+    ---------
+
+     - `drawable`: `gtk.gdk.Drawable` (e.g., `widget.window`) used to
+       determine the pixmap depth.  If `None`, no pixmap is rendered.
+     - `swap_channels`: Convert BGR frames to RGB (default=`True`).
+    '''
+    def __init__(self, drawable=None, swap_channels=True):
+        self.drawable = drawable
+        self.swap_channels = swap_channels
+        self.pixbuf = None
+        self.pixmap = None
+        self._pixels = None
+
+    @property
+    def size(self):
+        if self.pixbuf is None:
+            return None
+        return self.pixbuf.get_width(), self.pixbuf.get_height()
+
+    def allocate(self, width, height):
+        '''
+        (Re)allocate pixbuf and pixmap of size `(width, height)`, if
+        necessary.
+        '''
+        if self.size == (width, height):
+            return
+        self.pixbuf = gtk.gdk.Pixbuf(gtk.gdk.COLORSPACE_RGB, False, 8, width,
+                                     height)
+        self._pixels = array2mat(pixbuf2array(self.pixbuf))
+        if self.drawable is not None:
+            self.pixmap = gtk.gdk.Pixmap(self.drawable, width, height)
+        else:
+            self.pixmap = None
+
+    def update(self, frame, width=None, height=None):
+        '''
+        Draw `frame` (3-channel `uint8` OpenCV image or NumPy array) into the
+        pixbuf (and pixmap), resizing to `(width, height)` if specified.
+
+        Returns the pixbuf.
+        '''
+        if isinstance(frame, np.ndarray):
+            frame = array2mat(frame)
+        else:
+            frame = cv.GetMat(frame)
+        if width is None or height is None:
+            width, height = frame.width, frame.height
+        self.allocate(width, height)
+        if (frame.width, frame.height) != (width, height):
+            cv.Resize(frame, self._pixels)
+            if self.swap_channels:
+                cv.CvtColor(self._pixels, self._pixels, cv.CV_BGR2RGB)
+        elif self.swap_channels:
+            cv.CvtColor(frame, self._pixels, cv.CV_BGR2RGB)
+        else:
+            cv.Copy(frame, self._pixels)
+        if self.pixmap is not None:
+            self.pixmap.draw_pixbuf(None, self.pixbuf, 0, 0, 0, 0, width,
+                                    height)
+        return self.pixbuf
 
 
 def array2pixbuf(a):
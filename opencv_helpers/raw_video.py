@@ -0,0 +1,211 @@
+'''
+Uncompressed, memory-mappable frame store.
+
+A raw video file consists of a fixed size header, followed by the frames
+(stored back to back as `uint8` `(height, width, channels)` arrays) and an
+index of frame timestamps (`float64` seconds since the epoch):
+
+    | header | frame 0 | frame 1 | ... | frame capacity-1 | timestamps |
+
+Space for `capacity` frames is preallocated when the file is created.  Frames
+are buffered by `RawFrameWriter` and written in large sequential writes.
+`RawFrameReader` exposes the frames as an `np.memmap` `(N, H, W, C)` array,
+so they can be sliced without copying or decoding.
+'''
+import struct
+import time
+
+import numpy as np
+from path_helpers import path
+
+from .safe_cv import cv
+from .backend import get_backend
+from .camera_capture import CameraCaptureBase, CaptureError
+
+MAGIC = b'OCVRAW01'
+# magic, width, height, channels, frame count, capacity
+HEADER_FORMAT = '<8sIIIQQ'
+HEADER_SIZE = 64
+
+
+class RawFrameWriter(object):
+    '''
+    Append frames to a raw frame store.
+
+    Arguments
+    ---------
+
+     - `output_path`: Output file path.
+     - `dimensions`: Frame `(width, height)`.
+     - `channels`: Number of channels per frame.
+     - `capacity`: Number of frames to preallocate space for.  The capacity
+       is doubled whenever the file is full.
+     - `batch_size`: Number of frames to buffer between writes.
+    '''
+    def __init__(self, output_path, dimensions, channels=3, capacity=1024,
+                 batch_size=16):
+        self.output_path = path(output_path)
+        self.width, self.height = dimensions
+        self.channels = channels
+        self.frame_shape = (self.height, self.width, self.channels)
+        self.frame_size = int(np.prod(self.frame_shape))
+        self.capacity = capacity
+        self.frame_count = 0
+        self.timestamps = np.empty(capacity, dtype='f8')
+        self._batch = np.empty((batch_size, ) + self.frame_shape,
+                               dtype='uint8')
+        self._batch_count = 0
+        self._file = open(self.output_path, 'w+b')
+        self._file.truncate(self._timestamps_offset + 8 * self.capacity)
+        self._write_header()
+        self._file.seek(HEADER_SIZE)
+
+    @property
+    def _timestamps_offset(self):
+        return HEADER_SIZE + self.capacity * self.frame_size
+
+    def _write_header(self):
+        position = self._file.tell()
+        self._file.seek(0)
+        self._file.write(struct.pack(HEADER_FORMAT, MAGIC, self.width,
+                                     self.height, self.channels,
+                                     self.frame_count, self.capacity))
+        self._file.seek(position)
+
+    def write(self, frame, timestamp=None):
+        '''
+        Append a frame (OpenCV image or `uint8` array).
+
+        Arguments
+        ---------
+
+         - `frame`: Frame to append.
+         - `timestamp`: Frame time in seconds since the epoch (default: now).
+        '''
+        if timestamp is None:
+            timestamp = time.time()
+        if not isinstance(frame, np.ndarray):
+            frame = np.asarray(cv.GetMat(frame))
+        if self.frame_count + self._batch_count >= self.capacity:
+            self._grow()
+        self._batch[self._batch_count] = frame.reshape(self.frame_shape)
+        self.timestamps[self.frame_count + self._batch_count] = timestamp
+        self._batch_count += 1
+        if self._batch_count == len(self._batch):
+            self.flush()
+
+    def _grow(self):
+        self.flush()
+        self.capacity += max(len(self.timestamps), len(self._batch))
+        self.timestamps = np.resize(self.timestamps, self.capacity)
+        self._file.truncate(self._timestamps_offset + 8 * self.capacity)
+
+    def flush(self):
+        '''
+        Write buffered frames, the timestamp index and the header to disk.
+        '''
+        if self._batch_count:
+            self._file.seek(HEADER_SIZE + self.frame_count * self.frame_size)
+            self._file.write(self._batch[:self._batch_count].data)
+            self.frame_count += self._batch_count
+            self._batch_count = 0
+        self._file.seek(self._timestamps_offset)
+        self._file.write(self.timestamps[:self.frame_count].data)
+        self._write_header()
+        self._file.flush()
+
+    def close(self):
+        # `_file` is not set if `__init__` failed to open the file.
+        if getattr(self, '_file', None) is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def __del__(self):
+        self.close()
+
+
+class RawFrameReader(object):
+    '''
+    Read-only view of a raw frame store.
+
+    `frames` is an `np.memmap` `(N, H, W, C)` `uint8` array and `timestamps`
+    an `np.memmap` array of `N` frame times.
+    '''
+    def __init__(self, in_path):
+        self.in_path = path(in_path)
+        with open(self.in_path, 'rb') as f:
+            header = f.read(struct.calcsize(HEADER_FORMAT))
+        (magic, self.width, self.height, self.channels, self.frame_count,
+         self.capacity) = struct.unpack(HEADER_FORMAT, header)
+        if magic != MAGIC:
+            raise IOError('Not a raw frame store: %s' % self.in_path)
+        frame_shape = (self.height, self.width, self.channels)
+        if self.frame_count:
+            self.frames = np.memmap(self.in_path, dtype='uint8', mode='r',
+                                    offset=HEADER_SIZE,
+                                    shape=(self.frame_count, ) + frame_shape)
+            self.timestamps = np.memmap(
+                self.in_path, dtype='f8', mode='r',
+                offset=HEADER_SIZE + self.capacity * int(np.prod(frame_shape)),
+                shape=(self.frame_count, ))
+        else:
+            self.frames = np.empty((0, ) + frame_shape, dtype='uint8')
+            self.timestamps = np.empty(0, dtype='f8')
+
+    @property
+    def dimensions(self):
+        return (self.width, self.height)
+
+    def __len__(self):
+        return self.frame_count
+
+    def __getitem__(self, i):
+        return self.frames[i]
+
+
+class RawFileCapture(CameraCaptureBase):
+    '''
+    Replay a raw frame store as a capture source.
+
+    Frames are returned as frames of `backend` (`CvMat` headers with the
+    `'legacy'` backend, NumPy arrays with `'cv2'`, see `backend.get_backend`)
+    over the memory-mapped file, so no frame data is copied or decoded.
+    '''
+    def __init__(self, in_path, loop=False, auto_init=False, backend=None):
+        self.in_path = path(in_path)
+        self.backend = get_backend(backend)
+        self.loop = loop
+        self.reader = None
+        self.position = 0
+        super(RawFileCapture, self).__init__(auto_init=auto_init)
+
+    def _init_capture(self):
+        self.reader = RawFrameReader(self.in_path)
+        self.position = 0
+
+    def init_capture(self):
+        result = super(RawFileCapture, self).init_capture()
+        # Rewind past the frame grabbed to test the capture.
+        self.position = 0
+        return result
+
+    def _release_capture(self):
+        self.reader = None
+
+    def get_frame(self):
+        if self.reader is None:
+            raise CaptureError('capture is not initialized.')
+        if self.position >= len(self.reader):
+            if not (self.loop and len(self.reader)):
+                return None
+            self.position = 0
+        frame = self.reader.frames[self.position]
+        self.position += 1
+        return self.backend.from_array(frame)
+
+    @property
+    def dimensions(self):
+        if self._dimensions is None:
+            self._dimensions = RawFrameReader(self.in_path).dimensions
+        return self._dimensions
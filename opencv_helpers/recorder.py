@@ -16,14 +16,57 @@ import numpy as np
 from .video import cv, CVCaptureProperties
 from .frame_rate import FrameRateInfo
 from .silence import Silence
+from .backend import get_backend
+
+
+# Value to pass as `codec` to record to an uncompressed, memory-mappable frame
+# store (see `raw_video`) instead of a video file.
+RAW_CODEC = 'RAW'
+
+
+def _create_writer(backend, codec, output_path, fps, dimensions):
+    '''
+    Return writer for `codec`: a `RawFrameWriter` for `RAW_CODEC`, otherwise
+    a video writer of `backend`.
+    '''
+    if codec == RAW_CODEC:
+        # Uncompressed, memory-mappable frame store (see `raw_video`).
+        from .raw_video import RawFrameWriter
+
+        return RawFrameWriter(output_path, dimensions)
+    return backend.create_writer(output_path, backend.fourcc(codec), fps,
+                                 dimensions, True)
+
+
+def _write_frame(backend, codec, writer, frame):
+    if codec == RAW_CODEC:
+        writer.write(frame)
+    else:
+        backend.write(writer, frame)
+
+
+def _close_writer(backend, codec, writer):
+    if codec == RAW_CODEC:
+        writer.close()
+    else:
+        backend.release(writer)
 
 
 class CVCaptureConfig(object):
     type_names = ('camera', 'file')
     types = namedtuple('CVCaptureTypes', type_names)(**dict([(n, i) for i, n in enumerate(type_names)]))
 
-    def __init__(self, source, type_=None):
+    def __init__(self, source, type_=None, backend=None):
+        '''
+        Arguments
+        ---------
+
+         - `source`: Camera id or video file path.
+         - `type_`: `'camera'` (default) or `'file'`.
+         - `backend`: Capture backend name (see `backend.get_backend`).
+        '''
         self.source = source
+        self.backend = get_backend(backend)
         if type_ is None:
             type_ = self.types.camera
         elif type_ not in self.types:
@@ -36,21 +79,21 @@ class CVCaptureConfig(object):
 
     def create_capture(self):
         if self.type_ == self.types.camera:
-            cap = cv.CaptureFromCAM(self.source)
+            cap = self.backend.capture_from_cam(self.source)
         elif self.type_ == self.types.file:
             source_path = path(self.source).abspath()
             if not source_path.exists():
                 raise IOError('Capture source path is not accessible: %s' % source_path.abspath())
-            cap = cv.CaptureFromFile(self.source)
+            cap = self.backend.capture_from_file(self.source)
         else:
             raise ValueError('Unsupported capture type: %s' % self.type_)
         return cap
 
     def test_capture(self):
         cap = self.create_capture()
-        result = cv.GrabFrame(cap)
-        del cap
-        return (result == 0)
+        result = self.backend.grab(cap)
+        self.backend.release(cap)
+        return (not result)
 
 
 class RecorderLog(object):
@@ -100,19 +143,21 @@ class RecorderChild(object):
         self.codec = codec
         logging.getLogger('opencv.recorder').info('[RecorderChild] Using codec: %s' % self.codec)
         self.cam_cap = cam_cap
+        self.backend = get_backend(getattr(cam_cap, 'backend', None))
         self.cam_cap.init_capture()
         self.writer = self._get_writer()
         self.state = self.STATES['STOPPED']
         self.frame_period = 1.0 / self.fps
         
     def _get_writer(self):
-        if self.codec is None:
-            fourcc = -1
-        else:
-            fourcc = cv.CV_FOURCC(*self.codec)
-        writer = cv.CreateVideoWriter(self.output_path, fourcc, self.fps,
-                                            self.cam_cap.dimensions, True)
-        return writer
+        return _create_writer(self.backend, self.codec, self.output_path,
+                              self.fps, self.cam_cap.dimensions)
+
+    def _write_frame(self, frame):
+        _write_frame(self.backend, self.codec, self.writer, frame)
+
+    def _close_writer(self):
+        _close_writer(self.backend, self.codec, self.writer)
 
     def main(self):
         import numpy as np
@@ -160,11 +205,11 @@ class RecorderChild(object):
                 log.times.append(datetime.now())
                 frame_periods[record_id] = (log.times[-1] - log.times[-2]).total_seconds()
                 frame = self.cam_cap.get_frame()
-                if frame:
-                    cv.WriteFrame(self.writer, frame)
+                if frame is not None:
+                    self._write_frame(frame)
                     prev_frame = frame
-                else:
-                    cv.WriteFrame(self.writer, prev_frame)
+                elif prev_frame is not None:
+                    self._write_frame(prev_frame)
                 record_times_smooth[record_id] = (datetime.now() - log.times[-1]).total_seconds()
                 if frame_count > 10:
                     sleep_time = self.frame_period - record_times_smooth[record_id]\
@@ -184,7 +229,7 @@ class RecorderChild(object):
                     logging.getLogger('opencv.recorder').info('warning: recording is lagging')
                 frame_count += 1
 
-
+        self._close_writer()
         log.finish()
 
         # Report log back to parent process
@@ -199,35 +244,34 @@ class RecordFrameRateInfo(FrameRateInfo):
         super(RecordFrameRateInfo, self).__init__(cam_cap)
 
     def test_framerate(self, frame_count=100):
+        backend = get_backend(getattr(self.cam_cap, 'backend', None))
         with Silence():
-            if self.codec is None:
-                fourcc = -1
-            else:
-                fourcc = cv.CV_FOURCC(*self.codec)
-            f_handle, output_path = tempfile.mkstemp(suffix='.avi') 
+            suffix = '.raw' if self.codec == RAW_CODEC else '.avi'
+            f_handle, output_path = tempfile.mkstemp(suffix=suffix)
             output_path = path(output_path)
             os.close(f_handle)
             times = []
             writer = None
             try:
-                writer = cv.CreateVideoWriter(output_path, fourcc, 24,
-                                                    self.cam_cap.dimensions, True)
+                writer = _create_writer(backend, self.codec, output_path, 24,
+                                        self.cam_cap.dimensions)
                 prev_frame = None
                 # Grab and write frames as fast as possible (no delay between
                 # frames) and record times of frame grabs.
                 for i in range(frame_count):
                     frame = self.cam_cap.get_frame()
-                    if frame:
-                        cv.WriteFrame(writer, frame)
+                    if frame is not None:
+                        _write_frame(backend, self.codec, writer, frame)
                         prev_frame = frame
-                    else:
-                        cv.WriteFrame(writer, prev_frame)
+                    elif prev_frame is not None:
+                        _write_frame(backend, self.codec, writer, prev_frame)
                     self.cam_cap.get_frame()
                     times.append(datetime.now())
 
                 frame_lengths = np.array([(times[i + 1] - times[i]).total_seconds()  for i in range(len(times) - 1)])
             finally:
-                if writer:
+                if writer is not None:
+                    _close_writer(backend, self.codec, writer)
                     del writer
                 output_path.remove()
 
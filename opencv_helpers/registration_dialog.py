@@ -5,6 +5,10 @@ import gtk
 from path_helpers import path
 
 from .safe_cv import cv
+from .buffer_pool import BufferPool
+from .pixbuf import PixbufDisplay
+from .cv_array import array2mat
+from .statepy import state
 from .overlay_registration import ImageRegistrationTask, Point, OVERLAY_CLICK,\
         IMAGE_CLICK, WaitOverlayClick, WaitImageClick
 
@@ -24,7 +28,19 @@ def base_path():
 
 
 class RegistrationDialog(object):
-    def __init__(self):
+    def __init__(self, store=None, device_id=None):
+        '''
+        Arguments
+        ---------
+
+         - `store`: Optional `RegistrationStore`.  If set, registrations are
+           saved to the store and restored from it (without showing the
+           dialog) while the rotated image still matches the stored
+           reference frame.
+         - `device_id`: Camera device id to store registrations under.
+        '''
+        self.store = store
+        self.device_id = device_id
         self.builder = gtk.Builder()
         glade_path = base_path().joinpath('glade', 'registration_demo.glade')
         self.builder.add_from_file(glade_path)
@@ -40,6 +56,8 @@ class RegistrationDialog(object):
         self.images = {}
         self.pixmaps = {}
         self.pixbufs = {}
+        self.displays = {}
+        self.buffer_pool = BufferPool()
         self.window.show_all()
         self.registration = ImageRegistrationTask(
                     on_overlay_point=lambda x: self.label_info.set_text(x),
@@ -47,16 +65,32 @@ class RegistrationDialog(object):
                     on_registered=self.on_image_registered,
                     on_canceled=self.on_canceled)
 
-    def run(self):
+    def run(self, use_stored=True):
         self.reset()
+        if use_stored and self.store is not None:
+            map_array = self.store.restore(self.device_id,
+                                           self.get_resolution(),
+                                           self.images['rotated'])
+            if map_array is not None:
+                self.registration.machine.stop()
+                cv.Convert(array2mat(map_array), self.registration.map_mat)
+                self.window.hide()
+                return self.registration.map_mat
         response = self.window.run()
         if response == gtk.RESPONSE_OK:
             results = self.registration.map_mat
+            if self.store is not None:
+                self.store.save(self.device_id, self.get_resolution(),
+                                self.images['rotated'], results)
         else:
             results = None
         self.window.hide()
         return results
 
+    def get_resolution(self):
+        image = self.images['rotated']
+        return image.width, image.height
+
     def translate_coords(self, coords, name):
         coords = Point(*coords)
         width = self.images[name].width
@@ -86,7 +120,10 @@ class RegistrationDialog(object):
 
     def on_image_registered(self, *args):
         # Image has been registered, apply transformation.
-        self.images['result'] = self.registration.get_corrected_image(self.images['rotated'])
+        if 'result' in self.images:
+            self.buffer_pool.release(self.images['result'])
+        self.images['result'] = self.registration.get_corrected_image(
+            self.images['rotated'], pool=self.buffer_pool)
         self.draw_cv_to_pixmap('result')
         #for i in ['original', 'rotated', 'result']:
         for i in ['result']:
@@ -100,22 +137,15 @@ class RegistrationDialog(object):
         return event
 
     def draw_cv_to_pixmap(self, image_name):
-        image = self.images[image_name]
+        # Images are already RGB, so only resize into the persistent pixbuf.
+        if image_name not in self.displays:
+            self.displays[image_name] = PixbufDisplay(
+                self.areas[image_name].window, swap_channels=False)
+        display = self.displays[image_name]
         x, y, width, height = self.areas[image_name].get_allocation()
-        if image.width != width or image.height != height:
-            image = self.get_resized(image, width, height)
-        self.pixbufs[image_name] = gtk.gdk.pixbuf_new_from_data(
-            image.tostring(), gtk.gdk.COLORSPACE_RGB, False,
-            8, width, height, width * 3)
-        self.pixmaps[image_name], mask =\
-            self.pixbufs[image_name].render_pixmap_and_mask()
-
-    def get_resized(self, in_image, width, height):
-        #print 'get_resized width=%s height=%s'\
-            #% (width, height)
-        resized = cv.CreateImage((width, height), 8, in_image.channels)
-        cv.Resize(in_image, resized)
-        return cv.GetMat(resized)
+        self.pixbufs[image_name] = display.update(self.images[image_name],
+                                                  width, height)
+        self.pixmaps[image_name] = display.pixmap
 
     def on_original_expose_event(self, widget, event):
         x , y, width, height = event.area
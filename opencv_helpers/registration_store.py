@@ -0,0 +1,148 @@
+'''
+Persistent store of image registrations.
+
+Registration homographies (e.g., the `map_mat` of `ImageRegistrationTask`)
+are saved keyed by camera device id and frame resolution, together with a
+fingerprint of the reference frame they were registered against.  A stored
+registration is restored when the fingerprint of the current frame still
+matches within a tolerance, i.e., when the camera has not moved.
+
+Fingerprints are small, normalized, downsampled grayscale copies of a frame,
+so computing and comparing them is cheap.  Each device/resolution key is
+stored in its own `.npz` file in the store directory.
+'''
+import re
+
+import numpy as np
+from path_helpers import path
+
+from .safe_cv import cv2
+from .cv_array import cv2array
+
+
+FINGERPRINT_SIZE = (32, 24)
+
+
+def frame_fingerprint(frame, size=FINGERPRINT_SIZE):
+    '''
+    Return fingerprint of `frame` (OpenCV image or NumPy array): the frame,
+    as grayscale, downsampled to `size` `(width, height)` and normalized to
+    zero mean and unit variance.
+    '''
+    if not isinstance(frame, np.ndarray):
+        frame = cv2array(frame)
+    if frame.ndim == 3 and frame.shape[2] == 1:
+        frame = frame[:, :, 0]
+    elif frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(frame, tuple(size),
+                       interpolation=cv2.INTER_AREA).astype('float32')
+    small -= small.mean()
+    std = small.std()
+    if std > 0:
+        small /= std
+    return small
+
+
+def fingerprint_distance(a, b):
+    '''
+    Return distance between fingerprints `a` and `b` (`0`: identical, `1`:
+    uncorrelated, `2`: inverted).
+
+    Either may be a stack of fingerprints, in which case an array of
+    distances is returned.
+    '''
+    return 1. - (a * b).mean(axis=(-2, -1))
+
+
+class RegistrationStore(object):
+    def __init__(self, store_dir=None, tolerance=0.1):
+        '''
+        Arguments
+        ---------
+
+         - `store_dir`: Directory to store registrations in (default:
+           `~/.opencv_helpers/registrations`).
+         - `tolerance`: Maximum fingerprint distance (see
+           `fingerprint_distance`) to restore a registration.
+        '''
+        if store_dir is None:
+            store_dir = path('~/.opencv_helpers/registrations').expanduser()
+        self.store_dir = path(store_dir)
+        self.tolerance = tolerance
+        # Loaded entries, keyed by device/resolution.
+        self._entries = {}
+
+    def _get_path(self, device_id, resolution):
+        name = '%s-%dx%d' % ((device_id, ) + tuple(resolution))
+        return self.store_dir.joinpath('%s.npz'
+                                       % re.sub(r'[^\w.-]', '_', name))
+
+    def _load(self, device_id, resolution):
+        key = (device_id, tuple(resolution))
+        if key not in self._entries:
+            store_path = self._get_path(device_id, resolution)
+            if store_path.isfile():
+                with np.load(store_path) as data:
+                    self._entries[key] = (data['map_arrays'],
+                                          data['fingerprints'])
+            else:
+                self._entries[key] = (np.empty((0, 3, 3)),
+                                      np.empty((0, FINGERPRINT_SIZE[1],
+                                                FINGERPRINT_SIZE[0]),
+                                               dtype='float32'))
+        return self._entries[key]
+
+    def save(self, device_id, resolution, reference_frame, map_mat):
+        '''
+        Store registration `map_mat` (3x3 `CvMat` or array) of device
+        `device_id` at `resolution` `(width, height)`, registered against
+        `reference_frame`.
+
+        A previously stored registration with a matching fingerprint is
+        replaced.
+        '''
+        map_array = np.asarray(map_mat, dtype='float64').reshape(1, 3, 3)
+        fingerprint = frame_fingerprint(reference_frame)[np.newaxis]
+        map_arrays, fingerprints = self._load(device_id, resolution)
+        index = self._find(fingerprints, fingerprint[0])
+        if index is not None:
+            map_arrays = np.delete(map_arrays, index, axis=0)
+            fingerprints = np.delete(fingerprints, index, axis=0)
+        map_arrays = np.concatenate([map_arrays, map_array])
+        fingerprints = np.concatenate([fingerprints, fingerprint])
+        self._entries[(device_id, tuple(resolution))] = (map_arrays,
+                                                         fingerprints)
+        self.store_dir.makedirs_p()
+        with open(self._get_path(device_id, resolution), 'wb') as output:
+            np.savez(output, map_arrays=map_arrays, fingerprints=fingerprints)
+
+    def _find(self, fingerprints, fingerprint):
+        if not len(fingerprints):
+            return None
+        distances = fingerprint_distance(fingerprints, fingerprint)
+        index = distances.argmin()
+        if distances[index] > self.tolerance:
+            return None
+        return index
+
+    def restore(self, device_id, resolution, frame):
+        '''
+        Return stored 3x3 registration array of device `device_id` at
+        `resolution` whose reference frame best matches `frame`, or `None`
+        if no reference frame matches within the tolerance.
+        '''
+        map_arrays, fingerprints = self._load(device_id, resolution)
+        index = self._find(fingerprints, frame_fingerprint(frame))
+        if index is None:
+            return None
+        return map_arrays[index].copy()
+
+    def clear(self, device_id, resolution):
+        '''
+        Remove all registrations of device `device_id` at `resolution`.
+        '''
+        self._entries.pop((device_id, tuple(resolution)), None)
+        store_path = self._get_path(device_id, resolution)
+        if store_path.isfile():
+            store_path.remove()
@@ -4,5 +4,10 @@ if os.name == 'nt':
     import cvwin.cv2 as cv2
     cv = cv2.cv
 else:
-    import cv
     import cv2
+    try:
+        import cv
+    except ImportError:
+        # OpenCV 3+ has no legacy `cv` module (`cv2.cv` in 2.4).  Only the
+        # `cv2` backend is available then (see `backend`).
+        cv = getattr(cv2, 'cv', None)
@@ -102,9 +102,11 @@ class Silence:
                 files[i] = self.temp_files[i]
         self.files = tuple(files)
 
-        # open surrogate files
+        # open surrogate files (unbuffered, which requires binary mode; only
+        # the file descriptors are used)
+        mode = self.mode if 'b' in self.mode else self.mode + 'b'
         if self.combine: 
-            null_streams = [open(self.files[0], self.mode, 0)] * 2
+            null_streams = [open(self.files[0], mode, 0)] * 2
             if self.files[0] != os.devnull:
                 #sys.stdout, sys.stderr = map(os.fdopen, fds, ['w']*2, [0]*2)
                 # Christian Fobel: leave sys.stdout/err alone, since it
@@ -112,7 +114,7 @@ class Silence:
                 # __exit__().
                 pass
         else:
-            null_streams = [open(f, self.mode, 0) for f in self.files]
+            null_streams = [open(f, mode, 0) for f in self.files]
         self.null_fds = null_fds = [s.fileno() for s in null_streams]
         self.null_streams = null_streams
         
@@ -137,7 +139,8 @@ class Silence:
                 if self.string_io[i]:
                     # Note that this should always be True, but we'll check to
                     # make sure.
-                    self.outfiles[i].write(f.bytes())
+                    self.outfiles[i].write(f.bytes().decode('utf-8',
+                                                            'replace'))
                 # Delete temp file.
                 f.remove()
         return False
@@ -0,0 +1,205 @@
+# Copyright (c) 2009, Joseph Lisee
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of StatePy nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Joseph Lisee ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL <copyright holder> BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# File:  statepy/benchmark.py
+
+"""
+Measures event throughput of the state machines from statepy.test
+
+Run with: python -m statepy.benchmark
+"""
+
+# STD Imports
+import inspect
+import importlib
+import sys
+import timeit
+
+# Project Imports
+import statepy.state as state
+import statepy.test.state as test_state
+import statepy.test.task as test_task
+
+def _loopbackEvents(count):
+    """
+    LoopBack state: every event calls the transition function without
+    leaving the state.
+    """
+    machine = state.Machine()
+    machine.start(test_state.LoopBack)
+    events = [state.Event('Update') for i in range(count)]
+
+    def run():
+        for event in events:
+            machine.injectEvent(event)
+    return run
+
+def _queuedEvents(count):
+    """
+    LoopBack state of a queued machine, events injected as one batch
+    """
+    machine = state.Machine(queued = True)
+    machine.start(test_state.LoopBack)
+    events = [state.Event('Update') for i in range(count)]
+
+    def run():
+        machine.injectMany(events)
+    return run
+
+def _cycleEvents(count, reuseStates = False):
+    """
+    Start -> Simple -> Start cycle: every event causes a transition
+    """
+    machine = state.Machine(reuseStates = reuseStates)
+    machine.start(test_state.Start)
+    events = []
+    for i in range(count // 2):
+        events.append(state.Event('Change'))
+        events.append(state.Event(test_state.MockEventSource.ANOTHER_EVT))
+
+    def run():
+        for event in events:
+            machine.injectEvent(event)
+    return run
+
+def _ignoredEvents(count):
+    """
+    Start state: events with no transitions
+    """
+    machine = state.Machine()
+    machine.start(test_state.Start)
+    events = [state.Event('Ignored') for i in range(count)]
+
+    def run():
+        for event in events:
+            machine.injectEvent(event)
+    return run
+
+def _taskEvents(count, reuseStates = False):
+    """
+    TaskA -> TaskB -> TaskC task machine, restarted when complete
+    """
+    taskManager = test_task.task.TaskManager(
+        taskOrder = [test_task.TaskA, test_task.TaskB, test_task.TaskC],
+        failureTasks = {test_task.TaskB : test_task.BRecovery,
+                        test_task.TaskC : test_task.CRecovery})
+    machine = state.Machine(statevars = {'taskManager' : taskManager},
+                            reuseStates = reuseStates)
+    etypes = [test_task.EVENT_A, test_task.EVENT_C, test_task.EVENT_E]
+    events = [state.Event(etypes[i % 3]) for i in range(count)]
+
+    def run():
+        machine.start(test_task.TaskA)
+        for event in events:
+            if machine.complete:
+                machine.start(test_task.TaskA)
+            machine.injectEvent(event)
+    return run
+
+def _declareEventTypeStack(name):
+    """
+    Reference declareEventType implementation using inspect.stack()
+    """
+    stack = inspect.stack()
+    try:
+        frame = stack[1][0]
+        return '%s:%d %s' % (frame.f_code.co_filename, frame.f_lineno,
+                             name.replace(' ', '_'))
+    finally:
+        del stack
+
+def declareMain(count = 1000, repeat = 5):
+    """
+    Prints (and returns) time to declare an event type with
+    inspect.stack() and with state.declareEventType, and to import the
+    statepy.test.task module (which declares its event types at import)
+    """
+    results = {}
+    for name, declare in [('stack', _declareEventTypeStack),
+                          ('getframe', state.declareEventType)]:
+        seconds = min(timeit.repeat(lambda: declare('EVENT'), number = count,
+                                    repeat = repeat))
+        results[name] = seconds / count
+        print('%-12s %10.1f us/declaration' % (name, 1e6 * results[name]))
+
+    def reimport():
+        del sys.modules['statepy.test.task']
+        importlib.import_module('statepy.test.task')
+    results['import'] = min(timeit.repeat(reimport, number = 1,
+                                          repeat = repeat))
+    print('%-12s %10.1f ms (statepy.test.task)'
+          % ('import', 1e3 * results['import']))
+    return results
+
+def _branchEvents(count, branchCount = 100):
+    """
+    LoopBack state with branchCount branches, each event is for one branch
+    """
+    branchClasses = []
+    for i in range(branchCount):
+        table = {}
+        stateClass = type('Branch%d' % i, (state.State,),
+                          {'transitions' : staticmethod(lambda t = table: t)})
+        table['Event%d' % i] = stateClass
+        branchClasses.append(stateClass)
+
+    machine = state.Machine()
+    machine.start(test_state.LoopBack)
+    for stateClass in branchClasses:
+        machine.start(state.Branch(stateClass))
+    events = [state.Event('Event%d' % (i % branchCount))
+              for i in range(count)]
+
+    def run():
+        for event in events:
+            machine.injectEvent(event, _sendToBranches = True)
+    return run
+
+BENCHMARKS = [('loopback', _loopbackEvents),
+              ('queued', _queuedEvents),
+              ('transition', _cycleEvents),
+              ('transition reused',
+               lambda count: _cycleEvents(count, reuseStates = True)),
+              ('ignored', _ignoredEvents),
+              ('task', _taskEvents),
+              ('task reused',
+               lambda count: _taskEvents(count, reuseStates = True)),
+              ('branches', _branchEvents)]
+
+def main(count = 10000, repeat = 5):
+    """
+    Prints (and returns) events per second for each benchmark machine
+    """
+    results = {}
+    for name, makeRun in BENCHMARKS:
+        run = makeRun(count)
+        seconds = min(timeit.repeat(run, number = 1, repeat = repeat))
+        results[name] = count / seconds
+        print('%-18s %10.0f events/s' % (name, results[name]))
+    return results
+
+if __name__ == '__main__':
+    main()
+    declareMain()
@@ -30,7 +30,6 @@
 import os
 import sys
 import io
-import inspect
 from distutils import sysconfig
 
 # Ensure we are using the proper version of python
@@ -163,11 +162,8 @@ def declareEventType(name):
     @rtype : str
     @return: The new event type
     """
-    stack = inspect.stack()
-    try:
-        frame = stack[1][0]
-        line = frame.f_lineno
-        fileName = frame.f_code.co_filename
-        return '%s:%d %s' % (fileName, line, name.replace(' ', '_').upper())
-    finally:
-        del stack
+    # See statepy.state.declareEventType
+    frame = sys._getframe(1)
+    fileName = frame.f_code.co_filename
+    return sys.intern('%s:%d %s' % (fileName, frame.f_lineno,
+                                    name.replace(' ', '_').upper()))
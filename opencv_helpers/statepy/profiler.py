@@ -0,0 +1,156 @@
+# Copyright (c) 2009, Joseph Lisee
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of StatePy nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Joseph Lisee ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL <copyright holder> BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# File:  statepy/profiler.py
+
+"""
+Records where a state machine spends its time
+
+    profiler = MachineProfiler(startState = Start)
+    machine.addHooks(profiler)
+    ...
+    print(profiler.table())
+    profiler.writeStateGraph(open('profile.dot', 'w'))
+"""
+
+# STD Imports
+import time
+
+# Project Imports
+import statepy.state as state
+
+class MachineProfiler(state.MachineHooks):
+    """
+    Records time spent in each state, the number of times each transition
+    is taken and the execution time of transition functions
+
+    Counters are indexed by state class, and preallocated for every state
+    reachable from the start state (other states are added when first seen).
+    """
+    def __init__(self, startState = None):
+        """
+        @type  startState: State
+        @param startState: The state the profiled machine starts in, used to
+                           preallocate counters and to write the graph
+        """
+        self.startState = startState
+        self._index = {}
+        self.states = []
+        self.enterCounts = []
+        self.dwellTimes = []
+        self.handlerCounts = []
+        self.handlerTimes = []
+
+        # Transitions taken, keyed by (state class, event type)
+        self.transitionCounts = {}
+
+        # Time each currently active state instance was entered
+        self._enterTimes = {}
+
+        if startState is not None:
+            graph = state.Machine.stateGraph(startState)
+            for stateClass in graph.states:
+                self._getIndex(stateClass)
+                for etype in graph.transitions[stateClass]:
+                    self.transitionCounts[(stateClass, etype)] = 0
+
+    def _getIndex(self, stateClass):
+        index = self._index.get(stateClass, None)
+        if index is None:
+            index = len(self.states)
+            self._index[stateClass] = index
+            self.states.append(stateClass)
+            self.enterCounts.append(0)
+            self.dwellTimes.append(0.)
+            self.handlerCounts.append(0)
+            self.handlerTimes.append(0.)
+        return index
+
+    def enter(self, machine, currentState):
+        self.enterCounts[self._getIndex(type(currentState))] += 1
+        self._enterTimes[id(currentState)] = time.perf_counter()
+
+    def exit(self, machine, currentState):
+        enterTime = self._enterTimes.pop(id(currentState), None)
+        if enterTime is not None:
+            index = self._getIndex(type(currentState))
+            self.dwellTimes[index] += time.perf_counter() - enterTime
+
+    def transition(self, machine, currentState, event, nextState):
+        key = (type(currentState), event.type)
+        self.transitionCounts[key] = self.transitionCounts.get(key, 0) + 1
+
+    def handler(self, machine, currentState, event, duration):
+        index = self._getIndex(type(currentState))
+        self.handlerCounts[index] += 1
+        self.handlerTimes[index] += duration
+
+    def reset(self):
+        """
+        Zero all counters
+        """
+        for counts in (self.enterCounts, self.dwellTimes, self.handlerCounts,
+                       self.handlerTimes):
+            counts[:] = [0] * len(counts)
+        for key in self.transitionCounts:
+            self.transitionCounts[key] = 0
+        self._enterTimes.clear()
+
+    def table(self):
+        """
+        Returns the recorded counters as a text table, one row per state
+        """
+        rows = ['%-30s %8s %12s %12s %8s %12s' % ('State', 'Entered',
+                                                  'Dwell (s)', 'Mean (ms)',
+                                                  'Handled', 'Handler (ms)')]
+        for i, stateClass in enumerate(self.states):
+            meanDwell = 0.
+            if self.enterCounts[i]:
+                meanDwell = 1e3 * self.dwellTimes[i] / self.enterCounts[i]
+            rows.append('%-30s %8d %12.3f %12.3f %8d %12.3f' %
+                        (stateClass.__name__, self.enterCounts[i],
+                         self.dwellTimes[i], meanDwell,
+                         self.handlerCounts[i], 1e3 * self.handlerTimes[i]))
+        return '\n'.join(rows)
+
+    def writeStateGraph(self, fileobj, startState = None, ordered = True):
+        """
+        Writes the graph of the profiled machine (see
+        statepy.state.Machine.writeStateGraph), with edges labeled and
+        weighted by the number of times each transition was taken
+
+        The graph starts at startState, by default the start state given to
+        the profiler, or else the first state profiled.  Raises ValueError
+        if there is neither.
+        """
+        if startState is None:
+            startState = self.startState
+        if startState is None:
+            if not self.states:
+                raise ValueError('No start state given, and no state has '
+                                 'been profiled')
+            startState = self.states[0]
+        state.Machine.writeStateGraph(fileobj, startState, ordered = ordered,
+                                      edgeWeights = self.transitionCounts)
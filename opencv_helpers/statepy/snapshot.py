@@ -0,0 +1,289 @@
+# Copyright (c) 2009, Joseph Lisee
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of StatePy nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Joseph Lisee ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL <copyright holder> BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# File:  statepy/snapshot.py
+
+
+"""
+Snapshots of Machines, to resume a machine (ie. after a process restart)
+without replaying the events that led to its current state
+
+    data = snapshot.dumps(snapshot.snapshot(machine))
+    ...
+    machine = state.Machine()
+    snapshot.restore(machine, snapshot.loads(data))
+
+A snapshot records the current state class of the machine and of each of its
+branches, the type of the previous event and the statevars.  States are
+entered again on restore (so enter() can reacquire any resources) without
+passing through the states before them.
+
+Statevars are pickled unless a serializer (an object with dumps() and loads()
+methods, like the pickle module) is given for their name.  A serializer of
+None leaves a statevar out (ie. a GUI object), pass its value to restore()
+instead.
+
+To record every transition, add a Journal to the machine, which appends a
+small record per state entered to a file:
+
+    journal = snapshot.Journal(open('machine.journal', 'ab'))
+    machine.addHooks(journal)
+    machine.start(Start)
+    journal.checkpoint(machine)
+    ...
+    snapshot.restore(machine, snapshot.Journal.load(open('machine.journal',
+                                                          'rb')))
+"""
+
+# STD Imports
+import pickle
+
+# Project Imports
+import statepy.state as state
+
+class MachineSnapshot(object):
+    """
+    The state of a Machine (see snapshot())
+
+    @type root: State
+    @ivar root: The state class the machine was started with
+
+    @type state: State
+    @ivar state: The class of the current state, None if there is none
+
+    @type eventType: str
+    @ivar eventType: The type of the previous event, if any
+
+    @type statevars: {str : bytes}
+    @ivar statevars: The serialized statevars (None for branches, which share
+                     the statevars of their machine)
+
+    @type branches: {State : MachineSnapshot}
+    @ivar branches: Snapshots of the branches, keyed by branched state class
+    """
+    __slots__ = ('root', 'state', 'started', 'complete', 'eventType',
+                 'statevars', 'startStatevars', 'branches')
+
+    def __init__(self, root = None):
+        self.root = root
+        self.state = None
+        self.started = False
+        self.complete = False
+        self.eventType = None
+        self.statevars = None
+        self.startStatevars = ()
+        self.branches = {}
+
+def _serializer(serializers, name):
+    if serializers is not None and name in serializers:
+        return serializers[name]
+    return pickle
+
+def _snapshotMachine(machine):
+    snap = MachineSnapshot(machine._root)
+    if machine._currentState is not None:
+        snap.state = type(machine._currentState)
+    snap.started = machine._started
+    snap.complete = machine._complete
+    event = machine._previousEvent
+    if isinstance(event, state.SlotEvent) and event.type:
+        snap.eventType = event.type
+    for branchState, branch in machine._branches.items():
+        snap.branches[branchState] = _snapshotMachine(branch)
+    return snap
+
+def snapshot(machine, serializers = None):
+    """
+    Returns a MachineSnapshot of the machine and its branches
+
+    @type  serializers: {str : object}
+    @param serializers: Serializers of statevars by name, None to leave the
+                        statevar out (default: pickle)
+    """
+    snap = _snapshotMachine(machine)
+    snap.statevars = {}
+    for name, value in machine._statevars.items():
+        serializer = _serializer(serializers, name)
+        if serializer is not None:
+            snap.statevars[name] = serializer.dumps(value)
+    snap.startStatevars = tuple(machine._startStatevars)
+    return snap
+
+def _restoreMachine(machine, snap):
+    machine._root = snap.root
+    machine._started = snap.started
+    machine._complete = snap.complete
+    if snap.state is not None:
+        machine._enterState(snap.state)
+    if snap.eventType is not None:
+        machine._previousEvent = state.Event(snap.eventType)
+    for branchState, branchSnap in snap.branches.items():
+        branch = state.Machine(machine._statevars,
+                               reuseStates = machine._reuseStates)
+        branch._hooks = machine._hooks
+        branch._parent = machine
+        machine._branches[branchState] = branch
+        _restoreMachine(branch, branchSnap)
+
+def restore(machine, snap, statevars = None, serializers = None):
+    """
+    Stops the machine, and restores it (and its branches) to the snapshot,
+    entering the current states again
+
+    @type  statevars: dict
+    @param statevars: Statevars to use instead of the values in the snapshot,
+                      required for those left out of it
+
+    @type  serializers: {str : object}
+    @param serializers: The serializers the snapshot was taken with
+    """
+    machine.stop()
+
+    values = {}
+    for name, data in (snap.statevars or {}).items():
+        values[name] = _serializer(serializers, name).loads(data)
+    if statevars is not None:
+        values.update(statevars)
+    machine._statevars = values
+    machine._startStatevars = dict((name, values[name])
+                                   for name in snap.startStatevars
+                                   if name in values)
+    machine._stateCache.clear()
+
+    _restoreMachine(machine, snap)
+
+def dumps(snap):
+    """
+    Returns the snapshot as bytes
+    """
+    return pickle.dumps(snap, pickle.HIGHEST_PROTOCOL)
+
+def loads(data):
+    return pickle.loads(data)
+
+def _branchPath(machine):
+    """
+    The branched state classes leading from the top machine to the machine
+    """
+    path = ()
+    while machine._parent is not None:
+        path = (machine._root,) + path
+        machine = machine._parent
+    return path
+
+class Journal(state.MachineHooks):
+    """
+    Appends a record to a file for every state entered by the machines it is
+    added to (see Machine.addHooks), and for every checkpoint().  Journal.load
+    reads the file back into a MachineSnapshot.
+
+    Statevars are only recorded by checkpoint(), call it after starting a
+    machine with new statevars, or stopping a machine or branch.
+    """
+    def __init__(self, fileobj, serializers = None, flush = True):
+        """
+        @type  fileobj: a file like object
+        @param fileobj: Binary file to append the records to
+
+        @type  serializers: {str : object}
+        @param serializers: Serializers of statevars, see snapshot()
+
+        @type  flush: bool
+        @param flush: Flush the file after every record
+        """
+        self._fileobj = fileobj
+        self._serializers = serializers
+        self._flush = flush
+
+        # (next state class, event type) of transitions in progress, keyed by
+        # machine id
+        self._pending = {}
+
+    def _write(self, record):
+        pickle.dump(record, self._fileobj, pickle.HIGHEST_PROTOCOL)
+        if self._flush:
+            self._fileobj.flush()
+
+    def checkpoint(self, machine):
+        """
+        Records a full snapshot of the machine
+        """
+        self._write(('C', snapshot(machine, self._serializers)))
+
+    def transition(self, machine, currentState, event, nextState):
+        # Loopbacks and branches don't enter a state of this machine
+        if nextState is type(currentState) or \
+           type(machine._currentTransitions[event.type]) is state.Branch:
+            return
+        self._pending[id(machine)] = (nextState, event.type)
+
+    def enter(self, machine, currentState):
+        stateClass = type(currentState)
+        end = 0 == len(machine._currentTransitions)
+        pending = self._pending.pop(id(machine), None)
+        if pending is not None and pending[0] is stateClass:
+            self._write(('E', _branchPath(machine), stateClass, pending[1],
+                         end))
+        else:
+            # Started (or restored)
+            self._write(('S', _branchPath(machine), machine._root,
+                         stateClass, end))
+
+    @staticmethod
+    def load(fileobj):
+        """
+        Returns the MachineSnapshot after the last record in the file
+        """
+        snap = MachineSnapshot()
+        while True:
+            try:
+                record = pickle.load(fileobj)
+            except EOFError:
+                break
+
+            kind = record[0]
+            if 'C' == kind:
+                snap = record[1]
+                continue
+
+            node = snap
+            for branchState in record[1]:
+                branch = node.branches.get(branchState, None)
+                if branch is None:
+                    branch = MachineSnapshot(branchState)
+                    node.branches[branchState] = branch
+                node = branch
+
+            if 'S' == kind:
+                kind, path, node.root, stateClass, end = record
+                node.started = True
+                node.eventType = None
+            else:
+                kind, path, stateClass, node.eventType, end = record
+
+            # Machines exit end states as soon as they enter them
+            node.state = None if end else stateClass
+            node.complete = end
+        return snap
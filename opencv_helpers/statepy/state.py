@@ -27,12 +27,28 @@
 # File:  statepy/state.py
 
 # STD Imports
+import collections
 import inspect
+import sys
+import threading
+import time
 import types
 
 # Project Imports
 
-class Event(object):
+class SlotEvent(object):
+    """
+    Base class for events without a per instance __dict__, see
+    declareEventClass
+    """
+    __slots__ = ('type',)
+
+    def __init__(self, etype = '', **kwargs):
+        self.type = etype
+        for name, value in kwargs.items():
+            setattr(self, name, value)
+
+class Event(SlotEvent):
     """
     The action that caused a state transition, it has a type and any other
     data you wish to tag along with it.
@@ -61,19 +77,83 @@ def declareEventType(name):
     @rtype : str
     @return: The new event type
     """
-    stack = inspect.stack()
-    try:
-        frame = stack[1][0]
-        line = frame.f_lineno
-        fileName = frame.f_code.co_filename
-        
-        # Make .py vs .pyc files have the same event names
-        if fileName.endswith('.pyc'):
-            fileName = fileName[:-3] + '.py'
+    # Only the calling frame is needed, so avoid inspect.stack(), which
+    # builds (and reads the source lines of) every frame of the stack
+    frame = sys._getframe(1)
+    fileName = frame.f_code.co_filename
+
+    # Make .py vs .pyc files have the same event names
+    if fileName.endswith('.pyc'):
+        fileName = fileName[:-3] + '.py'
+
+    # Interned, so comparisons between event types are identity checks
+    return sys.intern('%s:%d %s' % (fileName, frame.f_lineno,
+                                    name.replace(' ', '_')))
+
+def declareEventClass(name, fields = ()):
+    """
+    Defines an event class with __slots__ for its type and the given data
+    fields, which is cheaper to create than Event (and has no other
+    attributes)
 
-        return '%s:%d %s' % (fileName, line, name.replace(' ', '_'))
-    finally:
-        del stack
+    @type  name: str
+    @param name: The name of the class
+
+    @type  fields: [str]
+    @param fields: The names of the data attributes of the events
+
+    @rtype : type
+    @return: The new SlotEvent subclass
+    """
+    return type(name, (SlotEvent,), {'__slots__' : tuple(fields)})
+
+# Compiled (immutable) transition tables of state classes with static
+# transitions, keyed by state class
+_transitionTables = {}
+
+# State classes whose transitions() depend on the instance (ie. statepy.Task)
+_dynamicTransitions = set()
+
+def compileTransitions(stateClass):
+    """
+    Returns the immutable transition table of the given state class, which is
+    computed once per class
+
+    @type  stateClass: State
+    @param stateClass: A state class with a static (or class) transitions
+                       method
+
+    @rtype : types.MappingProxyType
+    @return: Map of eventTypes -> resulting states
+    """
+    table = _transitionTables.get(stateClass, None)
+    if table is None:
+        table = types.MappingProxyType(dict(stateClass.transitions()))
+        _transitionTables[stateClass] = table
+    return table
+
+def getTransitionTable(state):
+    """
+    Returns the immutable transition table of the given state instance
+
+    Tables of states with static transitions are compiled once per class,
+    states with instance transitions (ie. statepy.Task) are evaluated once
+    for the given instance.
+    """
+    stateClass = type(state)
+    table = _transitionTables.get(stateClass, None)
+    if table is not None:
+        return table
+    if stateClass not in _dynamicTransitions:
+        transitions = inspect.getattr_static(stateClass, 'transitions', None)
+        if isinstance(transitions, (staticmethod, classmethod)):
+            return compileTransitions(stateClass)
+        _dynamicTransitions.add(stateClass)
+    table = state.transitions()
+    if type(table) is types.MappingProxyType:
+        # Already immutable (ie. cached by a statepy.task.TaskManager)
+        return table
+    return types.MappingProxyType(dict(table))
 
 class State(object):
     """
@@ -113,6 +193,14 @@ class State(object):
         Called when the state is exited, loopbacks don't count
         """
         pass
+
+    def reset(self):
+        """
+        Called before a reused state instance is entered again (see the
+        reuseStates option of Machine), reset any attributes set while the
+        state was last active here
+        """
+        pass
     
     def publish(self, eventType, event):
         """
@@ -149,6 +237,256 @@ class Branch(object):
         self.state = state
         self.branchingEvent = branchingEvent
 
+class MachineHooks(object):
+    """
+    Base class for objects notified of Machine activity (see
+    Machine.addHooks), for example statepy.profiler.MachineProfiler
+
+    All methods do nothing by default, override the ones you need.
+    """
+    def enter(self, machine, state):
+        """
+        Called after the given state instance has been entered
+        """
+        pass
+
+    def exit(self, machine, state):
+        """
+        Called after the given state instance has been exited
+        """
+        pass
+
+    def transition(self, machine, state, event, nextState):
+        """
+        Called when the event causes a transition (including loopbacks and
+        branches) from the state instance to the nextState class, before the
+        state is exited
+        """
+        pass
+
+    def handler(self, machine, state, event, duration):
+        """
+        Called after a transition function of the state instance has handled
+        the event, with its execution time in seconds
+        """
+        pass
+
+# StateGraphs are cached on their start state class (see Machine.stateGraph),
+# as (generation, {noLoops : StateGraph}).  Caches of older generations are
+# stale (see clearStateGraphs).
+_stateGraphGeneration = 0
+
+def clearStateGraphs():
+    """
+    Discards the StateGraphs cached by Machine.stateGraph, ie. after changing
+    the static transitions of a state class
+    """
+    global _stateGraphGeneration
+    _stateGraphGeneration += 1
+
+def _classTransitions(stateClass, statevars = None):
+    """
+    Returns the transition table of the given state class, and whether it is
+    static (the same for every instance)
+    """
+    transitions = inspect.getattr_static(stateClass, 'transitions', None)
+    if isinstance(transitions, (staticmethod, classmethod)):
+        return compileTransitions(stateClass), True
+    if statevars is None:
+        return stateClass.transitions(), False
+    return getTransitionTable(stateClass(**statevars)), False
+
+class StateGraph(object):
+    """
+    The graph of the state classes reachable from a start state (see
+    Machine.stateGraph)
+
+    @type states: [State]
+    @ivar states: The state classes in the order they were traversed
+
+    @type edges: [(State, str, State, bool)]
+    @ivar edges: (state, event type, next state, branching) for every
+                 transition, in the order they were traversed
+
+    @type transitions: {State : {str : State}}
+    @ivar transitions: The transition table of every state class
+
+    @type static: bool
+    @ivar static: Whether all the transition tables are static (the same for
+                  every instance, unlike the tables of statepy.task.Task)
+    """
+    def __init__(self, startState, noLoops = False, statevars = None):
+        """
+        Traverses the states depth first, without recursion, evaluating the
+        transition table of each state once
+
+        @type  noLoops: bool
+        @param noLoops: Leave out loopback transitions
+
+        @type  statevars: dict
+        @param statevars: The statevars to create the states whose
+                          transitions depend on the instance with (ie. the
+                          taskManager of statepy.task.Task)
+        """
+        self.startState = startState
+        self.noLoops = noLoops
+        self.states = []
+        self.edges = []
+        self.transitions = {}
+        self.static = True
+
+        traversed = set()
+        stack = [(startState, None)]
+        while stack:
+            currentState, items = stack[-1]
+            if items is None:
+                table = self.transitions.get(currentState, None)
+                if table is None:
+                    table, static = _classTransitions(currentState,
+                                                      statevars)
+                    self.transitions[currentState] = table
+                    self.static = self.static and static
+                if 0 == len(table):
+                    if currentState not in traversed:
+                        traversed.add(currentState)
+                        self.states.append(currentState)
+                    stack.pop()
+                    continue
+                items = iter(table.items())
+                stack[-1] = (currentState, items)
+
+            for aiEvent, aiState in items:
+                branching = type(aiState) is Branch
+                if branching:
+                    aiState = aiState.state
+                if noLoops and aiState is currentState:
+                    continue
+
+                self.edges.append((currentState, aiEvent, aiState, branching))
+                if currentState not in traversed:
+                    traversed.add(currentState)
+                    self.states.append(currentState)
+
+                # Don't recurse on a state we have already seen
+                if aiState not in traversed:
+                    stack.append((aiState, None))
+                    break
+            else:
+                stack.pop()
+
+        # Next states of each state
+        self._successors = {}
+        for currentState, aiEvent, aiState, branching in self.edges:
+            self._successors.setdefault(currentState, set()).add(aiState)
+
+    def reachable(self, fromState = None):
+        """
+        Returns the set of state classes reachable (including by branching)
+        from the given state (default: the start state), including itself
+        """
+        if fromState is None:
+            fromState = self.startState
+        reached = set([fromState])
+        pending = [fromState]
+        while pending:
+            for nextState in self._successors.get(pending.pop(), ()):
+                if nextState not in reached:
+                    reached.add(nextState)
+                    pending.append(nextState)
+        return reached
+
+    def endStates(self):
+        """
+        Returns the state classes with no transitions
+        """
+        return [s for s in self.states if 0 == len(self.transitions[s])]
+
+    def deadEnds(self):
+        """
+        Returns the state classes with no transitions which are not marked as
+        valid end points (subclasses of End)
+        """
+        return [s for s in self.endStates() if not issubclass(s, End)]
+
+    def traps(self):
+        """
+        Returns the state classes from which no state without transitions is
+        reachable (ie. the machine can never complete once it is there)
+        """
+        ends = set(self.endStates())
+        # Walk the transitions backwards from the end states
+        predecessors = {}
+        for currentState, nextStates in self._successors.items():
+            for nextState in nextStates:
+                predecessors.setdefault(nextState, set()).add(currentState)
+        completing = set(ends)
+        pending = list(ends)
+        while pending:
+            for previousState in predecessors.get(pending.pop(), ()):
+                if previousState not in completing:
+                    completing.add(previousState)
+                    pending.append(previousState)
+        return [s for s in self.states if s not in completing]
+
+    def formatEdges(self, edgeWeights = None, maxWeight = 1):
+        """
+        Returns the DOT lines of the edges (see Machine.writeStateGraph)
+        """
+        lines = []
+        for currentState, aiEvent, aiState, branching in self.edges:
+            eventName = str(aiEvent).split(' ')[-1]
+
+            # Style is determine whether or not we are branching
+            style = "solid"
+            if branching:
+                style = "dotted"
+
+            # Determine state names
+            startName = Machine._dottedName(currentState)
+            endName = Machine._dottedName(aiState)
+
+            if edgeWeights is None:
+                lines.append("%s -> %s [label=%s,style=%s]" %
+                             (startName, endName, eventName, style))
+            else:
+                weight = edgeWeights.get((currentState, aiEvent), 0)
+                lines.append('%s -> %s [label="%s (%d)",style=%s,'
+                             'penwidth=%.1f]' % (startName, endName,
+                                                 eventName, weight, style,
+                                                 1 + 4. * weight / maxWeight))
+        return lines
+
+    def write(self, fileobj, ordered = False, edgeWeights = None):
+        """
+        Writes the graph in DOT format, see Machine.writeStateGraph
+        """
+        fileobj.write("digraph aistate {\n")
+        maxWeight = 1
+        if edgeWeights:
+            maxWeight = max(1, max(edgeWeights.values()))
+        stateTransitionList = self.formatEdges(edgeWeights, maxWeight)
+        
+        # Sort list for determinism
+        if ordered:
+            stateTransitionList.sort()
+
+        # Output Labels in Simple format        
+        traversedStates = sorted(self.states, key = Machine._dottedName)
+        for state in traversedStates:
+            fullName = Machine._dottedName(state)
+            shortName = state.__name__
+            # Shape denots "end" states with a "Stop Sign" type shape
+            shape = 'ellipse'
+            if 0 == len(self.transitions[state]):
+                shape = 'doubleoctagon'
+            fileobj.write('%s [label=%s,shape=%s]\n' % \
+                          (fullName, shortName, shape))
+
+        for item in stateTransitionList:
+            fileobj.write(item + "\n")
+        fileobj.write("}")
+        fileobj.flush() # Push data to file
+
 class Machine(object):
     """
     An event based finite state machine.
@@ -180,12 +518,21 @@ class Machine(object):
     STATE_EXITED = declareEventType('STATE_EXITED')
     COMPLETE = declareEventType('COMPLETE')
     
-    def __init__(self, statevars = None):
+    def __init__(self, statevars = None, queued = False, reuseStates = False):
         """
         The constructor for the Machine class.
 
         @type  statevars: dict
         @param statevars: A dictionary of the object variables given to states
+
+        @type  queued: bool
+        @param queued: Queue events from injectEvent and injectMany, and
+                       dispatch them one at a time (see postEvent)
+
+        @type  reuseStates: bool
+        @param reuseStates: Create one instance of each state class (until
+                            the statevars change), and reuse it every time
+                            the state is entered, calling State.reset first
         """
         
         if statevars is None:
@@ -194,15 +541,35 @@ class Machine(object):
         # Set default instance values
         self._root = None
         self._currentState = None
+        self._currentTransitions = {}
         self._started = False
         self._complete = False
         self._previousEvent = Event()
         self._statevars = {}
         self._startStatevars = {}
         self._branches = {}
+
+        # Branched machines, keyed by the event types their current states
+        # transition on (in branching order), and the machine a branched
+        # machine belongs to
+        self._branchesByEvent = {}
+        self._parent = None
         
         # Load up the arguments
         self._statevars = statevars
+
+        # Queued dispatch: (event, sendToBranches) pairs, the deque is safe
+        # to append to from any thread without locking
+        self._queued = queued
+        self._eventQueue = collections.deque()
+        self._dispatchLock = threading.Lock()
+
+        # MachineHooks notified of activity, shared with branches
+        self._hooks = []
+
+        # Reused (state instance, transition table) pairs, keyed by class
+        self._reuseStates = reuseStates
+        self._stateCache = {}
         
     def currentState(self):
         return self._currentState
@@ -221,9 +588,14 @@ class Machine(object):
         @param statevars: An additional dictionary of variables for the State
         """
 
+        # Reused states hold the previous statevars
+        if self._startStatevars or statevars is not None:
+            self._stateCache.clear()
+
         # Remove the previous startStatevars from our list of variables
         for key in self._startStatevars.keys():
             del self._statevars[key]
+        self._startStatevars = {}
 
         if statevars is not None:
             # Ensure there is no overlap
@@ -268,6 +640,7 @@ class Machine(object):
         for branch in self._branches.values():
             branch.stop()
         self._branches = {}
+        self._branchesByEvent = {}
         
     def stopBranch(self, stateType):
         """
@@ -276,12 +649,26 @@ class Machine(object):
         self._branches[stateType].stop()
         del self._branches[stateType]
 
+    def addHooks(self, hooks):
+        """
+        Notify the given MachineHooks of the activity of this machine, and
+        of its branches
+        """
+        self._hooks.append(hooks)
+
+    def removeHooks(self, hooks):
+        self._hooks.remove(hooks)
+
     def injectEvent(self, rawEvent, _sendToBranches = False):
         """
         Sends an event into the state machine
         
         If currents states transition table has an entry for events of this 
         type this will cause a transition
+
+        For queued machines, the event is queued and then dispatched, unless
+        another thread is dispatching or this is called from within a state
+        (in which case the event is processed once the current one is done).
         
         @type  event: Event or str
         @param event: A new event for the state machine to process 
@@ -290,6 +677,73 @@ class Machine(object):
         @param _sendToBranches: Use only for testing, injects events into 
                                 branched state machines
         """
+        if self._queued:
+            self.postEvent(rawEvent, _sendToBranches)
+            self.dispatchEvents()
+        else:
+            self._processEvent(rawEvent, _sendToBranches)
+
+    def injectMany(self, rawEvents, _sendToBranches = False):
+        """
+        Sends a sequence of events into the state machine, in order
+
+        Each event is processed to completion before the next one.
+
+        @type  rawEvents: iterable of Event or str
+        @param rawEvents: The events for the state machine to process
+        """
+        if self._queued:
+            self._eventQueue.extend((rawEvent, _sendToBranches)
+                                    for rawEvent in rawEvents)
+            self.dispatchEvents()
+        else:
+            for rawEvent in rawEvents:
+                self._processEvent(rawEvent, _sendToBranches)
+
+    def postEvent(self, rawEvent, _sendToBranches = False):
+        """
+        Queues an event without dispatching it, safe to call from any thread
+
+        Queued events are processed by dispatchEvents (or by the next
+        injectEvent of a queued machine).
+        """
+        self._eventQueue.append((rawEvent, _sendToBranches))
+
+    def dispatchEvents(self, maxCount = None):
+        """
+        Processes queued events, in order, until the queue is empty
+
+        Only one thread dispatches at a time, and every event is processed to
+        completion before the next: if another thread is dispatching, or this
+        is called from within a state of this machine, this returns
+        immediately, and the events are processed by the active dispatcher.
+
+        @type  maxCount: int
+        @param maxCount: Maximum number of events to process (default: all)
+
+        @rtype : int
+        @return: The number of events processed
+        """
+        count = 0
+        queue = self._eventQueue
+        while queue and (maxCount is None or count < maxCount):
+            if not self._dispatchLock.acquire(False):
+                break
+            try:
+                while queue and (maxCount is None or count < maxCount):
+                    rawEvent, sendToBranches = queue.popleft()
+                    count += 1
+                    self._processEvent(rawEvent, sendToBranches)
+            finally:
+                self._dispatchLock.release()
+            # Loop: an event may have been queued by another thread after the
+            # queue was last checked, but before the lock was released
+        return count
+
+    def _processEvent(self, rawEvent, _sendToBranches = False):
+        """
+        Processes an event, see injectEvent
+        """
         # If the state we just entered transitions on same kind of event that
         # caused the transition, we can be notified again with the same event!
         # This check here prevents that event from causing an unwanted 
@@ -298,7 +752,7 @@ class Machine(object):
             return
 
         # Make sure the event is of the right class
-        if isinstance(rawEvent, Event):
+        if isinstance(rawEvent, SlotEvent):
             event = rawEvent
         else:
             event = Event(rawEvent)
@@ -306,8 +760,7 @@ class Machine(object):
         if not self._started:
             raise Exception("Machine must be started")
         
-        transitionTable = self._currentState.transitions()
-        nextState = transitionTable.get(event.type, None)
+        nextState = self._currentTransitions.get(event.type, None)
         if nextState is not None:
             # Determine if we are branching
             branching = False
@@ -328,13 +781,22 @@ class Machine(object):
             
             # We are leaving the current state
             currentState = self._currentState
+            for hooks in self._hooks:
+                hooks.transition(self, currentState, event, nextState)
             if leaveState:
                 self._exitState()
             
             # Call the function for the transitions
             transFunc = self._getTransitionFunc(event.type, currentState)
             if transFunc is not None:
-                transFunc(event)
+                if self._hooks:
+                    start = time.perf_counter()
+                    transFunc(event)
+                    duration = time.perf_counter() - start
+                    for hooks in self._hooks:
+                        hooks.handler(self, currentState, event, duration)
+                else:
+                    transFunc(event)
 
             # Notify that we are entering the next state
             if (not loopback) and (not branching):
@@ -346,9 +808,13 @@ class Machine(object):
         # Record previous event
         self._previousEvent = event
         
+        # Only branches whose current state transitions on this type of event
+        # need it
         if _sendToBranches:
-            for branch in self._branches.values():
-                branch.injectEvent(event)
+            branches = self._branchesByEvent.get(event.type, None)
+            if branches:
+                for branch in list(branches):
+                    branch.injectEvent(event)
 
     @property
     def complete(self):
@@ -364,20 +830,35 @@ class Machine(object):
         
         # Create state instance from class, make sure to pass all subsystems
         # along as well
-        newState = newStateClass(**self._statevars)
+        cached = None
+        if self._reuseStates:
+            cached = self._stateCache.get(newStateClass, None)
+        if cached is not None:
+            newState, transitionTable = cached
+            newState.reset()
+            if newStateClass in _dynamicTransitions:
+                # The table may have changed (ie. a TaskManager reordered)
+                transitionTable = newState.transitions()
+                if type(transitionTable) is not types.MappingProxyType:
+                    transitionTable = types.MappingProxyType(
+                        dict(transitionTable))
+        else:
+            newState = newStateClass(**self._statevars)
         
-        # Subscribe to every event of the desired type
-        # <EVENT SUBSCRIBTION USE TO HAPPEN HERE>
-        transitionTable = newState.transitions()
+            # Subscribe to every event of the desired type
+            # <EVENT SUBSCRIBTION USE TO HAPPEN HERE>
+            transitionTable = getTransitionTable(newState)
+            if self._reuseStates:
+                self._stateCache[newStateClass] = (newState, transitionTable)
         
         # Actual enter the state and record it as our new current state
         self._currentState = newState
+        self._setTransitions(transitionTable)
         self._currentState.enter()
         
         # Notify everyone we just entered the state
-        #fullClassName = '%s.%s' % (self._currentState.__class__.__module__, 
-        #                           self._currentState.__class__.__name__)
-        # NOTIFY STATE BEING ENTERED
+        for hooks in self._hooks:
+            hooks.enter(self, newState)
         
         # If we are in a state with no way out, exit the state and mark ourself
         # complete
@@ -392,18 +873,44 @@ class Machine(object):
         """
         self._currentState.exit()
                 
-        # NOTIFY STATE BEING EXIT
-        #fullClassName = '%s.%s' % (self._currentState.__class__.__module__, 
-        #                           self._currentState.__class__.__name__)
+        # Notify everyone we just exited the state
+        for hooks in self._hooks:
+            hooks.exit(self, self._currentState)
         
         self._currentState = None
+        self._setTransitions({})
+
+    def _setTransitions(self, transitionTable):
+        """
+        Records the transition table of the current state, and updates the
+        branch index of the machine this branch belongs to
+        """
+        previousTable = self._currentTransitions
+        self._currentTransitions = transitionTable
+        if self._parent is not None:
+            self._parent._indexBranch(self, previousTable, transitionTable)
+
+    def _indexBranch(self, branch, previousTable, transitionTable):
+        index = self._branchesByEvent
+        for etype in previousTable:
+            if etype not in transitionTable:
+                branches = index[etype]
+                del branches[branch]
+                if not branches:
+                    del index[etype]
+        for etype in transitionTable:
+            if etype not in previousTable:
+                index.setdefault(etype, {})[branch] = None
 
     def _branchToState(self, nextState, branchingEvent = None):
         if nextState in self._branches:
             raise Exception("Already branched to this state")
         
         # Create new state machine
-        branchedMachine = Machine(self._statevars)
+        branchedMachine = Machine(self._statevars,
+                                  reuseStates = self._reuseStates)
+        branchedMachine._hooks = self._hooks
+        branchedMachine._parent = self
 
         # Start it up with the proper state
         branchedMachine.start(nextState)
@@ -422,27 +929,47 @@ class Machine(object):
         
         This uses the event type of the event which caused the transition to
         determine which member funtion of the self._currentState to call.
+        Only the matching attribute is looked up, instead of all members of
+        the state.
         """
         # Trim etype of namespace stuff
-        etype = etype.split(' ')[-1]
-        
-        # Grab all member functions
-        members = inspect.getmembers(obj, inspect.ismethod)
+        name = etype.rpartition(' ')[2]
 
-        # See if we have a matching method
-        matches = [func for name,func in members if name == etype]
-
-        # We found it
-        assert len(matches) < 2
-        if len(matches) > 0:
-            return matches[0]
+        # See if we have a matching method (methods assigned to the instance
+        # included, static methods and plain functions excluded)
+        func = getattr(obj, name, None)
+        if inspect.ismethod(func):
+            return func
 
     @property
     def branches(self):
         return self._branches
 
     @staticmethod
-    def writeStateGraph(fileobj, startState, ordered = False, noLoops = False):
+    def stateGraph(startState, noLoops = False, statevars = None):
+        """
+        Returns the StateGraph of the state machine starting at the given
+        state (see StateGraph)
+
+        Graphs of static transition tables are built once per start state
+        (until clearStateGraphs() is called) and cached on the start state
+        class, other graphs (ie. of statepy.task.Task states, which depend on
+        the task order) are built on every call.
+        """
+        cache = startState.__dict__.get('_stateGraphCache', None)
+        if cache is None or cache[0] != _stateGraphGeneration:
+            cache = (_stateGraphGeneration, {})
+        graph = cache[1].get(noLoops, None)
+        if graph is None:
+            graph = StateGraph(startState, noLoops, statevars)
+            if graph.static:
+                cache[1][noLoops] = graph
+                startState._stateGraphCache = cache
+        return graph
+
+    @staticmethod
+    def writeStateGraph(fileobj, startState, ordered = False, noLoops = False,
+                        edgeWeights = None):
         """
         Write the graph of the state machine starting at the given state to
         the fileobj.
@@ -456,65 +983,23 @@ class Machine(object):
         
         @type  ordered: boolean
         @param ordered: Whether or not to alphabetize the states
-        """
-        fileobj.write("digraph aistate {\n")
-        stateTransitionList = []
-        traversedStates = []
-        
-        Machine._traverse(startState, stateTransitionList, traversedStates,
-                          noLoops)
-        
-        # Sort list for determinism
-        if ordered:
-            stateTransitionList.sort()
-
-        # Output Labels in Simple format        
-        traversedStates.sort(key = Machine._dottedName)
-        for state in traversedStates:
-            fullName = Machine._dottedName(state)
-            shortName = state.__name__
-            # Shape denots "end" states with a "Stop Sign" type shape
-            shape = 'ellipse'
-            if 0 == len(state.transitions()):
-                shape = 'doubleoctagon'
-            fileobj.write('%s [label=%s,shape=%s]\n' % \
-                          (fullName, shortName, shape))
 
-        for item in stateTransitionList:
-            fileobj.write(item + "\n")
-        fileobj.write("}")
-        fileobj.flush() # Push data to file
+        @type  edgeWeights: {(State, str) : int}
+        @param edgeWeights: Optional counts (ie. from
+                            statepy.profiler.MachineProfiler) keyed by state
+                            class and event type, shown in the edge labels
+                            and as edge widths
+        """
+        Machine.stateGraph(startState, noLoops).write(fileobj, ordered,
+                                                      edgeWeights)
         
     @staticmethod
-    def _traverse(currentState,stateList,traversedList,noLoops=False):
-        if 0 == len(currentState.transitions()):
-            if not currentState in traversedList:
-                    traversedList.append(currentState)
-        else:
-            for aiEvent,aiState in currentState.transitions().items():
-                eventName = str(aiEvent).split(' ')[-1]
-                
-                # Style is determine whether or not we are branching
-                style = "solid"
-                if type(aiState) is Branch:
-                    style = "dotted"
-                    aiState = aiState.state
-                
-                # Determine state names
-                startName = Machine._dottedName(currentState)
-                endName = Machine._dottedName(aiState)
-
-                if (not noLoops) or (startName != endName):
-                    strStruct = "%s -> %s [label=%s,style=%s]" % \
-                        (startName, endName, eventName, style)
-                    stateList.append(strStruct)
-                    if not currentState in traversedList:
-                        traversedList.append(currentState)
-
-                    # Don't recuse on a state we have already seen
-                    if not aiState in traversedList:
-                        Machine._traverse(aiState, stateList,
-                                          traversedList, noLoops)
+    def _traverse(currentState,stateList,traversedList,noLoops=False,
+                  edgeWeights=None,maxWeight=1):
+        graph = Machine.stateGraph(currentState, noLoops)
+        stateList.extend(graph.formatEdges(edgeWeights, maxWeight))
+        traversedList.extend(graph.states)
+
     @staticmethod
     def _dottedName(cls):
         return cls.__module__.replace('.','_') + '_' + cls.__name__
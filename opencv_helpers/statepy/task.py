@@ -27,13 +27,16 @@
 # File:  statepy/task.py
 
 # STD Imports
+import inspect
+import types
 
 # Project Imports
 import statepy
 import statepy.state as state
+import statepy.timer as timer
 
-# Special event that denotes 
-TIMEOUT = state.declareEventType('TIMEOUT')        
+# Special event that denotes the task timed out, see statepy.timer
+TIMEOUT = timer.TIMEOUT
 
 class Next(state.State):
     """
@@ -57,9 +60,18 @@ class TaskManager(state.State):
     """
     Basic implementation of a task manager which provides the next task
     in a list of tasks.  This can be replaced by any kind system you want,
-    including one that provides dynamic ordering, unlike the fixed upon
-    contruction order provided here.
+    the order can be changed after contruction (see setTaskOrder,
+    insertTask and removeTask).
+
+    The transition tables of tasks are resolved once per task class (see
+    getTransitions), and only resolved again when their next task or failure
+    state changes.  Subclasses which override getNextTask or getFailureState
+    are asked every time instead, unless they set cacheTransitions to True.
     """
+
+    # Whether Tasks use the tables of getTransitions (None: only if
+    # getNextTask and getFailureState are not overridden)
+    cacheTransitions = None
     def __init__(self, taskOrder, failureTasks = None):
         """
         @type  taskOrder: [statepy.task.Task]
@@ -69,10 +81,24 @@ class TaskManager(state.State):
         @param failureTasks: Maps a task to the state you go into upon failure
         """
 
+        # Resolved transition tables, keyed by task class
+        self._transitionTables = {}
+
         # Build list of next states
         self._nextTaskMap = {}
         self._taskOrder = []
+        self.setTaskOrder(taskOrder)
+            
+        # Build list of failure tasks
+        self._failureTaskMap = {}
+        if failureTasks is not None:
+            self._failureTaskMap = dict(failureTasks)
 
+    def setTaskOrder(self, taskOrder):
+        """
+        Replaces the order of the tasks
+        """
+        nextTaskMap = {}
         for i, taskClass  in enumerate(taskOrder):
             # Determine which task is really next
             nextTaskClass = End
@@ -80,15 +106,47 @@ class TaskManager(state.State):
                 nextTaskClass = taskOrder[i + 1]
             
             # Store the results
-            self._nextTaskMap[taskClass] = nextTaskClass
-            
-            # Record the current class
-            self._taskOrder.append(taskClass)
-            
-        # Build list of failure tasks
-        self._failureTaskMap = {}
-        if failureTasks is not None:
-            self._failureTaskMap = failureTasks
+            nextTaskMap[taskClass] = nextTaskClass
+
+        # Only tasks whose next task changed need their tables resolved again
+        for taskClass in set(self._nextTaskMap).union(nextTaskMap):
+            if self._nextTaskMap.get(taskClass, None) is not \
+               nextTaskMap.get(taskClass, None):
+                self._transitionTables.pop(taskClass, None)
+
+        self._nextTaskMap = nextTaskMap
+        self._taskOrder = list(taskOrder)
+
+    def insertTask(self, index, taskClass):
+        """
+        Inserts the task before the given position in the task order
+        """
+        taskOrder = list(self._taskOrder)
+        taskOrder.insert(index, taskClass)
+        self.setTaskOrder(taskOrder)
+
+    def removeTask(self, taskClass):
+        """
+        Removes the task from the task order
+        """
+        taskOrder = list(self._taskOrder)
+        taskOrder.remove(taskClass)
+        self.setTaskOrder(taskOrder)
+
+    def setFailureState(self, task, failureState):
+        """
+        Sets the state the task goes into upon failure (None for no failure
+        state)
+        """
+        if failureState is None:
+            self._failureTaskMap.pop(task, None)
+        else:
+            self._failureTaskMap[task] = failureState
+        self._transitionTables.pop(task, None)
+
+    @property
+    def taskOrder(self):
+        return tuple(self._taskOrder)
 
     def getNextTask(self, task):
         """
@@ -106,8 +164,57 @@ class TaskManager(state.State):
         """
         return self._failureTaskMap.get(task, None)
 
-    
-# NOTE: Timeout and Events not in stand alone StatePy so sections disabled
+    def getTransitions(self, task):
+        """
+        Returns the immutable transition table of the given task class, with
+        the Next and Failure markers replaced by the real states
+        """
+        table = self._transitionTables.get(task, None)
+        if table is None:
+            table = types.MappingProxyType(_resolveTransitions(
+                task._transitions(), self.getNextTask(task),
+                self.getFailureState(task)))
+            self._transitionTables[task] = table
+        return table
+
+def _cachesTransitions(taskManager):
+    if not isinstance(taskManager, TaskManager):
+        return False
+    managerClass = type(taskManager)
+    if managerClass.cacheTransitions is not None:
+        return managerClass.cacheTransitions
+    return managerClass.getNextTask is TaskManager.getNextTask and \
+        managerClass.getFailureState is TaskManager.getFailureState
+
+# Whether _transitions is a static (or class) method, keyed by task class
+_staticTasks = {}
+
+def _isStatic(taskClass):
+    static = _staticTasks.get(taskClass, None)
+    if static is None:
+        transitions = inspect.getattr_static(taskClass, '_transitions', None)
+        static = isinstance(transitions, (staticmethod, classmethod))
+        _staticTasks[taskClass] = static
+    return static
+
+def _resolveTransitions(baseTrans, nextState, failureState):
+    newTrans = {}
+    for eventType, toState in baseTrans.items():
+        if toState == Next:
+            # If the next state is the special Next marker state, swap it 
+            # out for the real next state
+            toState = nextState
+        elif toState == Failure:
+            # If that state is the special failure marker state, swap it 
+            # out for the real failure state
+            if failureState is None:
+                raise RuntimeError("ERROR: transition to non existent failure state")
+            toState = failureState
+        
+        # Store the event
+        newTrans[eventType] = toState
+        
+    return newTrans
 
 class Task(state.State):
     """
@@ -118,6 +225,9 @@ class Task(state.State):
     It expects a 'taskManager' which provides 'getNextTask' and
     'getFailureState' methods.  These all the Task to setup its transition
     table at runtime based upon the desired task ordering.
+
+    Tasks with a TIMEOUT transition and a 'timeout' (in seconds) are sent a
+    TIMEOUT event by a statepy.timer.TimerService added to their machine.
     """
 
     # Change me if you wish to have the task manager called something different
@@ -132,75 +242,25 @@ class Task(state.State):
             msg = 'No TaskManager of name "%s" provided to Task State' % Task.TASK_MANAGER_NAME
             raise statepy.StatePyException(msg)
         
-        # Dynamically create our event
-        #self._timeoutEvent = core.declareEventType(
-        #    'TIMEOUT_' + self.__class__.__name__)
-        
         # From the AI grab our next task
         self._taskManager = statevars[Task.TASK_MANAGER_NAME]
-        self._nextState = self._taskManager.getNextTask(type(self))
-        self._failureState = self._taskManager.getFailureState(type(self))
-    
-        # Timeout related values, set later on
-        #self._hasTimeout = False
-        #self._timeoutDuration = None
-        #self._timer = None
-    
-    #@property
-    #def timeoutEvent(self):
-    #    return self._timeoutEvent
-    
-    #@property
-    #def timeoutDuration(self):
-    #    return self._timeoutDuration
+        self._cachedTransitions = _cachesTransitions(self._taskManager) \
+            and _isStatic(type(self))
         
     def transitions(self):
         """
         A dynamic transition function which allows you to wire together a 
         missions dynamically.
-        """
-        baseTrans = self._transitions()
-        newTrans = {}
-        for eventType, nextState in baseTrans.items():
-            # Catch the timeout event and replace with our class specific 
-            # timeout event type
-            #if eventType == TIMEOUT:
-            #    eventType = self._timeoutEvent
-            #    self._hasTimeout = True
-            
-            if nextState == Next:
-                # If the next state is the special Next marker state, swap it 
-                # out for the real next state
-                nextState = self._nextState
-            elif nextState == Failure:
-                # If that state is the special failure marker state, swap it 
-                # out for the real failure state
-                if self._failureState is None:
-                    raise RuntimeError("ERROR: transition to non existent failure state")
-                nextState = self._failureState
-            
-            # Store the event
-            newTrans[eventType] = nextState
-            
-        return newTrans
 
-#    @staticmethod
-#    def getattr():
-#        return set(['timeout'])
-    
-#    def enter(self, defaultTimeout = None):
-#        if self._hasTimeout:
-            # Get timeout duration from configuration file
-#            if defaultTimeout is None:
-#                self._timeoutDuration = self._config['timeout']
-#            else:
-#                self._timeoutDuration = self._config.get('timeout', 
-#                                                          defaultTimeout)
-            # Start our actual timeout timer
-#            self._timer = self.timerManager.newTimer(self._timeoutEvent, 
-#                                                    self._timeoutDuration)
-#            self._timer.start()
-            
-#    def exit(self):
-#        if self._timer is not None:
-#            self._timer.stop()
+        The table is resolved once per task class by a TaskManager (if
+        _transitions is a static or class method, see
+        TaskManager.cacheTransitions), other task managers are asked for the
+        next and failure states every time.
+        """
+        taskManager = self._taskManager
+        taskClass = type(self)
+        if self._cachedTransitions:
+            return taskManager.getTransitions(taskClass)
+        return _resolveTransitions(self._transitions(),
+                                   taskManager.getNextTask(taskClass),
+                                   taskManager.getFailureState(taskClass))
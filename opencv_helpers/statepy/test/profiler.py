@@ -0,0 +1,124 @@
+# Copyright (c) 2009, Joseph Lisee
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of StatePy nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Joseph Lisee ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL <copyright holder> BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# File:  statepy/test/profiler.py
+
+# Python Imports
+import unittest
+import io
+
+# Project Imports
+import statepy.state as state
+import statepy.profiler as profiler
+
+class Start(state.State):
+    @staticmethod
+    def transitions():
+        return { "Update" : Start,
+                 "Change" : Middle }
+
+    def Update(self, event):
+        pass
+
+class Middle(state.State):
+    @staticmethod
+    def transitions():
+        return { "Change" : Start,
+                 "Finish" : End }
+
+class End(state.End):
+    pass
+
+class TestMachineProfiler(unittest.TestCase):
+    def setUp(self):
+        self.profiler = profiler.MachineProfiler(startState = Start)
+        self.machine = state.Machine()
+        self.machine.addHooks(self.profiler)
+        self.machine.start(Start)
+
+    def _inject(self, *etypes):
+        for etype in etypes:
+            self.machine.injectEvent(state.Event(etype))
+
+    def testPreallocated(self):
+        self.assertEqual(set([Start, Middle, End]), set(self.profiler.states))
+        self.assertEqual(0, self.profiler.transitionCounts[(Middle, "Finish")])
+
+    def testCounts(self):
+        self._inject("Update", "Update", "Change", "Change", "Change",
+                     "Finish")
+        self.assertTrue(self.machine.complete)
+
+        p = self.profiler
+        self.assertEqual(2, p.transitionCounts[(Start, "Update")])
+        self.assertEqual(2, p.transitionCounts[(Start, "Change")])
+        self.assertEqual(1, p.transitionCounts[(Middle, "Change")])
+        self.assertEqual(1, p.transitionCounts[(Middle, "Finish")])
+
+        # Loopbacks don't re-enter the state
+        self.assertEqual(2, p.enterCounts[p.states.index(Start)])
+        self.assertEqual(2, p.enterCounts[p.states.index(Middle)])
+        self.assertEqual(1, p.enterCounts[p.states.index(End)])
+
+        # Only Start has a transition function
+        self.assertEqual(2, p.handlerCounts[p.states.index(Start)])
+        self.assertEqual(0, p.handlerCounts[p.states.index(Middle)])
+        self.assertTrue(p.dwellTimes[p.states.index(Start)] > 0)
+
+        self.assertEqual(4, len(p.table().splitlines()))
+
+    def testGraph(self):
+        self._inject("Change", "Finish")
+        mockFile = io.StringIO()
+        self.profiler.writeStateGraph(mockFile)
+        output = mockFile.getvalue()
+        self.assertTrue('profiler_Middle -> profiler_End '
+                        '[label="Finish (1)",style=solid,penwidth=5.0]'
+                        in output)
+        self.assertTrue('profiler_Start -> profiler_Start '
+                        '[label="Update (0)",style=solid,penwidth=1.0]'
+                        in output)
+
+    def testGraphStartState(self):
+        # Without a start state, the graph starts at the first state entered
+        p = profiler.MachineProfiler()
+        self.assertRaises(ValueError, p.writeStateGraph, io.StringIO())
+
+        machine = state.Machine()
+        machine.addHooks(p)
+        machine.start(Middle)
+        mockFile = io.StringIO()
+        p.writeStateGraph(mockFile)
+        self.assertTrue('profiler_Middle -> profiler_End '
+                        '[label="Finish (0)",style=solid,penwidth=1.0]'
+                        in mockFile.getvalue())
+
+    def testRemoveHooks(self):
+        self.machine.removeHooks(self.profiler)
+        self._inject("Change")
+        self.assertEqual(0, self.profiler.transitionCounts[(Start, "Change")])
+
+if __name__ == '__main__':
+    unittest.main()
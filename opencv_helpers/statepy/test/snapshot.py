@@ -0,0 +1,209 @@
+# Copyright (c) 2009, Joseph Lisee
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of StatePy nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Joseph Lisee ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL <copyright holder> BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# File:  statepy/test/snapshot.py
+
+# Python Imports
+import unittest
+import io
+import json
+
+# Project Imports
+import statepy.state as state
+import statepy.snapshot as snapshot
+
+class Start(state.State):
+    @staticmethod
+    def transitions():
+        return { "Change" : Middle,
+                 "Update" : Start,
+                 "Branch" : state.Branch(Branched) }
+
+    def enter(self):
+        self.entered.append(type(self))
+
+class Middle(state.State):
+    @staticmethod
+    def transitions():
+        return { "Change" : Start,
+                 "Finish" : End }
+
+    def enter(self):
+        self.entered.append(type(self))
+
+class End(state.End):
+    pass
+
+class Branched(state.State):
+    @staticmethod
+    def transitions():
+        return { "InBranch" : BranchedMiddle }
+
+class BranchedMiddle(state.State):
+    @staticmethod
+    def transitions():
+        return { "InBranchEnd" : End }
+
+class JsonSerializer(object):
+    dumps = staticmethod(lambda value: json.dumps(value).encode())
+    loads = staticmethod(lambda data: json.loads(data.decode()))
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.entered = []
+        self.machine = state.Machine(statevars = {'entered' : self.entered})
+        self.machine.start(Start, statevars = {'count' : 3})
+
+    def _inject(self, *etypes, **kwargs):
+        for etype in etypes:
+            self.machine.injectEvent(state.Event(etype), **kwargs)
+
+    def _restore(self, snap, **kwargs):
+        self.restoredEntered = []
+        machine = state.Machine()
+        snapshot.restore(machine, snap, serializers = {'entered' : None},
+                         statevars = {'entered' : self.restoredEntered},
+                         **kwargs)
+        return machine
+
+    def testRestore(self):
+        self._inject("Change")
+        snap = snapshot.snapshot(self.machine,
+                                 serializers = {'entered' : None})
+        self.assertEqual(Middle, snap.state)
+        self.assertEqual("Change", snap.eventType)
+
+        machine = self._restore(snapshot.loads(snapshot.dumps(snap)))
+        self.assertEqual(Middle, type(machine.currentState()))
+        self.assertEqual(3, machine.currentState().count)
+
+        # Only the current state is entered again
+        self.assertEqual([Middle], self.restoredEntered)
+
+        machine.injectEvent(state.Event("Finish"))
+        self.assertTrue(machine.complete)
+
+    def testStartStatevars(self):
+        snap = snapshot.snapshot(self.machine,
+                                 serializers = {'entered' : None})
+        machine = self._restore(snap)
+
+        # Starting again replaces the start statevars
+        machine.start(Start, statevars = {'count' : 4})
+        self.assertEqual(4, machine.currentState().count)
+
+    def testSerializers(self):
+        serializers = {'entered' : None, 'count' : JsonSerializer}
+        snap = snapshot.snapshot(self.machine, serializers = serializers)
+        self.assertEqual(b'3', snap.statevars['count'])
+        self.assertFalse('entered' in snap.statevars)
+
+        machine = state.Machine()
+        snapshot.restore(machine, snap, serializers = serializers,
+                         statevars = {'entered' : []})
+        self.assertEqual(3, machine.currentState().count)
+
+    def testBranches(self):
+        self._inject("Branch", _sendToBranches = True)
+        self._inject("InBranch", _sendToBranches = True)
+        snap = snapshot.snapshot(self.machine,
+                                 serializers = {'entered' : None})
+        self.assertEqual(BranchedMiddle, snap.branches[Branched].state)
+
+        machine = self._restore(snap)
+        self.assertEqual(Start, type(machine.currentState()))
+        branch = machine.branches[Branched]
+        self.assertEqual(BranchedMiddle, type(branch.currentState()))
+
+        # Events still reach the branch
+        machine.injectEvent(state.Event("InBranchEnd"),
+                            _sendToBranches = True)
+        self.assertTrue(branch.complete)
+
+    def testComplete(self):
+        self._inject("Change", "Finish")
+        machine = self._restore(snapshot.snapshot(
+            self.machine, serializers = {'entered' : None}))
+        self.assertTrue(machine.complete)
+        self.assertEqual(None, machine.currentState())
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.fileobj = io.BytesIO()
+        self.journal = snapshot.Journal(self.fileobj,
+                                        serializers = {'entered' : None})
+        self.machine = state.Machine(statevars = {'entered' : []})
+        self.machine.addHooks(self.journal)
+        self.machine.start(Start, statevars = {'count' : 3})
+        self.journal.checkpoint(self.machine)
+
+    def _inject(self, *etypes):
+        for etype in etypes:
+            self.machine.injectEvent(state.Event(etype),
+                                     _sendToBranches = True)
+
+    def _load(self):
+        return snapshot.Journal.load(io.BytesIO(self.fileobj.getvalue()))
+
+    def testJournal(self):
+        self._inject("Change", "Change", "Update", "Branch", "Change",
+                     "InBranch")
+        snap = self._load()
+        self.assertEqual(Middle, snap.state)
+        self.assertEqual("Change", snap.eventType)
+        self.assertEqual(BranchedMiddle, snap.branches[Branched].state)
+        self.assertEqual(Branched, snap.branches[Branched].root)
+
+        machine = state.Machine()
+        snapshot.restore(machine, snap, statevars = {'entered' : []})
+        self.assertEqual(Middle, type(machine.currentState()))
+        self.assertEqual(3, machine.currentState().count)
+        self.assertEqual(BranchedMiddle,
+                         type(machine.branches[Branched].currentState()))
+
+    def testComplete(self):
+        self._inject("Change", "Finish")
+        snap = self._load()
+        self.assertTrue(snap.complete)
+        self.assertEqual(None, snap.state)
+
+    def testIncremental(self):
+        size = len(self.fileobj.getvalue())
+        self._inject("Change")
+        self.assertTrue(len(self.fileobj.getvalue()) - size < 200)
+
+    def testNoCheckpoint(self):
+        fileobj = io.BytesIO()
+        machine = state.Machine(statevars = {'entered' : []})
+        machine.addHooks(snapshot.Journal(fileobj))
+        machine.start(Start)
+        machine.injectEvent(state.Event("Change"))
+
+        snap = snapshot.Journal.load(io.BytesIO(fileobj.getvalue()))
+        self.assertEqual(Start, snap.root)
+        self.assertEqual(Middle, snap.state)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -32,6 +32,7 @@ import unittest
 import io
 import inspect
 import os.path
+import sys
 
 # Project Imports
 import statepy.state as state
@@ -176,6 +177,68 @@ class SecondParent(state.State):
     def enter(self):
         self.stateMachine.start(state.Branch(First))
 
+# States which count how often their transitions are evaluated
+class CountingState(state.State):
+    transitionCount = 0
+
+    @staticmethod
+    def transitions():
+        CountingState.transitionCount += 1
+        return { "Update" : CountingState,
+                 "Other" : CountingOther }
+
+    def Update(self, event):
+        self.updated = event
+
+class CountingOther(state.State):
+    @staticmethod
+    def transitions():
+        return { "Update" : CountingState }
+
+# States which inject events from within a transition function
+class ReentrantStart(state.State):
+    @staticmethod
+    def transitions():
+        return { "GO" : ReentrantMiddle,
+                 "Count" : ReentrantStart }
+
+    def GO(self, event):
+        self.log.append('GO')
+        self.stateMachine.injectEvent(state.Event("NEXT"))
+        self.log.append('GO done')
+
+    def Count(self, event):
+        self.log.append(event.value)
+
+class ReentrantMiddle(state.State):
+    @staticmethod
+    def transitions():
+        return { "NEXT" : ReentrantStart }
+
+    def enter(self):
+        self.log.append('enter Middle')
+
+    def NEXT(self, event):
+        self.log.append('NEXT')
+
+# States which count how often they are reset
+class ResetStart(state.State):
+    @staticmethod
+    def transitions():
+        return { "Change" : ResetOther }
+
+    def __init__(self, **statevars):
+        state.State.__init__(self, **statevars)
+        self.resetCount = 0
+
+    def reset(self):
+        self.resetCount += 1
+
+class ResetOther(state.State):
+    @staticmethod
+    def transitions():
+        return { "Change" : ResetStart }
+
 # --------------------------------------------------------------------------- #
 #                     T E S T   F R E E   F U N C T I O N S                   #
 # --------------------------------------------------------------------------- #
@@ -188,6 +251,18 @@ class TestFreeFunctions(unittest.TestCase):
         return inspect.currentframe().f_back.f_lineno
 
     
+    def testDeclareEventClass(self):
+        ClickEvent = state.declareEventClass('ClickEvent', ['x', 'y'])
+        event = ClickEvent("Click", x = 1, y = 2)
+        self.assertEqual("Click", event.type)
+        self.assertEqual((1, 2), (event.x, event.y))
+        self.assertFalse(hasattr(event, '__dict__'))
+        
+        machine = state.Machine()
+        machine.start(Start)
+        machine.injectEvent(ClickEvent("Change"))
+        self.assertEqual(Simple, type(machine.currentState()))
+
     def testDeclareEventType(self):
         # Make sure the path always ends in .py
         fileName = os.path.splitext(__file__)[0] + ".py"
@@ -197,6 +272,9 @@ class TestFreeFunctions(unittest.TestCase):
         expectedResult = fileName + ":" + expectedLineNum + " " + "An_Event"
         self.assertEqual(expectedResult, evtType)
         
+        # Event types are interned
+        self.assertTrue(evtType is sys.intern(expectedResult))
+        
     
 # --------------------------------------------------------------------------- #
 #                         T E S T   M A C H I N E                             #
@@ -441,6 +519,52 @@ class TestStateMachine(unittest.TestCase):
 
         self.assertEqual(expected,output)
     
+    def testStateGraph(self):
+        graph = self.machine.stateGraph(Start)
+
+        # Built once per start state
+        self.assertTrue(graph is self.machine.stateGraph(Start))
+        self.assertTrue(graph is not self.machine.stateGraph(Start,
+                                                             noLoops = True))
+
+        self.assertEqual(set([Start, Simple, End, LoopBack, QueueTestState,
+                              BranchedState, BranchedMiddle, BranchedEnd]),
+                         set(graph.states))
+        self.assertEqual(len(graph.states), len(set(graph.states)))
+        self.assertEqual(11, len(graph.edges))
+        self.assertTrue((Start, 'Branch', BranchedState, True) in graph.edges)
+
+        self.assertEqual(set([Simple, Start, End, LoopBack, QueueTestState,
+                              BranchedState, BranchedMiddle, BranchedEnd]),
+                         graph.reachable(Simple))
+        self.assertEqual(set([BranchedMiddle, BranchedEnd]),
+                         graph.reachable(BranchedMiddle))
+
+        # BranchedEnd is a state.End, the test End is not
+        self.assertEqual(set([End, BranchedEnd]), set(graph.endStates()))
+        self.assertEqual([End], graph.deadEnds())
+
+        # LoopBack never leaves itself
+        self.assertEqual([LoopBack], graph.traps())
+        noLoops = self.machine.stateGraph(Start, noLoops = True)
+        self.assertTrue((LoopBack, 'Update', LoopBack, False)
+                        not in noLoops.edges)
+
+    def testClearStateGraphs(self):
+        graph = self.machine.stateGraph(Start)
+        self.assertTrue(graph.static)
+        self.assertTrue(graph is self.machine.stateGraph(Start))
+
+        state.clearStateGraphs()
+        rebuilt = self.machine.stateGraph(Start)
+        self.assertTrue(graph is not rebuilt)
+        self.assertEqual(graph.edges, rebuilt.edges)
+        self.assertTrue(rebuilt is self.machine.stateGraph(Start))
+
+        # Cached on the start state class only
+        self.assertTrue('_stateGraphCache' in Start.__dict__)
+        self.assertTrue('_stateGraphCache' not in Simple.__dict__)
+
     def testBasicBranching(self):
         # Test Branching
         self.machine.injectEvent(self._makeEvent("Branch"), 
@@ -514,6 +638,58 @@ class TestStateMachine(unittest.TestCase):
         self.assertEqual(0, len(self.machine.branches))
         self.assertFalse(Start in self.machine.branches)
         
+    def testBranchEventIndex(self):
+        self.machine.start(state.Branch(LoopBack))
+        self.machine.start(state.Branch(BranchedState))
+        loopBranch = self.machine.branches[LoopBack]
+        branch = self.machine.branches[BranchedState]
+        
+        # Only interested branches are indexed
+        index = self.machine._branchesByEvent
+        self.assertEqual([loopBranch], list(index["Update"]))
+        self.assertEqual([branch], list(index["InBranchEvent"]))
+        
+        self.machine.injectEvent(self._makeEvent("Update"),
+                                 _sendToBranches = True)
+        self.assertEqual(1, loopBranch.currentState().transCount)
+        
+        # Index follows the state of the branch
+        self.machine.injectEvent(self._makeEvent("InBranchEvent"),
+                                 _sendToBranches = True)
+        self.assertEqual(BranchedMiddle, type(branch.currentState()))
+        self.assertFalse("InBranchEvent" in index)
+        self.assertEqual([branch], list(index["InBranchEndEvent"]))
+        
+        self.machine.stopBranch(LoopBack)
+        self.assertFalse("Update" in index)
+        self.machine.stop()
+        self.assertEqual({}, self.machine._branchesByEvent)
+
+    def testReuseStates(self):
+        machine = state.Machine(statevars = {'a' : 1}, reuseStates = True)
+        machine.start(ResetStart)
+        first = machine.currentState()
+        self.assertEqual(0, first.resetCount)
+        
+        for i in range(3):
+            machine.injectEvent(self._makeEvent("Change"))
+            machine.injectEvent(self._makeEvent("Change"))
+        
+        # Same instance, reset on every re-entry
+        self.assertTrue(first is machine.currentState())
+        self.assertEqual(3, first.resetCount)
+        
+        # New statevars create new instances
+        machine.start(ResetStart, statevars = {'b' : 2})
+        self.assertFalse(first is machine.currentState())
+        self.assertEqual(2, machine.currentState().b)
+
+        # Default machines create new instances
+        self.machine.injectEvent(self._makeEvent("Change"))
+        self.machine.injectEvent(MockEventSource.ANOTHER_EVT)
+        self.assertTrue(self.machine.currentState().entered)
+        self.assertFalse(self.machine.currentState().exited)
+
     def testDoubleTransitions(self):
         self.machine.start(First)
         self.assertEqual(First, type(self.machine.currentState()))
@@ -536,6 +712,138 @@ class TestStateMachine(unittest.TestCase):
         cstate = branch.currentState()
         self.assertEqual(First, type(cstate))
 
+    def testCompiledTransitions(self):
+        machine = state.Machine()
+        machine.start(CountingState)
+        for i in range(5):
+            machine.injectEvent(self._makeEvent("Update"))
+            machine.injectEvent(self._makeEvent("Other"))
+        
+        # Table is compiled once per class, not per event or entry
+        self.assertEqual(1, CountingState.transitionCount)
+        self.assertEqual(CountingOther, type(machine.currentState()))
+        
+        table = state.getTransitionTable(CountingState())
+        self.assertEqual(CountingOther, table["Other"])
+        def modify():
+            table["Other"] = End
+        self.assertRaises(TypeError, modify)
+
+    def testHandlerLookup(self):
+        machine = state.Machine()
+        machine.start(CountingState)
+        
+        cstate = machine.currentState()
+        event = self._makeEvent("Update")
+        machine.injectEvent(event)
+        self.assertEqual(event, cstate.updated)
+        
+        self.assertEqual(None, machine._getTransitionFunc("Other", cstate))
+        self.assertEqual(cstate.Update,
+                         machine._getTransitionFunc("Update", cstate))
+        self.assertEqual(cstate.Update,
+                         machine._getTransitionFunc("ns Update", cstate))
+
+    def testInstanceHandler(self):
+        machine = state.Machine()
+        machine.start(CountingState)
+        cstate = machine.currentState()
+        
+        # Methods assigned to the instance are called
+        events = []
+        class Handler(object):
+            def Other(self, event):
+                events.append(event)
+        cstate.Other = Handler().Other
+        event = self._makeEvent("Other")
+        machine.injectEvent(event)
+        self.assertEqual([event], events)
+        self.assertEqual(CountingOther, type(machine.currentState()))
+        
+        # Only for that instance
+        self.assertEqual(None, machine._getTransitionFunc("Other",
+                                                          CountingState()))
+
+        # Plain functions assigned to the instance are not
+        cstate = CountingState()
+        cstate.Other = lambda event: events.append(event)
+        self.assertEqual(None, machine._getTransitionFunc("Other", cstate))
+
+    def testStaticHandler(self):
+        class StaticHandler(state.State):
+            called = []
+
+            @staticmethod
+            def transitions():
+                return {"Update" : End, "Other" : End}
+
+            @staticmethod
+            def Update(event):
+                StaticHandler.called.append(event)
+
+            @classmethod
+            def Other(cls, event):
+                cls.called.append(event)
+
+        machine = state.Machine()
+        cstate = StaticHandler()
+        # Static methods are not transition functions, class methods are
+        self.assertEqual(None, machine._getTransitionFunc("Update", cstate))
+        self.assertEqual(cstate.Other,
+                         machine._getTransitionFunc("Other", cstate))
+
+        machine.start(StaticHandler)
+        machine.injectEvent(self._makeEvent("Update"))
+        self.assertEqual([], StaticHandler.called)
+        self.assertTrue(machine.complete)
+
+# --------------------------------------------------------------------------- #
+#                   T E S T   Q U E U E D   M A C H I N E                     #
+# --------------------------------------------------------------------------- #
+
+class TestQueuedMachine(unittest.TestCase):
+    def setUp(self):
+        self.log = []
+        self.machine = state.Machine(statevars = {'log' : self.log},
+                                     queued = True)
+        self.machine.start(ReentrantStart, {'stateMachine' : self.machine})
+
+    def testRunToCompletion(self):
+        self.machine.injectEvent(state.Event("GO"))
+
+        # NEXT is processed after GO, once the machine is in ReentrantMiddle
+        self.assertEqual(['GO', 'GO done', 'enter Middle', 'NEXT'], self.log)
+        self.assertEqual(ReentrantStart, type(self.machine.currentState()))
+
+    def testInjectMany(self):
+        events = []
+        for i in range(10):
+            event = state.Event("Count")
+            event.value = i
+            events.append(event)
+        self.machine.injectMany(events)
+        self.assertEqual(list(range(10)), self.log)
+
+    def testPostFromThreads(self):
+        import threading
+
+        def post(offset):
+            for i in range(1000):
+                event = state.Event("Count")
+                event.value = offset + i
+                self.machine.postEvent(event)
+
+        threads = [threading.Thread(target = post, args = (i * 1000,))
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(4000, self.machine.dispatchEvents())
+        self.assertEqual(list(range(4000)), sorted(self.log))
+        self.assertEqual(0, self.machine.dispatchEvents())
+
 # --------------------------------------------------------------------------- #
 #                           T E S T    S T A T E                              #
 # --------------------------------------------------------------------------- #
@@ -155,6 +155,127 @@ class TestTask(unittest.TestCase):
         self._injectEvent(EVENT_C_FAIL)
         self.assertEqual(self.CRecoverycls, type(self.machine.currentState()))
         
+    def testCachedTransitions(self):
+        taskA = self.TaskAcls(taskManager = self.taskManager)
+        otherA = self.TaskAcls(taskManager = self.taskManager)
+        self.assertTrue(taskA.transitions() is otherA.transitions())
+        self.assertTrue(state.getTransitionTable(taskA) is
+                        taskA.transitions())
+
+    def testReorder(self):
+        tableA = self.taskManager.getTransitions(self.TaskAcls)
+        tableC = self.taskManager.getTransitions(self.TaskCcls)
+
+        # Skip TaskB, only TaskA's next task changes
+        self.taskManager.removeTask(self.TaskBcls)
+        self.assertEqual((self.TaskAcls, self.TaskCcls),
+                         self.taskManager.taskOrder)
+        self.assertTrue(tableC is
+                        self.taskManager.getTransitions(self.TaskCcls))
+        self.assertTrue(tableA is not
+                        self.taskManager.getTransitions(self.TaskAcls))
+
+        self.machine.start(self.TaskAcls)
+        self._injectEvent(EVENT_A)
+        self.assertEqual(self.TaskCcls, type(self.machine.currentState()))
+
+        # And put it back at the end, the current state keeps the table it
+        # was entered with
+        self.taskManager.insertTask(2, self.TaskBcls)
+        self._injectEvent(EVENT_E)
+        self.assertTrue(self.machine.complete)
+
+        self.machine.start(self.TaskCcls)
+        self._injectEvent(EVENT_E)
+        self.assertEqual(self.TaskBcls, type(self.machine.currentState()))
+
+    def testReorderReusedStates(self):
+        machine = state.Machine(
+            statevars = {'taskManager' : self.taskManager},
+            reuseStates = True)
+        machine.start(self.TaskAcls)
+        machine.injectEvent(state.Event(EVENT_A))
+        self.assertEqual(self.TaskBcls, type(machine.currentState()))
+
+        self.taskManager.setTaskOrder([self.TaskAcls, self.TaskCcls])
+        machine.start(self.TaskAcls)
+        machine.injectEvent(state.Event(EVENT_A))
+        self.assertEqual(self.TaskCcls, type(machine.currentState()))
+
+    def testStateGraphReorder(self):
+        statevars = {'taskManager' : self.taskManager}
+        graph = self.machine.stateGraph(TaskA, statevars = statevars)
+        self.assertFalse(graph.static)
+        self.assertEqual([TaskA, TaskB, TaskC],
+                         [s for s in graph.states if issubclass(s, task.Task)])
+        self.assertTrue((TaskA, EVENT_A, TaskB, False) in graph.edges)
+        self.assertTrue((TaskC, EVENT_E, task.End, False) in graph.edges)
+
+        # The graph follows the new order
+        self.taskManager.setTaskOrder([TaskA, TaskC, TaskB])
+        graph = self.machine.stateGraph(TaskA, statevars = statevars)
+        self.assertTrue((TaskA, EVENT_A, TaskC, False) in graph.edges)
+        self.assertTrue((TaskC, EVENT_E, TaskB, False) in graph.edges)
+        self.assertTrue((TaskB, EVENT_C, task.End, False) in graph.edges)
+        self.assertTrue((TaskA, EVENT_A, TaskB, False) not in graph.edges)
+
+        self.taskManager.removeTask(TaskC)
+        graph = self.machine.stateGraph(TaskA, statevars = statevars)
+        self.assertTrue(TaskC not in graph.states)
+        self.assertEqual(set([TaskA, TaskB, task.End, BRecovery]),
+                         set(graph.states))
+
+    def testSetFailureState(self):
+        self.taskManager.setFailureState(self.TaskBcls, self.CRecoverycls)
+        self.machine.start(self.TaskBcls)
+        self._injectEvent(EVENT_B_FAIL)
+        self.assertEqual(self.CRecoverycls,
+                         type(self.machine.currentState()))
+
+    def testOtherTaskManager(self):
+        class OtherManager(object):
+            def getNextTask(self, taskClass):
+                return TaskC
+            def getFailureState(self, taskClass):
+                return CRecovery
+
+        machine = state.Machine(statevars = {'taskManager' : OtherManager()})
+        machine.start(self.TaskAcls)
+        machine.injectEvent(state.Event(EVENT_A))
+        self.assertEqual(self.TaskCcls, type(machine.currentState()))
+
+    def testTaskManagerSubclass(self):
+        class SkippingManager(task.TaskManager):
+            """Skips TaskB while skip is set"""
+            skip = False
+            def getNextTask(self, taskClass):
+                nextTask = task.TaskManager.getNextTask(self, taskClass)
+                if self.skip and nextTask is TaskB:
+                    return task.TaskManager.getNextTask(self, nextTask)
+                return nextTask
+
+        manager = SkippingManager([TaskA, TaskB, TaskC],
+                                  {TaskB : BRecovery, TaskC : CRecovery})
+        taskA = TaskA(taskManager = manager)
+        self.assertFalse(taskA._cachedTransitions)
+        self.assertEqual(TaskB, taskA.transitions()[EVENT_A])
+        manager.skip = True
+        self.assertEqual(TaskC, taskA.transitions()[EVENT_A])
+
+        # Subclasses may opt in to the cached tables
+        class CachingManager(SkippingManager):
+            cacheTransitions = True
+        manager = CachingManager([TaskA, TaskB, TaskC],
+                                 {TaskB : BRecovery, TaskC : CRecovery})
+        self.assertTrue(TaskA(taskManager = manager)._cachedTransitions)
+
+        # Subclasses which don't override the lookups are cached
+        class PlainManager(task.TaskManager):
+            pass
+        manager = PlainManager([TaskA, TaskB, TaskC],
+                               {TaskB : BRecovery, TaskC : CRecovery})
+        self.assertTrue(TaskA(taskManager = manager)._cachedTransitions)
+        
 #    def testDefaultTimeout(self):
 #        """
 #        Tests normal timeout procedure
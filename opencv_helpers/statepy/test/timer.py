@@ -0,0 +1,208 @@
+# Copyright (c) 2009, Joseph Lisee
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of StatePy nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Joseph Lisee ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL <copyright holder> BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# File:  statepy/test/timer.py
+
+# Python Imports
+import unittest
+import asyncio
+
+# Project Imports
+import statepy.state as state
+import statepy.task as task
+import statepy.timer as timer
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.
+
+    def __call__(self):
+        return self.now
+
+class Waiting(state.State):
+    timeout = 5
+
+    @staticmethod
+    def transitions():
+        return { "Click" : Clicked,
+                 "Update" : Waiting,
+                 timer.TIMEOUT : TimedOut }
+
+class Clicked(state.State):
+    @staticmethod
+    def transitions():
+        return { "Back" : Waiting }
+
+class TimedOut(state.End):
+    pass
+
+class Untimed(state.State):
+    @staticmethod
+    def transitions():
+        return { "Click" : Waiting,
+                 timer.TIMEOUT : TimedOut }
+
+class TaskA(task.Task):
+    timeout = 2
+
+    @staticmethod
+    def _transitions():
+        return { task.TIMEOUT : task.Next }
+
+class TaskB(task.Task):
+    @staticmethod
+    def _transitions():
+        return { "Done" : task.Next }
+
+class TestTimerService(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.timers = timer.TimerService(clock = self.clock)
+        self.machine = state.Machine()
+        self.machine.addHooks(self.timers)
+
+    def _inject(self, etype):
+        self.machine.injectEvent(state.Event(etype))
+
+    def testTimeout(self):
+        self.machine.start(Waiting)
+        self.assertEqual(1, len(self.timers))
+        self.assertEqual(5, self.timers.nextTimeout())
+
+        self.clock.now = 4.9
+        self.assertEqual(0, self.timers.poll())
+        self.assertEqual(Waiting, type(self.machine.currentState()))
+
+        self.clock.now = 5
+        self.assertEqual(1, self.timers.poll())
+        self.assertTrue(self.machine.complete)
+        self.assertEqual(0, len(self.timers))
+        self.assertEqual(None, self.timers.nextTimeout())
+
+    def testCancelledOnExit(self):
+        self.machine.start(Waiting)
+        self.clock.now = 3
+        self._inject("Click")
+        self.assertEqual(0, len(self.timers))
+
+        # The timer restarts when the state is entered again
+        self._inject("Back")
+        self.clock.now = 6
+        self.assertEqual(0, self.timers.poll())
+        self.assertEqual(Waiting, type(self.machine.currentState()))
+        self.clock.now = 8
+        self.assertEqual(1, self.timers.poll())
+        self.assertTrue(self.machine.complete)
+
+    def testLoopback(self):
+        # Loopbacks don't leave the state, so don't restart the timer
+        self.machine.start(Waiting)
+        self.clock.now = 3
+        self._inject("Update")
+        self.clock.now = 5
+        self.assertEqual(1, self.timers.poll())
+
+    def testNoTimeout(self):
+        self.machine.start(Untimed)
+        self.assertEqual(0, len(self.timers))
+
+    def testStatevar(self):
+        self.machine.start(Untimed, statevars = {'timeout' : 1})
+        self.assertEqual(1, len(self.timers))
+
+    def testManyTimers(self):
+        machines = []
+        for i in range(1000):
+            machine = state.Machine()
+            machine.addHooks(self.timers)
+            machine.start(Untimed, statevars = {'timeout' : 1000 - i})
+            machines.append(machine)
+        self.assertEqual(1000, len(self.timers))
+
+        # Cancel every other timer
+        for machine in machines[::2]:
+            machine.injectEvent(state.Event("Click"))
+        self.assertEqual(1000, len(self.timers))
+        for machine in machines[::2]:
+            machine.stop()
+        self.assertEqual(500, len(self.timers))
+
+        self.clock.now = 500
+        self.assertEqual(250, self.timers.poll())
+        for i, machine in enumerate(machines):
+            if i % 2 == 0:
+                self.assertEqual(None, machine.currentState())
+            else:
+                self.assertEqual(1000 - i <= 500, machine.complete)
+
+    def testBranch(self):
+        self.machine.start(Clicked)
+        self.machine.start(state.Branch(Waiting))
+        self.clock.now = 5
+        self.assertEqual(1, self.timers.poll())
+        self.assertTrue(self.machine.branches[Waiting].complete)
+
+    def testTask(self):
+        taskManager = task.TaskManager(taskOrder = [TaskA, TaskB])
+        self.machine.start(TaskA, statevars = {'taskManager' : taskManager})
+        self.clock.now = 2
+        self.assertEqual(1, self.timers.poll())
+        self.assertEqual(TaskB, type(self.machine.currentState()))
+
+    def testAsyncio(self):
+        timers = timer.TimerService()
+        self.machine.addHooks(timers)
+        loop = asyncio.new_event_loop()
+        try:
+            timers.attachAsyncio(loop)
+            self.machine.start(Untimed, statevars = {'timeout' : 0.01})
+            loop.run_until_complete(asyncio.sleep(0.1))
+        finally:
+            timers.detach()
+            loop.close()
+        self.assertTrue(self.machine.complete)
+
+    def testAsyncioRunningLoop(self):
+        timers = timer.TimerService()
+        self.machine.addHooks(timers)
+
+        # There is no running loop outside of a coroutine
+        self.assertRaises(RuntimeError, timers.attachAsyncio)
+
+        async def run():
+            timers.attachAsyncio()
+            self.machine.start(Untimed, statevars = {'timeout' : 0.01})
+            await asyncio.sleep(0.1)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(run())
+        finally:
+            timers.detach()
+            loop.close()
+        self.assertTrue(self.machine.complete)
+
+if __name__ == '__main__':
+    unittest.main()
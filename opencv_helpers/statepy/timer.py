@@ -0,0 +1,276 @@
+# Copyright (c) 2009, Joseph Lisee
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#     * Redistributions of source code must retain the above copyright
+#       notice, this list of conditions and the following disclaimer.
+#     * Redistributions in binary form must reproduce the above copyright
+#       notice, this list of conditions and the following disclaimer in the
+#       documentation and/or other materials provided with the distribution.
+#     * Neither the name of StatePy nor the
+#       names of its contributors may be used to endorse or promote products
+#       derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY Joseph Lisee ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL <copyright holder> BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# File:  statepy/timer.py
+
+"""
+Timeouts for states
+
+A state with a TIMEOUT transition and a timeout attribute (in seconds, set on
+the class, as a statevar or in enter()) receives a TIMEOUT event once it has
+been active that long:
+
+    class WaitForClick(state.State):
+        timeout = 5
+
+        @staticmethod
+        def transitions():
+            return {CLICKED : Done, timer.TIMEOUT : GiveUp}
+
+    timers = TimerService()
+    machine.addHooks(timers)
+    timers.attachGLib()   # or timers.attachAsyncio(), or call poll()
+
+Timers are kept in a heap, so starting one is O(log n) and cancelling one
+(when its state is exited) is O(1), which keeps thousands of active timers
+cheap.
+"""
+
+# STD Imports
+import heapq
+import itertools
+import threading
+import time
+
+# Project Imports
+import statepy.state as state
+
+# Event injected into a state when its timeout expires
+TIMEOUT = state.declareEventType('TIMEOUT')
+
+class _AsyncioDriver(object):
+    def __init__(self, service, loop):
+        self._service = service
+        self._loop = loop
+        self._handle = None
+
+    def wake(self, delay):
+        self._loop.call_soon_threadsafe(self._reschedule, delay)
+
+    def _reschedule(self, delay):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        # Timers may have been started or fired since the wake up
+        delay = self._service.nextTimeout()
+        if delay is not None:
+            self._handle = self._loop.call_later(delay, self._fire)
+
+    def _fire(self):
+        self._handle = None
+        self._service._dispatch()
+
+    def cancel(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+class _GLibDriver(object):
+    def __init__(self, service, GLib):
+        self._service = service
+        self._GLib = GLib
+        self._source = None
+
+    def wake(self, delay):
+        self.cancel()
+        # Round up, firing early only means another wake up
+        self._source = self._GLib.timeout_add(int(delay * 1000) + 1,
+                                              self._fire)
+
+    def _fire(self):
+        self._source = None
+        self._service._dispatch()
+        return False
+
+    def cancel(self):
+        if self._source is not None:
+            self._GLib.source_remove(self._source)
+            self._source = None
+
+class TimerService(state.MachineHooks):
+    """
+    Injects TIMEOUT events into the states of the machines it is added to
+    (see Machine.addHooks), branches included.
+
+    The TIMEOUT event is only injected if the state which started the timer
+    is still the current state of its machine.
+    """
+    def __init__(self, clock = time.monotonic):
+        """
+        @type  clock: callable
+        @param clock: Returns the current time in seconds
+        """
+        self._clock = clock
+        self._heap = []
+        self._counter = itertools.count()
+        self._cancelled = 0
+        self._lock = threading.Lock()
+        self._driver = None
+
+        # Timer entries of the active states, keyed by state instance id
+        self._timers = {}
+
+    def enter(self, machine, currentState):
+        duration = getattr(currentState, 'timeout', None)
+        if duration is not None and TIMEOUT in machine._currentTransitions:
+            self.start(machine, currentState, duration)
+
+    def exit(self, machine, currentState):
+        with self._lock:
+            entry = self._timers.pop(id(currentState), None)
+            if entry is not None:
+                self._cancel(entry)
+
+    def start(self, machine, currentState, duration):
+        """
+        Starts a timer which injects a TIMEOUT event into the machine after
+        duration seconds, if currentState is still its current state.
+        Returns the timer entry, which can be passed to cancel().
+        """
+        # [deadline, order, machine, state], machine is None once cancelled
+        entry = [self._clock() + duration, next(self._counter), machine,
+                 currentState]
+        with self._lock:
+            previous = self._timers.get(id(currentState), None)
+            if previous is not None:
+                self._cancel(previous)
+            self._timers[id(currentState)] = entry
+            heapq.heappush(self._heap, entry)
+            earliest = self._heap[0] is entry
+        if earliest and self._driver is not None:
+            self._driver.wake(duration)
+        return entry
+
+    def cancel(self, entry):
+        """
+        Cancels the timer entry (see start())
+        """
+        with self._lock:
+            self._cancel(entry)
+
+    def _cancel(self, entry):
+        if entry[2] is None:
+            return
+        entry[2] = entry[3] = None
+        self._cancelled += 1
+
+        # Cancelled entries are left in the heap until they expire, unless
+        # they make up most of it
+        if self._cancelled > 64 and self._cancelled * 2 > len(self._heap):
+            self._heap = [e for e in self._heap if e[2] is not None]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+
+    def __len__(self):
+        """
+        Number of active timers
+        """
+        return len(self._heap) - self._cancelled
+
+    def nextTimeout(self, now = None):
+        """
+        Returns seconds until the next timer expires (0 if one has already
+        expired), or None if no timer is active
+        """
+        with self._lock:
+            self._dropCancelled()
+            if not self._heap:
+                return None
+            if now is None:
+                now = self._clock()
+            return max(0., self._heap[0][0] - now)
+
+    def _dropCancelled(self):
+        heap = self._heap
+        while heap and heap[0][2] is None:
+            heapq.heappop(heap)
+            self._cancelled -= 1
+
+    def poll(self, now = None):
+        """
+        Injects the TIMEOUT events of all expired timers, in order of
+        expiry, and returns how many were injected
+        """
+        if now is None:
+            now = self._clock()
+        expired = []
+        with self._lock:
+            heap = self._heap
+            while heap and heap[0][0] <= now:
+                entry = heapq.heappop(heap)
+                if entry[2] is None:
+                    self._cancelled -= 1
+                    continue
+                self._timers.pop(id(entry[3]), None)
+                expired.append((entry[2], entry[3]))
+
+        count = 0
+        for machine, currentState in expired:
+            # Skip states exited since the timer expired
+            if machine.currentState() is currentState:
+                machine.injectEvent(state.Event(TIMEOUT))
+                count += 1
+        return count
+
+    def _dispatch(self):
+        self.poll()
+        delay = self.nextTimeout()
+        if delay is not None and self._driver is not None:
+            self._driver.wake(delay)
+
+    def attachAsyncio(self, loop = None):
+        """
+        Fires timers from the asyncio event loop (default: the running loop,
+        ie. when called from a coroutine or callback of the loop)
+        """
+        import asyncio
+        if loop is None:
+            loop = asyncio.get_running_loop()
+        self._attach(_AsyncioDriver(self, loop))
+
+    def attachGLib(self):
+        """
+        Fires timers from the GLib (GTK) main loop
+        """
+        try:
+            from gi.repository import GLib
+        except ImportError:
+            import gobject as GLib
+        self._attach(_GLibDriver(self, GLib))
+
+    def _attach(self, driver):
+        self.detach()
+        self._driver = driver
+        delay = self.nextTimeout()
+        if delay is not None:
+            driver.wake(delay)
+
+    def detach(self):
+        """
+        Stops firing timers from the main loop
+        """
+        if self._driver is not None:
+            self._driver.cancel()
+            self._driver = None
@@ -0,0 +1,126 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from path_helpers import path
+
+from . import backend as backend_module
+from .safe_cv import cv2
+from .backend import (get_backend, backend_for_capture, CV2Backend,
+                      LegacyBackend)
+
+
+class TestGetBackend(unittest.TestCase):
+    '''
+    Backend selection, without the legacy `cv` module (as with OpenCV 3+).
+    '''
+    def setUp(self):
+        patches = [mock.patch.object(backend_module, 'cv', None),
+                   mock.patch.dict(backend_module._backends, clear=True),
+                   mock.patch.dict(os.environ)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        os.environ.pop('OPENCV_HELPERS_BACKEND', None)
+
+    def test_default_without_legacy_cv(self):
+        backend = get_backend()
+        self.assertIsInstance(backend, CV2Backend)
+        self.assertEqual(backend.name, 'cv2')
+        # Backends are created once.
+        self.assertIs(get_backend(), backend)
+        self.assertIs(get_backend('cv2'), backend)
+
+    def test_environment(self):
+        os.environ['OPENCV_HELPERS_BACKEND'] = 'cv2'
+        self.assertIsInstance(get_backend(), CV2Backend)
+        os.environ['OPENCV_HELPERS_BACKEND'] = 'legacy'
+        with self.assertRaises(ImportError):
+            get_backend()
+
+    def test_legacy_without_legacy_cv(self):
+        with self.assertRaises(ImportError):
+            get_backend('legacy')
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            get_backend('gstreamer')
+
+    def test_instance(self):
+        backend = CV2Backend()
+        self.assertIs(get_backend(backend), backend)
+
+    def test_backend_for_capture(self):
+        cap = cv2.VideoCapture()
+        self.assertIsInstance(backend_for_capture(cap), CV2Backend)
+        # Without legacy `cv`, every capture is a `cv2` capture.
+        self.assertIsInstance(backend_for_capture(object()), CV2Backend)
+
+    def test_default_with_legacy_cv(self):
+        with mock.patch.object(backend_module, 'cv', object()):
+            self.assertIsInstance(get_backend(), LegacyBackend)
+            self.assertNotIsInstance(get_backend(), CV2Backend)
+            self.assertIsInstance(backend_for_capture(cv2.VideoCapture()),
+                                  CV2Backend)
+
+
+class TestCV2Backend(unittest.TestCase):
+    def setUp(self):
+        self.backend = CV2Backend()
+        self.temp_dir = path(tempfile.mkdtemp(prefix='test_backend-'))
+        self.video_path = self.temp_dir.joinpath('video.avi')
+        self.frames = [np.full((48, 64, 3), 40 * i, dtype='uint8')
+                       for i in range(5)]
+        writer = self.backend.create_writer(self.video_path,
+                                            self.backend.fourcc('MJPG'), 10,
+                                            (64, 48))
+        for frame in self.frames:
+            self.backend.write(writer, frame)
+        self.backend.release(writer)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_properties(self):
+        name2code = self.backend.captureprop_name2code()
+        self.assertEqual(name2code['CV_CAP_PROP_FPS'], cv2.CAP_PROP_FPS)
+
+        cap = self.backend.capture_from_file(self.video_path)
+        properties = self.backend.get_properties(
+            cap, ['CV_CAP_PROP_FRAME_WIDTH', 'CV_CAP_PROP_FRAME_HEIGHT',
+                  'CV_CAP_PROP_FRAME_COUNT', 'CV_CAP_PROP_FPS'])
+        self.assertEqual(properties, {'CV_CAP_PROP_FRAME_WIDTH': 64,
+                                      'CV_CAP_PROP_FRAME_HEIGHT': 48,
+                                      'CV_CAP_PROP_FRAME_COUNT': 5,
+                                      'CV_CAP_PROP_FPS': 10})
+        self.backend.release(cap)
+
+    def test_read(self):
+        cap = self.backend.capture_from_file(self.video_path)
+        for expected in self.frames:
+            frame = self.backend.read(cap)
+            self.assertIs(self.backend.to_array(frame), frame)
+            self.assertEqual(self.backend.frame_dimensions(frame), (64, 48))
+            # JPEG compression is lossy.
+            self.assertLess(np.abs(frame.astype(int) - expected).max(), 8)
+        self.assertIsNone(self.backend.read(cap))
+        self.backend.release(cap)
+
+    def test_retrieve_into(self):
+        cap = self.backend.capture_from_file(self.video_path)
+        out = np.zeros((48, 64, 3), dtype='uint8')
+        gray = np.zeros((48, 64, 1), dtype='uint8')
+        self.assertTrue(self.backend.grab(cap))
+        self.assertTrue(self.backend.grab(cap))
+        self.assertTrue(self.backend.retrieve_into(cap, out))
+        self.assertTrue(self.backend.retrieve_into(cap, gray, grayscale=True))
+        self.assertLess(np.abs(out.astype(int) - 40).max(), 8)
+        self.assertLess(np.abs(gray.astype(int) - 40).max(), 8)
+        self.backend.release(cap)
+
+
+if __name__ == '__main__':
+    unittest.main()
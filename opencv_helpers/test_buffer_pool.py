@@ -0,0 +1,113 @@
+import unittest
+
+from .safe_cv import cv
+from .buffer_pool import BufferPool, get_image_buffer
+
+
+@unittest.skipIf(cv is None, 'legacy cv module not available')
+class TestBufferPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = BufferPool()
+
+    def test_reuse(self):
+        im = self.pool.acquire_image((8, 6), cv.IPL_DEPTH_8U, 3)
+        self.assertEqual((im.width, im.height, im.channels), (8, 6, 3))
+        self.pool.release(im)
+        self.assertEqual(self.pool.free_count, 1)
+        self.assertEqual(self.pool.free_bytes, 8 * 6 * 3)
+
+        self.assertIs(self.pool.acquire_image((8, 6), cv.IPL_DEPTH_8U, 3), im)
+        self.assertEqual(self.pool.free_count, 0)
+        self.assertEqual(self.pool.free_bytes, 0)
+
+        # The pool is empty again, so a new image is created.
+        self.assertIsNot(self.pool.acquire_image((8, 6), cv.IPL_DEPTH_8U, 3),
+                         im)
+
+    def test_mismatch(self):
+        im = self.pool.acquire_image((8, 6), cv.IPL_DEPTH_8U, 3)
+        self.pool.release(im)
+        for size, depth, channels in (((6, 8), cv.IPL_DEPTH_8U, 3),
+                                      ((8, 6), cv.IPL_DEPTH_8U, 1),
+                                      ((8, 6), cv.IPL_DEPTH_32F, 3)):
+            other = self.pool.acquire_image(size, depth, channels)
+            self.assertIsNot(other, im)
+            self.assertEqual((other.width, other.height), size)
+            self.assertEqual((other.depth, other.channels), (depth, channels))
+        # Nor is a matrix of the same size an image.
+        self.assertIsNot(self.pool.acquire_mat(6, 8, cv.CV_8UC3), im)
+        self.assertEqual(self.pool.free_count, 1)
+
+    def test_mat(self):
+        mat = self.pool.acquire_mat(4, 5, cv.CV_32FC1)
+        self.pool.release(mat)
+        self.assertIs(self.pool.acquire_mat(4, 5, cv.CV_32FC1), mat)
+        self.pool.release(mat)
+        self.assertIsNot(self.pool.acquire_mat(4, 5, cv.CV_64FC1), mat)
+
+    def test_acquire_like(self):
+        im = self.pool.acquire_image((8, 6), cv.IPL_DEPTH_8U, 3)
+        mat = self.pool.acquire_mat(4, 5, cv.CV_32FC1)
+        self.pool.release(im)
+        self.pool.release(mat)
+        self.assertIs(self.pool.acquire_like(cv.CreateImage(
+            (8, 6), cv.IPL_DEPTH_8U, 3)), im)
+        self.assertIs(self.pool.acquire_like(cv.CreateMat(4, 5,
+                                                          cv.CV_32FC1)), mat)
+
+    def test_double_release(self):
+        im = self.pool.acquire_image((8, 6), cv.IPL_DEPTH_8U, 3)
+        self.pool.release(im)
+        with self.assertRaises(ValueError):
+            self.pool.release(im)
+        self.assertEqual(self.pool.free_count, 1)
+
+        # The buffer is only handed out once.
+        self.assertIs(self.pool.acquire_image((8, 6), cv.IPL_DEPTH_8U, 3), im)
+        self.assertIsNot(self.pool.acquire_image((8, 6), cv.IPL_DEPTH_8U, 3),
+                         im)
+
+    def test_evict_max_buffers(self):
+        pool = BufferPool(max_buffers=2)
+        images = [pool.acquire_image((4, 4), cv.IPL_DEPTH_8U, channels)
+                  for channels in (1, 3, 4)]
+        for im in images:
+            pool.release(im)
+        self.assertEqual(pool.free_count, 2)
+        # The least recently released size/type is dropped.
+        self.assertIsNot(pool.acquire_image((4, 4), cv.IPL_DEPTH_8U, 1),
+                         images[0])
+        self.assertIs(pool.acquire_image((4, 4), cv.IPL_DEPTH_8U, 3),
+                      images[1])
+        self.assertIs(pool.acquire_image((4, 4), cv.IPL_DEPTH_8U, 4),
+                      images[2])
+
+    def test_evict_max_bytes(self):
+        pool = BufferPool(max_bytes=100)
+        small = pool.acquire_image((4, 4), cv.IPL_DEPTH_8U, 1)
+        large = pool.acquire_image((10, 10), cv.IPL_DEPTH_8U, 1)
+        pool.release(small)
+        pool.release(large)
+        self.assertEqual(pool.free_count, 1)
+        self.assertEqual(pool.free_bytes, 100)
+        self.assertIs(pool.acquire_image((10, 10), cv.IPL_DEPTH_8U, 1), large)
+
+    def test_clear(self):
+        self.pool.release(self.pool.acquire_image((4, 4), cv.IPL_DEPTH_8U,
+                                                  1))
+        self.pool.clear()
+        self.assertEqual((self.pool.free_count, self.pool.free_bytes), (0, 0))
+
+    def test_get_image_buffer(self):
+        dst = cv.CreateImage((4, 4), cv.IPL_DEPTH_8U, 1)
+        self.assertIs(get_image_buffer((4, 4), cv.IPL_DEPTH_8U, 1, dst=dst,
+                                       pool=self.pool), dst)
+        self.pool.release(dst)
+        self.assertIs(get_image_buffer((4, 4), cv.IPL_DEPTH_8U, 1,
+                                       pool=self.pool), dst)
+        im = get_image_buffer((4, 3), cv.IPL_DEPTH_8U, 3)
+        self.assertEqual((im.width, im.height, im.channels), (4, 3, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
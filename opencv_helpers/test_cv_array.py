@@ -0,0 +1,85 @@
+import unittest
+
+import numpy as np
+
+from .safe_cv import cv
+from .cv_array import array2cv, array2mat, cv2array, bgr2rgb_view
+
+
+DTYPES = ('uint8', 'int8', 'uint16', 'int16', 'int32', 'float32', 'float64')
+
+
+def _as_hwc(a):
+    # `cv2array` always returns `(height, width, channels)`.
+    return a if a.ndim == 3 else a[:, :, np.newaxis]
+
+
+@unittest.skipIf(cv is None, 'legacy cv module not available')
+class TestCvArray(unittest.TestCase):
+    def _arrays(self, dtype):
+        '''
+        Yield `(name, array)` for 1 and 3 channel arrays of `dtype`.
+        '''
+        random = np.random.RandomState(0)
+        for shape in ((12, 16), (12, 16, 1), (12, 16, 3)):
+            a = (100 * random.rand(*shape)).astype(dtype)
+            yield str(shape), a
+
+    def _check_view(self, a, b, msg):
+        self.assertTrue(np.shares_memory(a, b), msg)
+        np.testing.assert_array_equal(_as_hwc(a), b, err_msg=msg)
+
+    def test_array2cv_round_trip(self):
+        for dtype in DTYPES:
+            for name, a in self._arrays(dtype):
+                msg = '%s %s' % (dtype, name)
+                self._check_view(a, cv2array(array2cv(a)), msg)
+
+    def test_array2mat_round_trip(self):
+        for dtype in DTYPES:
+            for name, a in self._arrays(dtype):
+                msg = '%s %s' % (dtype, name)
+                self._check_view(a, cv2array(array2mat(a)), msg)
+
+    def test_sub_rect(self):
+        # Rows of a sub-rectangle are not adjacent (row stride of the full
+        # array), which OpenCV headers support.
+        for dtype in DTYPES:
+            for name, a in self._arrays(dtype):
+                sub = a[2:-2, 3:-3]
+                msg = '%s %s' % (dtype, name)
+                self._check_view(sub, cv2array(array2cv(sub)), msg)
+                self._check_view(sub, cv2array(array2mat(sub)), msg)
+
+    def test_non_packed_copy(self):
+        # Pixels that are not packed within rows (column step, reversed
+        # channels) are copied.
+        a = np.arange(12 * 16 * 3, dtype='uint8').reshape(12, 16, 3)
+        for b in (a[:, ::2], bgr2rgb_view(a), a[::-1]):
+            c = cv2array(array2cv(b))
+            self.assertFalse(np.shares_memory(b, c))
+            np.testing.assert_array_equal(b, c)
+
+    def test_write_through(self):
+        a = np.zeros((4, 5, 3), dtype='uint8')
+        im = array2cv(a)
+        cv.Set2D(im, 1, 2, (1, 2, 3))
+        self.assertEqual(tuple(a[1, 2]), (1, 2, 3))
+
+        a[3, 4] = (4, 5, 6)
+        self.assertEqual(tuple(cv.Get2D(im, 3, 4))[:3], (4, 5, 6))
+
+    def test_cv2array_of_image(self):
+        im = cv.CreateImage((5, 4), cv.IPL_DEPTH_8U, 3)
+        cv.Set(im, (7, 8, 9))
+        a = cv2array(im)
+        self.assertEqual(a.shape, (4, 5, 3))
+        self.assertTrue((a == (7, 8, 9)).all())
+
+        # Writes to the view show in the image.
+        a[0, 0] = (1, 2, 3)
+        self.assertEqual(tuple(cv.Get2D(im, 0, 0))[:3], (1, 2, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
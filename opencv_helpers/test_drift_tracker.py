@@ -0,0 +1,115 @@
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from .drift_tracker import DriftTracker
+
+
+def synthetic_frame(shape=(240, 320)):
+    '''
+    Return `uint8` frame of random Gaussian blobs.
+    '''
+    random = np.random.RandomState(0)
+    y, x = np.mgrid[:shape[0], :shape[1]]
+    frame = np.zeros(shape)
+    for i in range(200):
+        cx, cy = random.rand(2) * shape[::-1]
+        frame += random.rand() * np.exp(-((x - cx) ** 2 + (y - cy) ** 2)
+                                        / (2 * (4 + 8 * random.rand()) ** 2))
+    return (255 * frame / frame.max()).astype('uint8')
+
+
+def shifted(frame, dx, dy, margin=32):
+    '''
+    Return crop of `frame` whose content is moved by `(dx, dy)` relative to
+    the crop `frame[margin:-margin, margin:-margin]`.
+    '''
+    height, width = frame.shape[:2]
+    return frame[margin - dy:height - margin - dy,
+                 margin - dx:width - margin - dx]
+
+
+class TestDriftTracker(unittest.TestCase):
+    def setUp(self):
+        self.frame = synthetic_frame()
+        self.reference = shifted(self.frame, 0, 0)
+        self.reference_map = np.array([[1.1, 0.05, 20.], [-0.02, 0.9, 10.],
+                                       [0., 0., 1.]])
+        self.map_mat = self.reference_map.copy()
+
+    def test_shift_sign(self):
+        tracker = DriftTracker(self.reference, self.map_mat, level=1)
+        for dx, dy in ((8, 0), (0, -6), (-10, 4), (6, 12)):
+            estimate = tracker.estimate(shifted(self.frame, dx, dy))
+            self.assertGreater(estimate.confidence, tracker.min_confidence)
+            self.assertAlmostEqual(estimate.dx, dx, delta=1)
+            self.assertAlmostEqual(estimate.dy, dy, delta=1)
+            # `map_mat` is updated in place, mapping overlay points to frame
+            # points moved with the content...
+            np.testing.assert_array_equal(self.map_mat, estimate.map_array)
+            point = np.array([50., 40., 1.])
+            moved = self.map_mat.dot(point)
+            expected = self.reference_map.dot(point)
+            np.testing.assert_allclose(moved[:2] - expected[:2],
+                                       [estimate.dx, estimate.dy])
+            # ...so the correction of frame points back to the reference
+            # position has the opposite sign of the shift.
+            correction = (self.reference_map.dot(np.linalg.inv(self.map_mat))
+                          .dot(moved))
+            np.testing.assert_allclose(correction[:2] - moved[:2],
+                                       [-estimate.dx, -estimate.dy])
+            self.assertEqual(np.sign(round(correction[0] - moved[0])),
+                             -np.sign(dx))
+            self.assertEqual(np.sign(round(correction[1] - moved[1])),
+                             -np.sign(dy))
+
+        tracker.reset()
+        np.testing.assert_array_equal(self.map_mat, self.reference_map)
+
+    def test_low_confidence(self):
+        tracker = DriftTracker(self.reference, self.map_mat,
+                               min_confidence=np.inf)
+        estimate = tracker.estimate(shifted(self.frame, 8, 8))
+        self.assertGreater(estimate.dx, 0)
+        np.testing.assert_array_equal(self.map_mat, self.reference_map)
+
+    def test_background_thread(self):
+        lock = mock.MagicMock()
+        estimates = []
+        done = threading.Event()
+
+        def on_drift(estimate):
+            estimates.append(estimate)
+            done.set()
+
+        tracker = DriftTracker(self.reference, self.map_mat, interval=2,
+                               level=1, lock=lock, on_drift=on_drift)
+        tracker.start()
+        try:
+            self.assertIsNone(tracker.update(shifted(self.frame, 8, 0)))
+            # Skipped (not an `interval`-th frame).
+            self.assertIsNone(tracker.update(shifted(self.frame, 0, 8)))
+            self.assertTrue(done.wait(5))
+        finally:
+            tracker.stop()
+        self.assertEqual(len(estimates), 1)
+        self.assertAlmostEqual(estimates[0].dx, 8, delta=1)
+        # `map_mat` was written with the lock held.
+        self.assertTrue(lock.__enter__.called)
+        self.assertTrue(lock.__exit__.called)
+
+    def test_attach(self):
+        grabber = mock.Mock()
+        grabber.add_frame_callback.side_effect = lambda callback: callback
+        tracker = DriftTracker(self.reference, self.map_mat, interval=1)
+        callback = tracker.attach(grabber)
+        grabber.add_frame_callback.assert_called_once_with(callback)
+        callback(shifted(self.frame, 0, 0), None)
+        self.assertEqual(tracker.frame_count, 1)
+        self.assertIsNotNone(tracker.last_estimate)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -31,6 +31,7 @@ from path_helpers import path
 from .safe_cv import cv
 from .frame_grabber import FrameGrabber, CVCaptureConfig
 from .camera_capture import CameraCapture
+from .pixbuf import PixbufDisplay
 
 
 def parse_args():
@@ -79,6 +80,7 @@ class FrameGrabberGUI:
         self.grabber.frame_callback = self.update_frame_data
         self.pixbuf = None
         self.pixmap = None
+        self.display = PixbufDisplay(self.area.window)
         self.grabber.start()
         self.grabber.set_fps_limit(fps_limit)
         self.video_enabled = False
@@ -118,22 +120,14 @@ class FrameGrabberGUI:
         if self.video_enabled:
             # Process NumPy array frame data
             height, width, channels = frame.shape
-            depth = {np.dtype('uint8'): 8}[frame.dtype]
             logging.debug('[update_frame_data] type(frame)=%s '\
-                'height, width, channels, depth=(%s)'\
-                % (type(frame), (height, width, channels, depth)))
-            gtk_frame = array2cv(frame)
-            cv.CvtColor(gtk_frame, gtk_frame, cv.CV_BGR2RGB)
+                'height, width, channels=(%s)'\
+                % (type(frame), (height, width, channels)))
+            # Resize and convert BGR to RGB directly into the persistent
+            # pixbuf, which is then drawn to the persistent pixmap.
             x, y, a_width, a_height = self.area.get_allocation()
-            if a_width != width or a_height != height:
-                resized = cv.CreateMat(width, height, cv.CV_8UC3)
-                cv.Resize(gtk_frame, resized)
-            else:
-                resized = gtk_frame
-            self.pixbuf = gtk.gdk.pixbuf_new_from_data(
-                resized.tostring(), gtk.gdk.COLORSPACE_RGB, False,
-                depth, width, height, height * 3) #resized.step)
-            self.pixmap, mask = self.pixbuf.render_pixmap_and_mask()
+            self.pixbuf = self.display.update(frame, a_width, a_height)
+            self.pixmap = self.display.pixmap
             cairo = self.pixmap.cairo_create()
         elif self.pixmap is not None:
             x, y, width, height = self.area.get_allocation()
@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from path_helpers import path
+
+from .safe_cv import cv2
+from . import frame_index
+from .frame_index import FrameIndex, build_frame_index, get_index_path
+
+
+# `ffprobe` compact output for a stream starting at 1.4 s, with packets in
+# decode order (B-frames are presented before the preceding P-frame).
+FFPROBE_OUTPUT = '''\
+packet|pts_time=1.400000|pos=48|flags=K_
+packet|pts_time=1.480000|pos=1200|flags=__
+packet|pts_time=1.440000|pos=1500|flags=__
+packet|pts_time=1.520000|pos=1700|flags=K_
+packet|pts_time=N/A|pos=1900|flags=__
+packet|pts_time=1.560000|pos=N/A|flags=__
+stream|start_time=1.400000
+'''
+
+
+class TestFrameIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = path(tempfile.mkdtemp(prefix='test_frame_index-'))
+        self.video_path = self.temp_dir.joinpath('video.avi')
+        with open(self.video_path, 'wb') as output:
+            output.write(b'\0' * 16)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _build(self, output=FFPROBE_OUTPUT, **kwargs):
+        with mock.patch.object(frame_index.shutil, 'which',
+                               return_value='ffprobe'), \
+                mock.patch.object(frame_index.subprocess, 'check_output',
+                                  return_value=output.encode('utf-8')):
+            return build_frame_index(self.video_path, **kwargs)
+
+    def test_parse_relative_to_start_time(self):
+        index = self._build()
+        np.testing.assert_allclose(index.entries['pts_ms'],
+                                   [0, 40, 80, 120, 160])
+        np.testing.assert_array_equal(index.entries['frame'], np.arange(5))
+        np.testing.assert_array_equal(index.entries['offset'],
+                                      [48, 1500, 1200, 1700, -1])
+        np.testing.assert_array_equal(index.keyframes, [0, 3])
+        self.assertEqual(index.preceding_keyframe(2), 0)
+        self.assertEqual(index.preceding_keyframe(4), 3)
+        self.assertEqual(index.pts_ms(3), 120)
+
+    def test_parse_without_start_time(self):
+        output = '\n'.join(FFPROBE_OUTPUT.splitlines()[:-1]
+                           + ['stream|start_time=N/A'])
+        index = self._build(output)
+        self.assertAlmostEqual(index.pts_ms(0), 1400)
+
+    def test_sidecar_round_trip(self):
+        index = self._build()
+        self.assertTrue(get_index_path(self.video_path).isfile())
+
+        loaded = FrameIndex.load(self.video_path)
+        np.testing.assert_array_equal(loaded.entries, index.entries)
+        np.testing.assert_array_equal(loaded.keyframes, index.keyframes)
+
+        # An up to date sidecar is used instead of probing again.
+        with mock.patch.object(frame_index.subprocess,
+                               'check_output') as check_output:
+            reloaded = build_frame_index(self.video_path)
+        self.assertFalse(check_output.called)
+        np.testing.assert_array_equal(reloaded.entries, index.entries)
+
+    def test_stale_sidecar(self):
+        self._build()
+        index_mtime = get_index_path(self.video_path).mtime
+        os.utime(self.video_path, (index_mtime + 10, index_mtime + 10))
+        self.assertIsNone(FrameIndex.load(self.video_path))
+
+    def test_missing_sidecar(self):
+        self.assertIsNone(FrameIndex.load(self.video_path))
+
+    def test_scan_capture_without_ffprobe(self):
+        # Scanned with `cv2` (10 fps), so only timestamps are known.
+        writer = cv2.VideoWriter(str(self.video_path),
+                                 cv2.VideoWriter_fourcc(*'MJPG'), 10, (6, 4))
+        for i in range(5):
+            writer.write(np.full((4, 6, 3), 50 * i, dtype='uint8'))
+        writer.release()
+        with mock.patch.object(frame_index.shutil, 'which',
+                               return_value=None):
+            index = FrameIndex.build(self.video_path, backend='cv2')
+        self.assertEqual(len(index), 5)
+        np.testing.assert_array_equal(index.entries['frame'], np.arange(5))
+        np.testing.assert_allclose(np.diff(index.entries['pts_ms']), 100)
+        np.testing.assert_array_equal(index.entries['offset'], -1)
+
+
+if __name__ == '__main__':
+    unittest.main()
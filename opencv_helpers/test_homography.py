@@ -0,0 +1,73 @@
+import unittest
+
+import numpy as np
+
+from . import (find_homography_arrays, map_points, cvwarp_mats_to_4x4,
+               cvwarp_mat_to_4x4)
+
+
+# Perspective transforms (last row not `[0, 0, 1]`).
+H = np.array([[[1.2, 0.1, 30.], [-0.05, 0.9, -12.], [1e-4, -2e-4, 1.]],
+              [[0.8, -0.3, 5.], [0.25, 1.1, 40.], [-3e-4, 1e-4, 1.]]])
+POINTS = np.array([[0, 0], [640, 0], [640, 480], [0, 480], [320, 240],
+                   [100, 400]], dtype='float64')
+
+
+class TestHomography(unittest.TestCase):
+    def test_map_points(self):
+        for h in H:
+            homogeneous = np.column_stack([POINTS, np.ones(len(POINTS))])
+            expected = homogeneous @ h.T
+            expected = expected[:, :2] / expected[:, 2:]
+            np.testing.assert_allclose(map_points(h, POINTS), expected)
+
+        # Stack of homographies, with shared or per-homography points.
+        mapped = map_points(H, POINTS)
+        self.assertEqual(mapped.shape, (2, len(POINTS), 2))
+        np.testing.assert_allclose(mapped[1], map_points(H[1], POINTS))
+        np.testing.assert_allclose(map_points(H, mapped[::-1]),
+                                   [map_points(H[0], mapped[1]),
+                                    map_points(H[1], mapped[0])])
+
+    def test_map_points_round_trip(self):
+        for h in H:
+            mapped = map_points(h, POINTS)
+            np.testing.assert_allclose(map_points(np.linalg.inv(h), mapped),
+                                       POINTS, atol=1e-9)
+
+    def test_find_homography_arrays(self):
+        points_b = map_points(H, POINTS)
+        found = find_homography_arrays([POINTS, POINTS], points_b)
+        self.assertEqual(found.shape, (2, 3, 3))
+        np.testing.assert_allclose(found, H, rtol=1e-6, atol=1e-9)
+        np.testing.assert_allclose(map_points(found, POINTS), points_b,
+                                   atol=1e-6)
+
+        # Inverse mapping is found from swapped points.
+        inverse = find_homography_arrays(points_b, [POINTS, POINTS])
+        np.testing.assert_allclose(map_points(inverse, points_b),
+                                   [POINTS, POINTS], atol=1e-6)
+
+    def test_cvwarp_mats_to_4x4(self):
+        H4 = cvwarp_mats_to_4x4(H)
+        self.assertEqual(H4.shape, (2, 4, 4))
+        self.assertEqual(H4.dtype, np.float32)
+        # Rows/columns of the 3x3 transform map to x, y and w; z is kept.
+        np.testing.assert_allclose(H4[:, [0, 1, 3]][:, :, [0, 1, 3]], H,
+                                   rtol=1e-6)
+        np.testing.assert_array_equal(H4[:, 2], [[0, 0, 1, 0]] * 2)
+        np.testing.assert_array_equal(H4[:, :, 2], [[0, 0, 1, 0]] * 2)
+
+        # Points in the `z = 0` plane are mapped like the 2D points.
+        homogeneous = np.column_stack([POINTS, np.zeros(len(POINTS)),
+                                       np.ones(len(POINTS))])
+        for h, h4 in zip(H, H4):
+            mapped = homogeneous @ h4.T
+            np.testing.assert_allclose(mapped[:, :2] / mapped[:, 3:],
+                                       map_points(h, POINTS), rtol=1e-5)
+
+        np.testing.assert_array_equal(cvwarp_mat_to_4x4(H[1]), H4[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
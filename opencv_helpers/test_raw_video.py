@@ -0,0 +1,114 @@
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from path_helpers import path
+
+from .raw_video import RawFrameWriter, RawFrameReader, RawFileCapture
+from .recorder import RecordFrameRateInfo, RAW_CODEC
+
+
+class TestRawVideo(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = path(tempfile.mkdtemp(prefix='test_raw_video-'))
+        self.output_path = self.temp_dir.joinpath('frames.raw')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _frames(self, count, shape=(5, 7, 3)):
+        return np.random.RandomState(0).randint(0, 256, size=(count, ) +
+                                                shape).astype('uint8')
+
+    def test_round_trip(self):
+        frames = self._frames(11)
+        timestamps = 1e9 + np.arange(len(frames)) / 30.
+        writer = RawFrameWriter(self.output_path, (7, 5), capacity=4,
+                                batch_size=3)
+        for frame, timestamp in zip(frames, timestamps):
+            writer.write(frame, timestamp)
+        # Grown past the initial capacity by doubling.
+        self.assertEqual(writer.capacity, 16)
+        writer.close()
+
+        reader = RawFrameReader(self.output_path)
+        self.assertEqual(len(reader), len(frames))
+        self.assertEqual(reader.dimensions, (7, 5))
+        self.assertEqual(reader.capacity, 16)
+        np.testing.assert_array_equal(reader.frames, frames)
+        np.testing.assert_array_equal(reader[3], frames[3])
+        np.testing.assert_array_equal(reader.timestamps, timestamps)
+
+    def test_flush_partial_batch(self):
+        frames = self._frames(2, (4, 4, 1))
+        writer = RawFrameWriter(self.output_path, (4, 4), channels=1,
+                                batch_size=8)
+        for frame in frames:
+            writer.write(frame, 1.)
+        writer.flush()
+
+        # Frames written so far are readable while the writer is open.
+        reader = RawFrameReader(self.output_path)
+        np.testing.assert_array_equal(reader.frames, frames)
+        writer.close()
+
+    def test_empty(self):
+        RawFrameWriter(self.output_path, (4, 3)).close()
+        reader = RawFrameReader(self.output_path)
+        self.assertEqual(len(reader), 0)
+        self.assertEqual(reader.frames.shape, (0, 3, 4, 3))
+
+    def test_not_raw(self):
+        with open(self.output_path, 'wb') as output:
+            output.write(b'\0' * 64)
+        with self.assertRaises(IOError):
+            RawFrameReader(self.output_path)
+
+    def test_failed_open(self):
+        with self.assertRaises(IOError):
+            RawFrameWriter(self.temp_dir.joinpath('missing', 'frames.raw'),
+                           (4, 3))
+        # Closing (e.g., on garbage collection) a writer whose file was never
+        # opened does nothing.
+        RawFrameWriter.__new__(RawFrameWriter).close()
+
+    def test_file_capture_cv2(self):
+        frames = self._frames(3)
+        writer = RawFrameWriter(self.output_path, (7, 5))
+        for frame in frames:
+            writer.write(frame)
+        writer.close()
+
+        cap = RawFileCapture(self.output_path, loop=True, auto_init=True,
+                             backend='cv2')
+        self.assertEqual(cap.dimensions, (7, 5))
+        for i in range(4):
+            frame = cap.get_frame()
+            # NumPy views of the memory-mapped frames.
+            self.assertIsInstance(frame, np.ndarray)
+            np.testing.assert_array_equal(frame, frames[i % 3])
+        cap.release_capture()
+
+
+class TestRecordFrameRateInfo(unittest.TestCase):
+    def test_raw_codec(self):
+        cam_cap = mock.Mock(dimensions=(7, 5), backend='cv2')
+        cam_cap.get_frame.return_value = np.zeros((5, 7, 3), dtype='uint8')
+        written = []
+        write = RawFrameWriter.write
+
+        def record_write(writer, frame, timestamp=None):
+            written.append(writer.output_path.ext)
+            write(writer, frame, timestamp)
+
+        with mock.patch.object(RawFrameWriter, 'write', record_write):
+            info = RecordFrameRateInfo(cam_cap, codec=RAW_CODEC)
+        self.assertEqual(len(info.times), 100)
+        self.assertEqual(len(info.frame_lengths), 99)
+        self.assertEqual(written, ['.raw'] * 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
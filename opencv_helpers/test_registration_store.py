@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from path_helpers import path
+
+from .registration_store import (RegistrationStore, frame_fingerprint,
+                                 fingerprint_distance)
+
+
+def synthetic_frame(seed, shape=(240, 320, 3)):
+    '''
+    Return random `uint8` frame of 20x20 pixel blocks, so its structure
+    survives the downsampling of the fingerprint.
+    '''
+    random = np.random.RandomState(seed)
+    coarse = random.randint(0, 256, (shape[0] // 20, shape[1] // 20) +
+                            shape[2:])
+    return np.kron(coarse, np.ones((20, 20) + (1, ) * (len(shape) - 2),
+                                   dtype=int)).astype('uint8')
+
+
+MAP_ARRAY = np.array([[1.1, 0.02, 15.], [-0.01, 0.95, -8.], [1e-4, 0, 1.]])
+
+
+class TestRegistrationStore(unittest.TestCase):
+    def setUp(self):
+        self.store_dir = path(tempfile.mkdtemp(prefix='test_registration-'))
+        self.frame = synthetic_frame(0)
+
+    def tearDown(self):
+        shutil.rmtree(self.store_dir)
+
+    def test_fingerprint(self):
+        fingerprint = frame_fingerprint(self.frame)
+        self.assertEqual(fingerprint.shape, (24, 32))
+        self.assertAlmostEqual(fingerprint_distance(fingerprint,
+                                                    fingerprint), 0, places=5)
+        self.assertAlmostEqual(
+            fingerprint_distance(fingerprint,
+                                 frame_fingerprint(255 - self.frame)), 2,
+            places=5)
+
+        # Distances to a stack of fingerprints.
+        stack = np.array([fingerprint, -fingerprint])
+        np.testing.assert_allclose(fingerprint_distance(stack, fingerprint),
+                                   [0, 2], atol=1e-5)
+
+    def test_closes_store_files(self):
+        RegistrationStore(self.store_dir).save('camera 0', (320, 240),
+                                               self.frame, MAP_ARRAY)
+        loaded = []
+        load = np.load
+
+        def record_load(*args, **kwargs):
+            loaded.append(load(*args, **kwargs))
+            return loaded[-1]
+
+        with mock.patch.object(np, 'load', record_load):
+            RegistrationStore(self.store_dir).restore('camera 0', (320, 240),
+                                                      self.frame)
+        self.assertEqual(len(loaded), 1)
+        # `NpzFile.close` releases its file handle.
+        self.assertIsNone(loaded[0].fid)
+
+    def test_save_restore_round_trip(self):
+        store = RegistrationStore(self.store_dir)
+        store.save('camera 0', (320, 240), self.frame, MAP_ARRAY)
+        np.testing.assert_array_equal(
+            store.restore('camera 0', (320, 240), self.frame), MAP_ARRAY)
+
+        # Restored from disk by a new store, with a slightly noisy frame.
+        noise = np.random.RandomState(1).randint(-3, 4, self.frame.shape)
+        frame = np.clip(self.frame + noise, 0, 255).astype('uint8')
+        restored = RegistrationStore(self.store_dir).restore('camera 0',
+                                                             (320, 240),
+                                                             frame)
+        np.testing.assert_array_equal(restored, MAP_ARRAY)
+
+        # Other devices/resolutions are stored separately.
+        self.assertIsNone(store.restore('camera 1', (320, 240), self.frame))
+        self.assertIsNone(store.restore('camera 0', (640, 480), self.frame))
+
+    def test_stale_reference_rejected(self):
+        store = RegistrationStore(self.store_dir)
+        store.save('camera 0', (320, 240), self.frame, MAP_ARRAY)
+        # The camera has moved: the scene no longer matches the reference.
+        moved = synthetic_frame(2)
+        self.assertIsNone(store.restore('camera 0', (320, 240), moved))
+        self.assertIsNone(RegistrationStore(self.store_dir)
+                          .restore('camera 0', (320, 240), moved))
+
+    def test_save_replaces_matching(self):
+        store = RegistrationStore(self.store_dir)
+        other = synthetic_frame(3)
+        store.save('camera 0', (320, 240), self.frame, MAP_ARRAY)
+        store.save('camera 0', (320, 240), other, np.eye(3))
+        store.save('camera 0', (320, 240), self.frame, 2 * MAP_ARRAY)
+
+        store = RegistrationStore(self.store_dir)
+        map_arrays, fingerprints = store._load('camera 0', (320, 240))
+        self.assertEqual(len(map_arrays), 2)
+        np.testing.assert_array_equal(
+            store.restore('camera 0', (320, 240), self.frame), 2 * MAP_ARRAY)
+        np.testing.assert_array_equal(
+            store.restore('camera 0', (320, 240), other), np.eye(3))
+
+    def test_clear(self):
+        store = RegistrationStore(self.store_dir)
+        store.save('camera 0', (320, 240), self.frame, MAP_ARRAY)
+        store.clear('camera 0', (320, 240))
+        self.assertIsNone(store.restore('camera 0', (320, 240), self.frame))
+        self.assertEqual(os.listdir(self.store_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from path_helpers import path
+
+from .safe_cv import cv2
+from .backend import get_backend
+from . import video
+from .video import read_frames, seek_frame, copy_video_parallel
+
+
+class FakeBackend(object):
+    '''
+    Backend for a capture of `frame_count` `(4, 6)` frames, each filled with
+    its frame number.
+    '''
+    def __init__(self, frame_count):
+        self.frame_count = frame_count
+        self.position = 0
+
+    def grab(self, cap):
+        self.position += 1
+        return self.position <= self.frame_count
+
+    def retrieve_into(self, cap, out, grayscale=False):
+        out[:] = self.position - 1
+        return True
+
+
+def fake_props(frame_count=5):
+    return mock.Mock(height=4, width=6, backend=FakeBackend(frame_count))
+
+
+class TestReadFrames(unittest.TestCase):
+    def test_read_into_out(self):
+        out = np.zeros((3, 4, 6, 3), dtype='uint8')
+        frames = read_frames(None, out=out, step=2, props=fake_props())
+        self.assertTrue(np.shares_memory(frames, out))
+        np.testing.assert_array_equal(frames[:, 0, 0, 0], [0, 2, 4])
+
+    def test_end_of_video(self):
+        out = np.zeros((8, 4, 6, 1), dtype='uint8')
+        frames = read_frames(None, out=out, grayscale=True,
+                             props=fake_props())
+        self.assertEqual(len(frames), 5)
+
+    def test_mismatched_out(self):
+        for out in (np.zeros((3, 4, 7, 3), dtype='uint8'),
+                    np.zeros((3, 5, 6, 3), dtype='uint8'),
+                    np.zeros((3, 4, 6, 1), dtype='uint8'),
+                    np.zeros((3, 4, 6, 3), dtype='float32'),
+                    np.zeros((3, 4, 6), dtype='uint8')):
+            props = fake_props()
+            with self.assertRaises(ValueError):
+                read_frames(None, out=out, props=props)
+            # Nothing is read from the capture.
+            self.assertEqual(props.backend.position, 0)
+
+    def test_out_too_short(self):
+        with self.assertRaises(ValueError):
+            read_frames(None, count=4, out=np.zeros((3, 4, 6, 3),
+                                                    dtype='uint8'),
+                        props=fake_props())
+
+
+class TestSeekCV2(unittest.TestCase):
+    '''
+    Seek a real `cv2` capture of a generated video, with frame `i` filled
+    with `8 * i`.
+    '''
+    frame_count = 20
+
+    def setUp(self):
+        self.temp_dir = path(tempfile.mkdtemp(prefix='test_video-'))
+        self.video_path = self.temp_dir.joinpath('video.avi')
+        writer = cv2.VideoWriter(str(self.video_path),
+                                 cv2.VideoWriter_fourcc(*'MJPG'), 10,
+                                 (6, 4))
+        for i in range(self.frame_count):
+            writer.write(np.full((4, 6, 3), 8 * i, dtype='uint8'))
+        writer.release()
+        self.cap = get_backend('cv2').capture_from_file(self.video_path)
+
+    def tearDown(self):
+        self.cap.release()
+        shutil.rmtree(self.temp_dir)
+
+    def assertFrames(self, frames, indexes):
+        # JPEG compression is lossy.
+        np.testing.assert_allclose(frames.reshape(len(frames), -1)
+                                   .mean(axis=1), 8 * np.asarray(indexes),
+                                   atol=2)
+
+    def test_seek_frame(self):
+        self.assertEqual(seek_frame(self.cap, 12), 12)
+        ok, frame = self.cap.read()
+        self.assertTrue(ok)
+        self.assertFrames(frame[np.newaxis], [12])
+
+    def test_read_frames(self):
+        frames = read_frames(self.cap, start=10, count=5)
+        self.assertEqual(frames.shape, (5, 4, 6, 3))
+        self.assertFrames(frames, range(10, 15))
+
+        # Seek backwards.
+        frames = read_frames(self.cap, start=2, count=3, step=2)
+        self.assertFrames(frames, [2, 4, 6])
+
+
+class TestCopyVideoParallel(unittest.TestCase):
+    def test_serial_without_ffprobe(self):
+        for missing in ('ffmpeg', 'ffprobe'):
+            which = lambda name: None if name == missing else name
+            with mock.patch.object(video.shutil, 'which', which), \
+                    mock.patch.object(video, 'copy_video') as copy_video, \
+                    mock.patch.object(video, 'get_backend') as get_backend:
+                copy_video_parallel('in.avi', 'out.avi', frame_count=10,
+                                    offset=2, processes=4)
+            copy_video.assert_called_once_with('in.avi', 'out.avi',
+                                               frame_count=10, offset=2,
+                                               backend=None)
+            # No capture is opened for chunking.
+            self.assertFalse(get_backend.called)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,28 +1,111 @@
-import re
 import sys
 import os
 import tempfile
+import logging
+import multiprocessing
+import shutil
+import subprocess
 
+import numpy as np
 from path_helpers import path
 
 from .safe_cv import cv
 from .silence import Silence
+from .frame_index import FrameIndex
+from .backend import get_backend, backend_for_capture
+
+
+def get_captureprop_name2code(backend=None):
+    '''
+    Return mapping from `CV_CAP_PROP_*` property names to OpenCV property
+    codes.
+
+    The mapping is computed once per process (per backend), on first call.
+    '''
+    return get_backend(backend).captureprop_name2code()
 
 
 class CVCaptureProperties(object):
-    captureprop_name2code = dict([(v, getattr(cv, v)) for v in dir(cv) if re.search(r'^CV_CAP_PROP_', v)])
+    '''
+    Lazy view of the properties of an OpenCV capture.
+
+    Each property is queried from the capture the first time it is accessed
+    (e.g., `props.CV_CAP_PROP_FPS` or `props.fps`) and cached afterwards.  Use
+    `refresh` to (re-)query several properties at once and `invalidate` to
+    drop cached values, e.g., after calling `cv.SetCaptureProperty`.
 
-    def __init__(self, cap):
+    Works with captures from any backend (see `backend`).
+    '''
+    def __init__(self, cap, backend=None):
         self.cap = cap
-        self.props = self._get_props()
-        for k, v in self.captureprop_name2code.items():
-            setattr(self, k, self.props[k])
+        if backend is None:
+            backend = backend_for_capture(cap)
+        self.backend = get_backend(backend)
+        self._values = {}
+
+    @property
+    def captureprop_name2code(self):
+        return self.backend.captureprop_name2code()
+
+    @property
+    def props(self):
+        '''
+        Dictionary of all capture properties (queries any property that has
+        not been cached yet).
+        '''
+        missing = [k for k in self.captureprop_name2code
+                   if k not in self._values]
+        if missing:
+            self.refresh(missing)
+        return dict(self._values)
+
+    def __getattr__(self, name):
+        # Only called if normal attribute lookup fails, i.e., for
+        # `CV_CAP_PROP_*` names.
+        if name.startswith('CV_CAP_PROP_') and name in self.captureprop_name2code:
+            return self.get(name)
+        raise AttributeError(name)
+
+    def get(self, name):
+        '''
+        Return value of capture property `name`, querying the capture only if
+        the value is not cached.
+        '''
+        if name not in self._values:
+            self.refresh([name])
+        return self._values[name]
+
+    def refresh(self, names=None):
+        '''
+        Query the listed properties from the capture and update the cache.
 
-    def _get_props(self):
-        with Silence():
-            values = dict([(k, cv.GetCaptureProperty(self.cap, v)) for k, v in self.captureprop_name2code.items()])
+        Arguments
+        ---------
+
+         - `names`: List of `CV_CAP_PROP_*` names.  If `None`, re-query all
+           properties that are currently cached.
+
+        Returns dictionary of refreshed property values.
+        '''
+        if names is None:
+            names = list(self._values.keys())
+        if not names:
+            return {}
+        values = self.backend.get_properties(self.cap, names)
+        self._values.update(values)
         return values
 
+    def invalidate(self, names=None):
+        '''
+        Drop cached values for the listed properties (all if `names` is
+        `None`), so they are queried again on next access.
+        '''
+        if names is None:
+            self._values.clear()
+        else:
+            for k in names:
+                self._values.pop(k, None)
+
     @property
     def frame_count(self):
         return int(self.CV_CAP_PROP_FRAME_COUNT)
@@ -49,40 +132,352 @@ class CVCaptureProperties(object):
         return ''.join([chr(v) for v in chars])
 
 
-def copy_image_to_video(in_file, out_file, frame_count, fourcc='XVID', fps=24):
+def copy_image_to_video(in_file, out_file, frame_count, fourcc='XVID', fps=24,
+                        backend=None):
+    backend = get_backend(backend)
     # standard RGB png file
-    cap = cv.CaptureFromFile(in_file)
-    width = int(cv.GetCaptureProperty(cap, cv.CV_CAP_PROP_FRAME_WIDTH))
-    height = int(cv.GetCaptureProperty(cap, cv.CV_CAP_PROP_FRAME_HEIGHT))
+    cap = backend.capture_from_file(in_file)
+    props = CVCaptureProperties(cap, backend)
 
     # uncompressed YUV 4:2:0 chroma subsampled
-    cv_fourcc = cv.CV_FOURCC(*fourcc)
-    writer = cv.CreateVideoWriter(out_file, cv_fourcc, fps, (width, height), 1)
+    cv_fourcc = backend.fourcc(fourcc)
+    writer = backend.create_writer(out_file, cv_fourcc, fps,
+                                   (props.width, props.height), True)
 
     for i in range(frame_count):
-        cv.GrabFrame(cap)
-        frame = cv.RetrieveFrame(cap)
-        cv.WriteFrame(writer, frame)
+        frame = backend.read(cap)
+        backend.write(writer, frame)
+    backend.release(writer)
 
 
-def copy_video(cap, output_path, frame_count=None, offset=0):
+def seek_frame(cap, frame_index, props=None, index=None):
+    '''
+    Position `cap` so that the next grabbed frame is `frame_index`.
+
+    Seeks with `CV_CAP_PROP_POS_FRAMES`, falling back to
+    `CV_CAP_PROP_POS_MSEC`, and checks the position the capture actually
+    landed on.  If the capture lands before the requested frame (e.g., on the
+    preceding keyframe), the remaining frames are grabbed to reach it.
+
+    If a `FrameIndex` is given (see `frame_index`), the capture is instead
+    positioned at the timestamp of the nearest keyframe at or before
+    `frame_index`, and decoding continues forward from there.
+
+    Arguments
+    ---------
+
+     - `cap`: OpenCV file capture (from any backend).
+     - `frame_index`: Index of the next frame to grab.
+     - `props`: Optional `CVCaptureProperties` for `cap`.
+     - `index`: Optional `FrameIndex` for the video opened by `cap`.
+
+    Raises `IOError` if the capture cannot be positioned at or before the
+    requested frame.
+    '''
+    if props is None:
+        props = CVCaptureProperties(cap)
+    seek_values = [('CV_CAP_PROP_POS_FRAMES', frame_index)]
+    if index is not None and frame_index < len(index):
+        keyframe = index.preceding_keyframe(frame_index)
+        seek_values = [('CV_CAP_PROP_POS_MSEC', index.pts_ms(keyframe))] \
+            + seek_values
+    if props.fps > 0:
+        seek_values.append(('CV_CAP_PROP_POS_MSEC',
+                            1000. * frame_index / props.fps))
+
+    backend = props.backend
+    position = None
+    with Silence():
+        for name, value in seek_values:
+            backend.set_property(cap, name, value)
+            position = int(round(backend.get_properties(
+                cap, ['CV_CAP_PROP_POS_FRAMES'])['CV_CAP_PROP_POS_FRAMES']))
+            if 0 <= position <= frame_index:
+                break
+        else:
+            position = None
+    props.invalidate(['CV_CAP_PROP_POS_FRAMES', 'CV_CAP_PROP_POS_MSEC',
+                      'CV_CAP_PROP_POS_AVI_RATIO'])
+
+    if position is None:
+        raise IOError('Could not seek to frame %d.' % frame_index)
+    for i in range(frame_index - position):
+        backend.grab(cap)
+    return frame_index
+
+
+def copy_video(cap, output_path, frame_count=None, offset=0, processes=1,
+               index=None, backend=None):
+    '''
+    Copy (transcode) `frame_count` frames, starting at frame `offset`, from a
+    video to `output_path`, using the codec, frame rate and dimensions of the
+    source.
+
+    Arguments
+    ---------
+
+     - `cap`: OpenCV file capture, or path to video file.
+     - `output_path`: Output video path.
+     - `frame_count`: Number of frames to copy (default: all remaining).
+     - `offset`: Index of first frame to copy.  The source is positioned
+       using `seek_frame`, rather than by grabbing each skipped frame.
+     - `processes`: If greater than one, split the frame range into chunks,
+       transcode each chunk in a worker process and concatenate the results
+       (see `copy_video_parallel`).  `cap` must be a path in this case.
+     - `index`: `FrameIndex` used to seek to `offset`.  If `cap` is a path,
+       the sidecar index of the video is loaded, if there is one.
+     - `backend`: Backend used to open `cap` if it is a path (see
+       `backend.get_backend`).  Otherwise, the backend of `cap` is used.
+    '''
+    if processes > 1:
+        return copy_video_parallel(cap, output_path, frame_count=frame_count,
+                                   offset=offset, processes=processes,
+                                   backend=backend)
+    if isinstance(cap, str):
+        if index is None:
+            index = FrameIndex.load(cap)
+        cap = get_backend(backend).capture_from_file(cap)
     props = CVCaptureProperties(cap)
+    backend = props.backend
+    props.refresh(['CV_CAP_PROP_FRAME_COUNT', 'CV_CAP_PROP_FOURCC',
+                   'CV_CAP_PROP_FPS', 'CV_CAP_PROP_FRAME_WIDTH',
+                   'CV_CAP_PROP_FRAME_HEIGHT'])
+    offset = max(0, min(offset, props.frame_count))
     if frame_count is None:
         frame_count = props.frame_count
-    frame_count = min(props.frame_count, frame_count)
-    skip_frames = min(offset, frame_count)
-    print('frame_count, skip_frames:', frame_count, skip_frames)
+    frame_count = min(props.frame_count - offset, frame_count)
+    logging.getLogger('opencv.video').debug('frame_count, offset: %s, %s'
+                                            % (frame_count, offset))
 
-    writer = cv.CreateVideoWriter(output_path, cv.CV_FOURCC(*props.fourcc),
-                                    props.fps, (props.width, props.height), True)
+    writer = backend.create_writer(output_path, backend.fourcc(props.fourcc),
+                                   props.fps, (props.width, props.height),
+                                   True)
 
-    for skip_frames in range(offset):
-        cv.GrabFrame(cap)
+    if offset > 0:
+        seek_frame(cap, offset, props, index=index)
 
     for i in range(frame_count):
-        cv.GrabFrame(cap)
-        frame = cv.RetrieveFrame(cap)
-        cv.WriteFrame(writer, frame)
+        frame = backend.read(cap)
+        if frame is None:
+            frame_count = i
+            break
+        backend.write(writer, frame)
+    backend.release(writer)
+    return frame_count
+
+
+def _copy_video_chunk(args):
+    in_file, output_path, offset, frame_count, index, backend = args
+    return copy_video(str(in_file), output_path, frame_count=frame_count,
+                      offset=offset, index=index, backend=backend)
+
+
+def count_video_frames(video_path):
+    '''
+    Return the number of video packets (i.e., frames) in `video_path`, as
+    counted by `ffprobe`.
+    '''
+    output = subprocess.check_output(
+        ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-count_packets',
+         '-show_entries', 'stream=nb_read_packets', '-of', 'csv=p=0',
+         str(video_path)])
+    return int(output.decode('utf-8').strip().split(',')[0])
+
+
+def concatenate_videos(in_files, output_path):
+    '''
+    Concatenate videos with identical codec parameters into `output_path`,
+    without re-encoding, using the `ffmpeg` concat demuxer.
+    '''
+    output_path = path(output_path)
+    list_handle, list_path = tempfile.mkstemp(suffix='.txt')
+    list_path = path(list_path)
+    try:
+        with os.fdopen(list_handle, 'w') as output:
+            for f in in_files:
+                output.write("file '%s'\n" % path(f).abspath())
+        subprocess.check_call(['ffmpeg', '-y', '-loglevel', 'error', '-f',
+                               'concat', '-safe', '0', '-i', list_path, '-c',
+                               'copy', output_path])
+    finally:
+        list_path.remove()
+
+
+def copy_video_parallel(in_file, output_path, frame_count=None, offset=0,
+                        processes=None, backend=None):
+    '''
+    Parallel version of `copy_video`.
+
+    The frame range is split into one chunk per process.  Each worker opens
+    `in_file`, seeks to the start of its chunk and transcodes it to a
+    temporary file, and the chunks are then concatenated (without
+    re-encoding) into `output_path`.
+
+    Seeking with `CV_CAP_PROP_POS_FRAMES` alone is not frame accurate for
+    many codecs, which would duplicate or drop frames where chunks meet.
+    Workers therefore seek using the frame index of `in_file` (the sidecar
+    index if up to date, otherwise the index is built, see `frame_index`):
+    each decodes forward from the keyframe preceding its first frame.  The
+    frame count of the concatenated video is checked against the frames
+    copied.
+
+    Concatenation requires `ffmpeg`, and counting the frames of the output
+    requires `ffprobe`; if either is not available, the video is copied in a
+    single process instead.
+
+    Raises `IOError` if the output does not contain the copied frames.
+    '''
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    in_file = path(in_file)
+    if processes < 2 or shutil.which('ffmpeg') is None or \
+            shutil.which('ffprobe') is None:
+        logging.getLogger('opencv.video').info('copying video in a single '
+                                               'process')
+        return copy_video(str(in_file), output_path, frame_count=frame_count,
+                          offset=offset, backend=backend)
+
+    backend = get_backend(backend)
+    probe = backend.capture_from_file(in_file)
+    try:
+        total_frames = CVCaptureProperties(probe, backend).frame_count
+    finally:
+        backend.release(probe)
+    offset = max(0, min(offset, total_frames))
+    if frame_count is None:
+        frame_count = total_frames
+    frame_count = min(total_frames - offset, frame_count)
+    if frame_count <= 0:
+        return 0
+
+    index = FrameIndex.load(in_file)
+    if index is None:
+        index = FrameIndex.build(in_file, backend)
+
+    chunk_size = -(-frame_count // processes)
+    output_path = path(output_path)
+    temp_dir = path(tempfile.mkdtemp(prefix='copy_video-'))
+    try:
+        chunks = [(in_file, temp_dir.joinpath('chunk-%04d%s'
+                                              % (i, output_path.ext)),
+                   offset + start, min(chunk_size, frame_count - start),
+                   index, backend.name)
+                  for i, start in enumerate(range(0, frame_count,
+                                                  chunk_size))]
+        pool = multiprocessing.Pool(processes=min(processes, len(chunks)))
+        try:
+            frame_counts = pool.map(_copy_video_chunk, chunks)
+        finally:
+            pool.close()
+            pool.join()
+        concatenate_videos([c[1] for c in chunks], output_path)
+    finally:
+        temp_dir.rmtree()
+    copied = sum(frame_counts)
+    output_frames = count_video_frames(output_path)
+    if output_frames != copied:
+        raise IOError('%s has %d frames, but %d frames were copied.'
+                      % (output_path, output_frames, copied))
+    return copied
+
+
+def read_frames(cap, start=None, count=None, out=None, step=1,
+                grayscale=False, props=None, index=None):
+    '''
+    Read frames from a capture into a single `(N, H, W, C)` `uint8` array.
+
+    Each frame is converted directly into its slot of the output array, so no
+    per-frame buffers are allocated.
+
+    Arguments
+    ---------
+
+     - `cap`: OpenCV capture (from any backend).
+     - `start`: Index of first frame to read (see `seek_frame`).  If `None`,
+       read from the current position of the capture.
+     - `count`: Number of frames to read.  Defaults to `len(out)` if `out` is
+       given, otherwise to all remaining frames.
+     - `out`: Optional preallocated `uint8` array of shape
+       `(count, height, width, channels)`, where `channels` is 1 if
+       `grayscale` is `True`, otherwise 3.  Raises `ValueError` if the shape
+       or type of `out` does not match the frames of the capture.
+     - `step`: Keep every `step`-th frame (skipped frames are grabbed, but not
+       retrieved).
+     - `grayscale`: Convert frames to grayscale.
+     - `props`: Optional `CVCaptureProperties` for `cap`.
+     - `index`: Optional `FrameIndex` used to seek to `start`.
+
+    Returns the (leading part of) `out` that was filled; fewer than `count`
+    frames are returned if the end of the video is reached.
+    '''
+    if props is None:
+        props = CVCaptureProperties(cap)
+    if start is not None:
+        seek_frame(cap, start, props, index=index)
+    if count is None:
+        if out is not None:
+            count = len(out)
+        else:
+            position = int(props.refresh(['CV_CAP_PROP_POS_FRAMES'])
+                           ['CV_CAP_PROP_POS_FRAMES'])
+            count = max(0, -(-(props.frame_count - position) // step))
+    channels = 1 if grayscale else 3
+    frame_shape = (props.height, props.width, channels)
+    if out is None:
+        out = np.empty((count, ) + frame_shape, dtype='uint8')
+    elif out.ndim != 4 or out.shape[0] < count or\
+            tuple(out.shape[1:]) != frame_shape or out.dtype != np.uint8:
+        raise ValueError('Output array must be uint8, with shape (>=%d, %d, '
+                         '%d, %d), not %s with shape %s.'
+                         % ((count, ) + frame_shape + (out.dtype, out.shape)))
+
+    backend = props.backend
+    for i in range(count):
+        if not backend.grab(cap) or\
+                not backend.retrieve_into(cap, out[i], grayscale=grayscale):
+            return out[:i]
+        for j in range(step - 1):
+            backend.grab(cap)
+    return out[:count]
+
+
+def iter_frame_chunks(cap, start=None, count=None, chunk_size=64, step=1,
+                      grayscale=False, props=None, index=None):
+    '''
+    Generator form of `read_frames` for streaming over long videos in constant
+    memory.
+
+    Yields `(frame_index, frames)` tuples, where `frames` holds up to
+    `chunk_size` frames starting at frame `frame_index`.
+
+    .. note::
+        The same buffer is reused for every chunk, so copy `frames` to keep
+        them beyond the next iteration.
+    '''
+    if props is None:
+        props = CVCaptureProperties(cap)
+    if start is not None:
+        seek_frame(cap, start, props, index=index)
+    position = int(props.refresh(['CV_CAP_PROP_POS_FRAMES'])
+                   ['CV_CAP_PROP_POS_FRAMES'])
+    if count is None:
+        count = max(0, -(-(props.frame_count - position) // step))
+    channels = 1 if grayscale else 3
+    buffer_ = np.empty((min(chunk_size, count), props.height, props.width,
+                        channels), dtype='uint8')
+
+    remaining = count
+    while remaining > 0:
+        chunk_count = min(chunk_size, remaining)
+        frames = read_frames(cap, count=chunk_count, out=buffer_, step=step,
+                             grayscale=grayscale, props=props)
+        if len(frames):
+            yield position, frames
+        if len(frames) < chunk_count:
+            # End of video.
+            break
+        position += len(frames) * step
+        remaining -= len(frames)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,204 @@
+'''
+Perspective warps using cached remap tables.
+
+`cv.WarpPerspective` maps every output pixel back through the homography on
+each call.  When the same homography is applied to every frame of a stream
+(e.g., the registration from `ImageRegistrationTask`), the mapping can be
+computed once as fixed-point remap tables (`CV_16SC2` coordinates plus an
+interpolation table, see `cv2.convertMaps`) and each frame is then warped by
+a table lookup (`cv2.remap`).
+
+    >>> cache = RemapCache()
+    >>> warped = cache.warp(frame, map_mat, dst=warped)
+
+Tables are cached per homography and output size, with least recently used
+entries dropped when more than `max_entries` are held.
+'''
+from collections import OrderedDict
+import threading
+
+import numpy as np
+
+from .safe_cv import cv2
+from .cv_array import cv2array
+
+
+def _as_homography(map_mat):
+    '''
+    Return 3x3 `float64` array for homography `map_mat` (`CvMat` or array).
+    '''
+    if not isinstance(map_mat, np.ndarray):
+        map_mat = np.asarray(map_mat)
+    return np.asarray(map_mat, dtype='float64').reshape(3, 3)
+
+
+def _as_array(im):
+    '''
+    Return NumPy view of `im`, with single-channel images as 2D arrays.
+    '''
+    if not isinstance(im, np.ndarray):
+        im = cv2array(im)
+    if im.ndim == 3 and im.shape[2] == 1:
+        im = im[:, :, 0]
+    return im
+
+
+def build_remap_tables(map_mat, size, inverse=True):
+    '''
+    Return fixed-point remap tables `(map1, map2)` for warping through
+    homography `map_mat` to an output of `size` `(width, height)`.
+
+    Arguments
+    ---------
+
+     - `map_mat`: 3x3 homography (`CvMat` or array).
+     - `size`: Output `(width, height)`.
+     - `inverse`: If `True`, `map_mat` maps output to input coordinates (as
+       with `CV_WARP_INVERSE_MAP`), otherwise input to output.
+    '''
+    H = _as_homography(map_mat)
+    if not inverse:
+        H = np.linalg.inv(H)
+    width, height = size
+    x = np.arange(width, dtype='float64')
+    y = np.arange(height, dtype='float64')[:, np.newaxis]
+    # Separable terms of `H * [x, y, 1]`, broadcast to `(height, width)`.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w = 1. / (H[2, 0] * x + H[2, 1] * y + H[2, 2])
+        map_x = (H[0, 0] * x + H[0, 1] * y + H[0, 2]) * w
+        map_y = (H[1, 0] * x + H[1, 1] * y + H[1, 2]) * w
+    # Points mapped to infinity fall outside the input image.
+    map_x = np.nan_to_num(map_x, nan=-1, posinf=-1, neginf=-1)
+    map_y = np.nan_to_num(map_y, nan=-1, posinf=-1, neginf=-1)
+    return cv2.convertMaps(map_x.astype('float32'), map_y.astype('float32'),
+                           cv2.CV_16SC2)
+
+
+class RemapCache(object):
+    def __init__(self, max_entries=8):
+        '''
+        Arguments
+        ---------
+
+         - `max_entries`: Maximum number of homography/size remap tables to
+           retain.
+        '''
+        self.max_entries = max_entries
+        # Remap tables, keyed by homography and output size, in least
+        # recently used order.
+        self._tables = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._tables)
+
+    def get_tables(self, map_mat, size, inverse=True):
+        '''
+        Return (cached) remap tables for `map_mat` and output `size`.  See
+        `build_remap_tables`.
+        '''
+        H = _as_homography(map_mat)
+        key = (H.tobytes(), tuple(size), inverse)
+        with self._lock:
+            tables = self._tables.get(key)
+            if tables is not None:
+                self._tables.move_to_end(key)
+                self.hits += 1
+                return tables
+        tables = build_remap_tables(H, size, inverse=inverse)
+        with self._lock:
+            self.misses += 1
+            self._tables[key] = tables
+            while len(self._tables) > self.max_entries:
+                self._tables.popitem(last=False)
+        return tables
+
+    def warp(self, src, map_mat, dst=None, size=None, inverse=True,
+             interpolation=None):
+        '''
+        Warp `src` through homography `map_mat`.
+
+        Arguments
+        ---------
+
+         - `src`: Input image (OpenCV image/matrix or NumPy array).
+         - `map_mat`: 3x3 homography (`CvMat` or array).
+         - `dst`: Optional output image (OpenCV image/matrix or NumPy array)
+           of the same type as `src`.  The result is written into `dst` in
+           place and `dst` is returned.  If not given, a new array is
+           returned.
+         - `size`: Output `(width, height)` (default: size of `dst`, or of
+           `src` if `dst` is not given).
+         - `inverse`: See `build_remap_tables`.
+         - `interpolation`: `cv2` interpolation flag (default:
+           `cv2.INTER_LINEAR`).
+        '''
+        if interpolation is None:
+            interpolation = cv2.INTER_LINEAR
+        src_array = _as_array(src)
+        if dst is not None:
+            dst_array = _as_array(dst)
+            if size is None:
+                size = dst_array.shape[1], dst_array.shape[0]
+        else:
+            dst_array = None
+            if size is None:
+                size = src_array.shape[1], src_array.shape[0]
+        map1, map2 = self.get_tables(map_mat, size, inverse=inverse)
+        result = cv2.remap(src_array, map1, map2, interpolation,
+                           dst=dst_array, borderMode=cv2.BORDER_CONSTANT)
+        if dst is None:
+            return result
+        if result is not dst_array:
+            # `cv2` could not write into `dst` (e.g., unsupported strides).
+            dst_array[...] = result
+        return dst
+
+    def clear(self):
+        with self._lock:
+            self._tables.clear()
+
+
+def benchmark(resolutions=((640, 480), (1280, 720), (1920, 1080)),
+              repeat=20):
+    '''
+    Compare `cv2.warpPerspective` against warping with cached remap tables
+    for a fixed homography at several resolutions.
+    '''
+    from timeit import timeit
+
+    cache = RemapCache()
+    results = {}
+    for width, height in resolutions:
+        H = np.array([[0.95, 0.05, 10.], [-0.04, 1.02, 5.], [1e-5, 2e-5, 1.]])
+        src = np.random.randint(0, 255, size=(height, width, 3))\
+            .astype('uint8')
+        dst = np.empty_like(src)
+        flags = cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP
+
+        def warp_perspective():
+            cv2.warpPerspective(src, H, (width, height), dst=dst, flags=flags)
+
+        def remap():
+            cache.warp(src, H, dst=dst)
+
+        remap()
+        expected = cv2.warpPerspective(src, H, (width, height), flags=flags)
+        # Fixed-point tables are accurate to 1/32 pixel.
+        error = np.abs(expected.astype('int16') - dst).mean()
+        results[(width, height)] = {
+            'warpPerspective': timeit(warp_perspective, number=repeat) /
+            repeat,
+            'remap': timeit(remap, number=repeat) / repeat}
+        print('%4dx%-4d warpPerspective %7.2f ms  remap %7.2f ms  '
+              '(mean abs error %.2f)'
+              % (width, height,
+                 1e3 * results[(width, height)]['warpPerspective'],
+                 1e3 * results[(width, height)]['remap'], error))
+    return results
+
+
+if __name__ == '__main__':
+    benchmark()